@@ -0,0 +1,527 @@
+"""
+Local stand-in for the parts of the Drive v3 API SaveHaven uses
+
+Serves file listing and search, folder creation, multipart and resumable
+uploads, ranged downloads, revisions, the changes feed and the batch
+endpoint over plain HTTP, keeping every file in memory. Like Drive, it
+refuses to create files in folders that don't exist and deleting a
+folder deletes its contents. Benchmarks talk to it through the real
+googleapiclient stack, see drive_backend.
+
+Usage: python benchmarks/fake_drive.py [--port N] [--latency MS]
+"""
+
+import re
+import json
+import time
+import hashlib
+import argparse
+import threading
+
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+STATUS_TEXT = {
+    200: "OK",
+    204: "No Content",
+    206: "Partial Content",
+    308: "Resume Incomplete",
+    400: "Bad Request",
+    404: "Not Found",
+}
+
+
+class DriveError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class FakeDrive:
+    """
+    In-memory Drive: files, their revisions, upload sessions and the
+    changes feed. Requests are served by handle, which the HTTP handler
+    and the batch endpoint both call.
+    """
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.files = {}
+        self.sessions = {}
+        self.changes = []
+        self.next_id = 0
+        self.requests = 0
+
+    # region Model
+
+    def new_id(self, prefix: str) -> str:
+        self.next_id += 1
+        return f"{prefix}{self.next_id:08d}"
+
+    def touch(self, file: dict, removed: bool = False):
+        meta = file["meta"]
+        if not removed:
+            meta["modifiedTime"] = now()
+        self.changes.append(
+            {
+                "fileId": meta["id"],
+                "removed": removed,
+                "file": None if removed else dict(meta),
+            }
+        )
+
+    def check_parents(self, parents: list):
+        # Drive refuses to create files in folders that don't exist
+        for parent in parents:
+            if parent == "root":
+                continue
+            if parent not in self.files:
+                raise DriveError(404, f"File not found: {parent}")
+            if self.files[parent]["meta"]["mimeType"] != FOLDER_MIME_TYPE:
+                raise DriveError(400, f"Parent {parent} is not a folder")
+
+    def create(self, body: dict, data: bytes = None) -> dict:
+        self.check_parents(body.get("parents", []))
+        file_id = self.new_id("f")
+        meta = {
+            "id": file_id,
+            "name": body.get("name", "Untitled"),
+            "mimeType": body.get("mimeType", "application/octet-stream"),
+            "parents": body.get("parents", ["root"]),
+        }
+        if body.get("appProperties"):
+            meta["appProperties"] = dict(body["appProperties"])
+        file = {"meta": meta, "data": None, "revisions": []}
+        self.files[file_id] = file
+        if data is not None:
+            self.write(file, data)
+        else:
+            self.touch(file)
+        return file
+
+    def update(self, file_id: str, body: dict, data: bytes = None) -> dict:
+        file = self.get(file_id)
+        meta = file["meta"]
+        if "name" in body:
+            meta["name"] = body["name"]
+        if body.get("appProperties"):
+            meta.setdefault("appProperties", {}).update(body["appProperties"])
+        if data is not None:
+            self.write(file, data)
+        else:
+            self.touch(file)
+        return file
+
+    def write(self, file: dict, data: bytes):
+        file["data"] = bytes(data)
+        meta = file["meta"]
+        meta["size"] = str(len(data))
+        meta["md5Checksum"] = hashlib.md5(data).hexdigest()
+        self.touch(file)
+        file["revisions"].append(
+            {
+                "id": str(len(file["revisions"]) + 1),
+                "modifiedTime": meta["modifiedTime"],
+                "keepForever": False,
+                "size": meta["size"],
+                "md5Checksum": meta["md5Checksum"],
+            }
+        )
+
+    def delete(self, file: dict):
+        # Deleting a folder deletes everything in it
+        file_id = file["meta"]["id"]
+        for child in [
+            child
+            for child in self.files.values()
+            if file_id in child["meta"]["parents"]
+        ]:
+            self.delete(child)
+        del self.files[file_id]
+        self.touch(file, removed=True)
+
+    def get(self, file_id: str) -> dict:
+        if file_id not in self.files:
+            raise DriveError(404, f"File not found: {file_id}")
+        return self.files[file_id]
+
+    def search(self, query: str) -> list:
+        parents = set(re.findall(r"'([^']+)' in parents", query))
+        name = re.search(r"name\s*=\s*'((?:[^'\\]|\\.)*)'", query)
+        mime_type = re.search(r"mimeType\s*=\s*'([^']+)'", query)
+        properties = re.findall(
+            r"appProperties has \{\s*key\s*=\s*'([^']+)' and value\s*=\s*'([^']*)'\s*\}",
+            query,
+        )
+        return [
+            file["meta"]
+            for file in self.files.values()
+            if (not parents or parents & set(file["meta"]["parents"]))
+            and (
+                not name
+                or file["meta"]["name"] == re.sub(r"\\(.)", r"\1", name.group(1))
+            )
+            and (not mime_type or file["meta"]["mimeType"] == mime_type.group(1))
+            and all(
+                file["meta"].get("appProperties", {}).get(key) == value
+                for key, value in properties
+            )
+        ]
+
+    # endregion
+
+    # region Requests
+
+    def handle(
+        self, method: str, url: str, headers: dict, body: bytes, host: str
+    ) -> tuple:
+        """
+        Serves one API request
+
+        Returns
+        -------
+        response: tuple
+            Status, headers and body
+        """
+        with self.lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(url)
+        path = parts.path.rstrip("/")
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        try:
+            with self.lock:
+                return self.route(method, path, query, headers, body, host)
+        except DriveError as error:
+            return (
+                error.status,
+                {},
+                json_body({"error": {"code": error.status, "message": str(error)}}),
+            )
+
+    def route(self, method, path, query, headers, body, host) -> tuple:
+        if path == "/drive/v3/files" and method == "GET":
+            files = self.search(query.get("q", ""))
+            start = int(query.get("pageToken", 0))
+            size = int(query.get("pageSize", 100))
+            response = {"files": files[start : start + size]}
+            if start + size < len(files):
+                response["nextPageToken"] = str(start + size)
+            return 200, {}, json_body(response)
+        if path == "/drive/v3/files" and method == "POST":
+            return 200, {}, json_body(self.create(json.loads(body or b"{}"))["meta"])
+        if path in (
+            "/upload/drive/v3/files",
+            "/resumable/upload/drive/v3/files",
+        ) or path.startswith("/upload/drive/v3/files/"):
+            file_id = (
+                path.rsplit("/", 1)[1]
+                if path.startswith("/upload/drive/v3/files/")
+                else None
+            )
+            return self.upload(method, file_id, query, headers, body, host)
+        if path == "/drive/v3/changes/startPageToken":
+            return 200, {}, json_body({"startPageToken": str(len(self.changes))})
+        if path == "/drive/v3/changes":
+            start = int(query["pageToken"])
+            size = int(query.get("pageSize", 100))
+            response = {"changes": self.changes[start : start + size]}
+            if start + size < len(self.changes):
+                response["nextPageToken"] = str(start + size)
+            else:
+                response["newStartPageToken"] = str(len(self.changes))
+            return 200, {}, json_body(response)
+        match = re.fullmatch(r"/drive/v3/files/([^/]+)(/revisions(?:/([^/]+))?)?", path)
+        if not match:
+            raise DriveError(404, f"Unknown endpoint {method} {path}")
+        file = self.get(match.group(1))
+        if match.group(2):
+            if method == "GET":
+                return 200, {}, json_body({"revisions": file["revisions"]})
+            revision = next(
+                (
+                    revision
+                    for revision in file["revisions"]
+                    if revision["id"] == match.group(3)
+                ),
+                None,
+            )
+            if revision is None:
+                raise DriveError(404, "Revision not found")
+            revision.update(json.loads(body or b"{}"))
+            return 200, {}, json_body(revision)
+        if method == "DELETE":
+            self.delete(file)
+            return 204, {}, b""
+        if method == "PATCH":
+            return (
+                200,
+                {},
+                json_body(
+                    self.update(file["meta"]["id"], json.loads(body or b"{}"))["meta"]
+                ),
+            )
+        if query.get("alt") == "media":
+            return self.download(file, headers)
+        return 200, {}, json_body(file["meta"])
+
+    def upload(self, method, file_id, query, headers, body, host) -> tuple:
+        upload_type = query.get("uploadType")
+        if upload_type == "resumable" and "upload_id" in query:
+            return self.resume(query["upload_id"], headers, body)
+        if upload_type == "resumable":
+            if not file_id:
+                self.check_parents(json.loads(body or b"{}").get("parents", []))
+            session_id = self.new_id("u")
+            self.sessions[session_id] = {
+                "file_id": file_id,
+                "body": json.loads(body or b"{}"),
+                "data": bytearray(),
+            }
+            location = f"http://{host}/upload/drive/v3/files?uploadType=resumable&upload_id={session_id}"
+            return 200, {"Location": location}, b""
+        if upload_type == "multipart":
+            metadata, data = split_related(headers["content-type"], body)
+        else:
+            metadata, data = {}, body
+        if file_id:
+            file = self.update(file_id, metadata, data)
+        else:
+            file = self.create(metadata, data)
+        return 200, {}, json_body(file["meta"])
+
+    def resume(self, session_id: str, headers: dict, body: bytes) -> tuple:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise DriveError(404, "Upload session not found")
+        received = session["data"]
+        match = re.fullmatch(
+            r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)",
+            headers.get("content-range", "bytes */*"),
+        )
+        if not match:
+            raise DriveError(400, "Bad Content-Range")
+        if match.group(1) is not None:
+            start, end = int(match.group(1)), int(match.group(2))
+            if start != len(received):
+                raise DriveError(400, f"Expected offset {len(received)}, got {start}")
+            received += body[: end - start + 1]
+        total = match.group(3)
+        if total != "*" and len(received) == int(total):
+            del self.sessions[session_id]
+            if session["file_id"]:
+                file = self.update(session["file_id"], session["body"], bytes(received))
+            else:
+                file = self.create(session["body"], bytes(received))
+            return 200, {}, json_body(file["meta"])
+        response_headers = {}
+        if received:
+            response_headers["Range"] = f"bytes=0-{len(received) - 1}"
+        return 308, response_headers, b""
+
+    def download(self, file: dict, headers: dict) -> tuple:
+        data = file["data"] or b""
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", headers.get("range", ""))
+        if not match or not data:
+            return 200, {"Content-Type": "application/octet-stream"}, data
+        start = int(match.group(1))
+        end = min(int(match.group(2) or len(data) - 1), len(data) - 1)
+        return (
+            206,
+            {
+                "Content-Type": "application/octet-stream",
+                "Content-Range": f"bytes {start}-{end}/{len(data)}",
+            },
+            data[start : end + 1],
+        )
+
+    def batch(self, headers: dict, body: bytes, host: str) -> tuple:
+        """
+        Serves a multipart/mixed batch request, part by part
+        """
+        with self.lock:
+            boundary = f"batch_{self.new_id('b')}"
+        parts = []
+        for part_headers, content in split_multipart(headers["content-type"], body):
+            request_line, _, rest = (
+                content.partition(b"\r\n")
+                if b"\r\n" in content
+                else content.partition(b"\n")
+            )
+            method, url = request_line.decode().split(" ")[:2]
+            inner_headers, inner_body = parse_headers(rest)
+            status, response_headers, response_body = self.handle(
+                method, url, inner_headers, inner_body, host
+            )
+            response_headers.setdefault("Content-Type", "application/json")
+            lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Error')}"]
+            lines += [f"{key}: {value}" for key, value in response_headers.items()]
+            lines.append(f"Content-Length: {len(response_body)}")
+            content_id = part_headers.get("content-id", "<+0>")
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id[1:-1]}>\r\n\r\n".encode()
+                + "\r\n".join(lines).encode()
+                + b"\r\n\r\n"
+                + response_body
+                + b"\r\n"
+            )
+        return (
+            200,
+            {"Content-Type": f"multipart/mixed; boundary={boundary}"},
+            b"".join(parts) + f"--{boundary}--\r\n".encode(),
+        )
+
+    # endregion
+
+
+def now() -> str:
+    return (
+        datetime.now(timezone.utc)
+        .isoformat(timespec="milliseconds")
+        .replace("+00:00", "Z")
+    )
+
+
+def json_body(value) -> bytes:
+    return json.dumps(value).encode()
+
+
+def parse_headers(data: bytes) -> tuple:
+    """
+    Splits a block of headers followed by a body, either line ending
+    """
+    found = [
+        (data.find(marker), len(marker))
+        for marker in (b"\r\n\r\n", b"\n\n")
+        if marker in data
+    ]
+    end, length = min(found) if found else (len(data), 0)
+    headers = {}
+    for line in data[:end].decode().splitlines():
+        if ":" in line:
+            key, _, value = line.partition(":")
+            headers[key.strip().lower()] = value.strip()
+    return headers, data[end + length :]
+
+
+def split_multipart(content_type: str, body: bytes) -> list:
+    """
+    Returns the headers and content of every part of a multipart body
+    """
+    boundary = re.search(r'boundary="?([^";]+)"?', content_type).group(1).encode()
+    parts = []
+    for chunk in body.split(b"--" + boundary)[1:]:
+        if chunk.startswith(b"--"):
+            break
+        # The line break before the next delimiter belongs to it
+        chunk = chunk[2:] if chunk.startswith(b"\r\n") else chunk[1:]
+        if chunk.endswith(b"\r\n"):
+            chunk = chunk[:-2]
+        elif chunk.endswith(b"\n"):
+            chunk = chunk[:-1]
+        parts.append(parse_headers(chunk))
+    return parts
+
+
+def split_related(content_type: str, body: bytes) -> tuple:
+    """
+    Returns the metadata and media of a multipart upload
+    """
+    (_, metadata), (_, media) = split_multipart(content_type, body)
+    return json.loads(metadata or b"{}"), media
+
+
+def serve(drive: FakeDrive, port: int = 0) -> ThreadingHTTPServer:
+    """
+    Starts serving drive on localhost in a background thread
+
+    Returns
+    -------
+    server: ThreadingHTTPServer
+        Running server, its address is server.server_address
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, like the real API
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length) if length else b""
+            headers = {key.lower(): value for key, value in self.headers.items()}
+            host = self.headers.get("Host", "127.0.0.1")
+            if urlsplit(self.path).path.startswith("/batch/"):
+                status, response_headers, response_body = drive.batch(
+                    headers, body, host
+                )
+            else:
+                status, response_headers, response_body = drive.handle(
+                    self.command, self.path, headers, body, host
+                )
+            self.send_response(status, STATUS_TEXT.get(status))
+            response_headers.setdefault("Content-Type", "application/json")
+            for key, value in response_headers.items():
+                self.send_header(key, value)
+            self.send_header("Content-Length", str(len(response_body)))
+            self.end_headers()
+            self.wfile.write(response_body)
+
+        do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = respond
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def drive_backend(
+    endpoint: str, upload_chunk_size: int, download_chunk_size: int = None
+):
+    """
+    Returns a DriveBackend whose client talks to the fake Drive at endpoint
+    """
+    from googleapiclient import discovery_cache
+    from googleapiclient.discovery import build_from_document
+    from googleapiclient.http import build_http
+    from savehaven.drive import DriveBackend
+
+    document = json.loads(discovery_cache.get_static_doc("drive", "v3"))
+    document["rootUrl"] = f"{endpoint}/"
+    document["baseUrl"] = f"{endpoint}/drive/v3/"
+    document.pop("mtlsRootUrl", None)
+
+    class FakeDriveBackend(DriveBackend):
+        def new_http(self):
+            return build_http()
+
+        def build_client(self):
+            return build_from_document(document, http=self.http)
+
+    return FakeDriveBackend(upload_chunk_size, download_chunk_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--latency", type=float, default=0, help="Added to every request, in ms"
+    )
+    args = parser.parse_args()
+    server = serve(FakeDrive(args.latency / 1000), args.port)
+    print(f"Serving on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Local stand-in for the PCGamingWiki pages SaveHaven scrapes
+
+Answers searches with a single result and game pages with a save game
+table holding one Windows location under Documents. It is mounted on the
+shared requests session, see mount, so pcgw_search and resolve_prefixes
+run unchanged and nothing leaves the machine.
+"""
+
+import io
+import time
+import threading
+
+from urllib.parse import urlsplit, parse_qs, unquote
+
+HOSTS = ["https://www.pcgamingwiki.com", "https://pcgamingwiki.com"]
+
+
+def save_location(title: str) -> str:
+    """
+    Returns where a game's saves are, relative to its prefix, the same way
+    extract_save_locations resolves the path on its page
+    """
+    import getpass
+
+    return f"drive_c/users/{getpass.getuser()}/Documents/{title}"
+
+
+class FakePCGW:
+    """
+    Serves search results and game pages, sleeping latency seconds per
+    request like a round trip to the wiki would
+    """
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def page(self, url: str) -> tuple:
+        parts = urlsplit(url)
+        if parts.path == "/w/index.php":
+            title = parse_qs(parts.query)["search"][0]
+            link = f"/wiki/{title.replace(' ', '_')}"
+            return 200, (
+                '<div class="mw-search-result-heading">'
+                f'<a href="{link}">{title}</a></div>'
+            )
+        if parts.path.startswith("/wiki/"):
+            title = unquote(parts.path[len("/wiki/") :]).replace("_", " ")
+            # The first table-gamedata is the config file table
+            return 200, (
+                '<table id="table-gamedata"></table>'
+                '<table id="table-gamedata"><tr><th>Windows</th><td>'
+                f"<span>%USERPROFILE%\\Documents\\{title}\\</span>"
+                "</td></tr></table>"
+            )
+        return 404, "<p>Not found</p>"
+
+    def adapter(self):
+        """
+        Returns a requests transport adapter serving this wiki
+        """
+        from requests import Response
+        from requests.adapters import BaseAdapter
+
+        pcgw = self
+
+        class FakeAdapter(BaseAdapter):
+            def send(self, request, **kwargs):
+                with pcgw.lock:
+                    pcgw.requests += 1
+                time.sleep(pcgw.latency)
+                status, html = pcgw.page(request.url)
+                response = Response()
+                response.status_code = status
+                response.url = request.url
+                response.request = request
+                response.headers["Content-Type"] = "text/html; charset=utf-8"
+                response.raw = io.BytesIO(html.encode())
+                return response
+
+            def close(self):
+                pass
+
+        return FakeAdapter()
+
+
+def mount(pcgw: FakePCGW):
+    """
+    Routes the PCGamingWiki traffic of savehaven's shared session to pcgw
+    """
+    from savehaven import helpers
+
+    adapter = pcgw.adapter()
+    for host in HOSTS:
+        helpers.get_http_session().mount(host, adapter)
@@ -0,0 +1,82 @@
+"""
+Guards the startup time of the savehaven command
+
+Imports savehaven.__main__ in fresh interpreters and fails if it takes
+longer than the budget, or if it pulls in a module that should only be
+imported once a command needs Drive, PCGamingWiki or a prompt.
+
+Usage: python benchmarks/import_time.py [--runs N] [--budget MS]
+"""
+
+import sys
+import argparse
+import subprocess
+import statistics
+import time
+
+HEAVY_MODULES = [
+    "googleapiclient.discovery",
+    "googleapiclient.http",
+    "google_auth_oauthlib",
+    "httplib2",
+    "requests",
+    "bs4",
+    "inquirer",
+    "tqdm",
+    "pyfzf",
+]
+
+
+def time_command(code: str, runs: int) -> list:
+    """
+    Returns the wall time in milliseconds of running code in a fresh
+    interpreter, once per run
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=100,
+        help="Allowed import time on top of a bare interpreter, in ms",
+    )
+    args = parser.parse_args()
+
+    baseline = statistics.median(time_command("pass", args.runs))
+    startup = statistics.median(time_command("import savehaven.__main__", args.runs))
+    imported = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, savehaven.__main__; "
+            f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout.split()
+
+    overhead = startup - baseline
+    print(f"Interpreter:      {baseline:7.1f} ms")
+    print(f"savehaven import: {startup:7.1f} ms (+{overhead:.1f} ms)")
+    failed = False
+    if overhead > args.budget:
+        print(f"FAIL: import overhead above the {args.budget:.0f} ms budget")
+        failed = True
+    if imported:
+        print(f"FAIL: imported at startup: {', '.join(imported)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
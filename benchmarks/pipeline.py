@@ -0,0 +1,436 @@
+"""
+Benchmarks the backup pipeline against a local fake Drive
+
+Builds synthetic save trees (many small files, a few huge files and
+Minecraft-like region layouts) and times, for each of them, scanning
+saves, archiving and uploading with upload_file, backing up with
+upload_game, Heroic discovery over already backed up saves, restoring
+with fetch_cloud_file and Heroic discovery of new prefixes with an empty
+PCGamingWiki cache. Every scenario runs in a fresh interpreter with its
+own config dir so peak RSS is its own, the fake Drive runs in this
+process and the fake PCGamingWiki in the child.
+
+Usage: python benchmarks/pipeline.py [--scenarios a,b] [--scale X]
+       [--latency MS] [--pcgw-latency MS] [--repeat N] [--json]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import traceback
+import statistics
+import subprocess
+
+from fake_drive import FakeDrive, serve, drive_backend
+from fake_pcgw import FakePCGW, mount, save_location
+
+SCENARIOS = ["small-files", "huge-files", "minecraft"]
+OPERATIONS = [
+    "scan",
+    "upload_file",
+    "upload_game",
+    "discover",
+    "restore",
+    "discover_cold",
+]
+WORDS = [
+    b"save",
+    b"level",
+    b"player",
+    b"inventory",
+    b"quest",
+    b"flag",
+    b"0",
+    b"1",
+    b"true",
+]
+
+
+# region Save trees
+
+
+def write_file(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+
+
+def text_bytes(rng: random.Random, size: int) -> bytes:
+    """
+    Returns compressible bytes, like the text and tables most saves hold
+    """
+    data = bytearray()
+    while len(data) < size:
+        data += rng.choice(WORDS) + b" "
+    return bytes(data[:size])
+
+
+def small_files(path: str, rng: random.Random):
+    for index in range(400):
+        write_file(
+            os.path.join(path, f"slot{index % 10}", f"chunk{index}.sav"),
+            text_bytes(rng, rng.randint(512, 8 * 1024)),
+        )
+
+
+def huge_files(path: str, rng: random.Random, size: int):
+    # One incompressible file and one with long zero runs
+    write_file(os.path.join(path, "world.pak"), rng.randbytes(size))
+    write_file(
+        os.path.join(path, "cache.bin"),
+        b"".join(
+            rng.randbytes(64 * 1024) + bytes(192 * 1024)
+            for _ in range(size // (256 * 1024))
+        ),
+    )
+
+
+def minecraft_world(path: str, rng: random.Random):
+    # Region files are mostly compressed chunk data with unused sectors
+    for x in range(-3, 3):
+        for z in range(-2, 2):
+            write_file(
+                os.path.join(path, "region", f"r.{x}.{z}.mca"),
+                rng.randbytes(512 * 1024) + bytes(512 * 1024),
+            )
+    write_file(os.path.join(path, "level.dat"), rng.randbytes(2 * 1024))
+    for index in range(10):
+        write_file(
+            os.path.join(path, "playerdata", f"{index:032x}.dat"),
+            rng.randbytes(4 * 1024),
+        )
+    for name in ("raids.dat", "idcounts.dat", "scoreboard.dat"):
+        write_file(os.path.join(path, "data", name), text_bytes(rng, 16 * 1024))
+
+
+def build_saves(scenario: str, root: str, scale: float) -> dict:
+    """
+    Writes the save directories of a scenario
+
+    Returns
+    -------
+    saves: dict
+        Path of every save keyed by its name
+    """
+    rng = random.Random(scenario)
+    saves = {}
+    if scenario == "small-files":
+        for index in range(max(1, round(8 * scale))):
+            saves[f"Small{index}"] = os.path.join(root, f"Small{index}")
+            small_files(saves[f"Small{index}"], rng)
+    elif scenario == "huge-files":
+        for index in range(2):
+            saves[f"Huge{index}"] = os.path.join(root, f"Huge{index}")
+            huge_files(
+                saves[f"Huge{index}"], rng, max(1, round(48 * scale)) * 1024 * 1024
+            )
+    elif scenario == "minecraft":
+        for index in range(max(1, round(3 * scale))):
+            saves[f"World{index}"] = os.path.join(root, f"World{index}")
+            minecraft_world(saves[f"World{index}"], rng)
+    return saves
+
+
+def cold_prefixes(heroic_dir: str, run: int, scale: float) -> list:
+    """
+    Writes Heroic prefixes that were never discovered, with their saves
+    where the fake PCGamingWiki says they are
+
+    Returns
+    -------
+    prefixes: list
+        Names of the new prefixes
+    """
+    prefixes = [f"Cold{run}x{index}" for index in range(max(1, round(16 * scale)))]
+    for prefix in prefixes:
+        write_file(
+            os.path.join(heroic_dir, prefix, save_location(prefix), "save.dat"),
+            prefix.encode(),
+        )
+    return prefixes
+
+
+def tree_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(dirpath, name))
+        for dirpath, _, names in os.walk(path)
+        for name in names
+    )
+
+
+# endregion
+
+
+# region Scenario run
+
+
+def run_scenario(
+    scenario: str, endpoint: str, scale: float, repeat: int, pcgw_latency: float
+) -> dict:
+    """
+    Runs one scenario, in the child interpreter. HOME points at a scratch
+    directory, so savehaven keeps its config and state there.
+
+    Returns
+    -------
+    results: dict
+        Seconds taken by every sample and bytes moved, by operation
+    """
+    from savehaven import helpers
+
+    pcgw = FakePCGW(pcgw_latency)
+    mount(pcgw)
+    helpers.set_backend(
+        drive_backend(
+            endpoint, helpers.upload_chunk_size(), helpers.download_chunk_size()
+        )
+    )
+    saves = build_saves(scenario, os.path.join(os.path.expanduser("~"), "saves"), scale)
+    for name, path in saves.items():
+        os.makedirs(os.path.join(helpers.heroic_dir, name), exist_ok=True)
+        helpers.add_custom(name, path)
+    sizes = {name: tree_size(path) for name, path in saves.items()}
+    results = {operation: {"samples": [], "bytes": 0} for operation in OPERATIONS}
+
+    def timed(operation: str, size: int, function, *args):
+        started = time.perf_counter()
+        value = function(*args)
+        results[operation]["samples"].append(time.perf_counter() - started)
+        results[operation]["bytes"] += size
+        return value
+
+    root = helpers.load_inventory().root
+    raw_folder = helpers.create_folder("Raw", root)
+    for _ in range(repeat):
+        for name, path in saves.items():
+            timed("scan", sizes[name], helpers.scan_tree, path, None, True)
+    for name, path in saves.items():
+        timed(
+            "upload_file",
+            sizes[name],
+            helpers.upload_file,
+            path,
+            f"{name}.zip",
+            raw_folder,
+            True,
+        )
+    for name, path in saves.items():
+        game = helpers.SaveDir(name, path, os.path.getmtime(path))
+        timed(
+            "upload_game",
+            sizes[name],
+            helpers.upload_game,
+            "Heroic",
+            game,
+            0,
+            root,
+            "local-wins",
+        )
+    for _ in range(repeat):
+        helpers.load_inventory()
+        jobs = timed(
+            "discover",
+            0,
+            helpers.heroic_sync,
+            helpers.inventory.root,
+            helpers.load_config(),
+            ["*"],
+            "newest-wins",
+        )
+        assert not jobs, "saves that were just backed up should be skipped"
+    helpers.load_inventory()
+    cloud_files = helpers.open_folder("Heroic", root)[1]
+    for name, path in saves.items():
+        file_id = cloud_files[helpers.backup_name(name)]["id"]
+        game = helpers.SaveDir(name, path, os.path.getmtime(path))
+        assert timed("restore", sizes[name], helpers.fetch_cloud_file, game, file_id)
+    for run in range(repeat):
+        # New prefixes and an empty cache, so every prefix is looked up
+        prefixes = cold_prefixes(helpers.heroic_dir, run, scale)
+        helpers.clear_pcgw_cache()
+        helpers.load_inventory()
+        jobs = timed(
+            "discover_cold",
+            0,
+            helpers.heroic_sync,
+            helpers.inventory.root,
+            helpers.load_config(),
+            prefixes,
+            "newest-wins",
+        )
+        assert sorted(
+            os.path.relpath(job.game.path, helpers.heroic_dir) for job in jobs
+        ) == sorted(
+            os.path.join(prefix, save_location(prefix)) for prefix in prefixes
+        ), "new prefixes should resolve to their PCGamingWiki save locations"
+    results["pcgw_requests"] = pcgw.requests
+    results["peak_rss_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results["save_bytes"] = sum(sizes.values())
+    results["saves"] = len(saves)
+    return results
+
+
+def run_child(
+    scenario: str, endpoint: str, scale: float, repeat: int, pcgw_latency: float
+) -> dict:
+    """
+    Runs a scenario in a fresh interpreter with its own HOME
+    """
+    with tempfile.TemporaryDirectory(prefix=f"savehaven-{scenario}-") as home:
+        env = dict(os.environ, HOME=home)
+        env.pop("XDG_CONFIG_HOME", None)
+        config = os.path.join(home, ".config", "SaveHaven")
+        os.makedirs(config)
+        with open(os.path.join(config, "config.ini"), "w") as config_ini:
+            config_ini.write("[Launchers]\nselected = Heroic\n")
+        output = subprocess.run(
+            [
+                sys.executable,
+                __file__,
+                "--child",
+                scenario,
+                "--endpoint",
+                endpoint,
+                "--scale",
+                str(scale),
+                "--repeat",
+                str(repeat),
+                "--pcgw-latency",
+                str(pcgw_latency),
+            ],
+            env=env,
+            check=True,
+            stdout=subprocess.PIPE,
+            text=True,
+        ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+# endregion
+
+
+# region Report
+
+
+def percentile(samples: list, percent: int) -> float:
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method="inclusive")[percent - 1]
+
+
+def summarize(results: dict) -> dict:
+    """
+    Adds throughput and latency percentiles to the raw samples
+    """
+    for scenario in results.values():
+        for operation in OPERATIONS:
+            stats = scenario[operation]
+            samples = stats["samples"]
+            total = sum(samples)
+            stats["mib_per_second"] = (
+                stats["bytes"] / 1024 / 1024 / total
+                if total and stats["bytes"]
+                else None
+            )
+            stats["p50_ms"] = percentile(samples, 50) * 1000
+            stats["p95_ms"] = percentile(samples, 95) * 1000
+            stats["max_ms"] = max(samples) * 1000
+    return results
+
+
+def print_table(results: dict):
+    print(
+        f"{'scenario':<12} {'operation':<14} {'n':>4} {'MiB/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}"
+    )
+    for name, scenario in results.items():
+        for operation in OPERATIONS:
+            stats = scenario[operation]
+            throughput = (
+                f"{stats['mib_per_second']:8.1f}"
+                if stats["mib_per_second"]
+                else f"{'-':>8}"
+            )
+            print(
+                f"{name:<12} {operation:<14} {len(stats['samples']):>4} {throughput} "
+                f"{stats['p50_ms']:9.1f} {stats['p95_ms']:9.1f} {stats['max_ms']:9.1f}"
+            )
+        print(
+            f"{name:<12} {scenario['saves']} saves, {scenario['save_bytes'] / 1024 / 1024:.1f} MiB, "
+            f"{scenario['requests']} Drive requests, "
+            f"{scenario['pcgw_requests']} PCGamingWiki requests, peak RSS {scenario['peak_rss_kib'] / 1024:.1f} MiB"
+        )
+
+
+# endregion
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help="Comma separated, from " + ", ".join(SCENARIOS),
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1, help="Multiplies the number or size of saves"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0, help="Added to every Drive request, in ms"
+    )
+    parser.add_argument(
+        "--pcgw-latency",
+        type=float,
+        default=100,
+        help="Added to every PCGamingWiki request, in ms",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Runs of the scan and discover passes"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--endpoint", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Progress output goes nowhere, the last line is the result
+        stdout, stderr = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = open(os.devnull, "w")
+        try:
+            results = run_scenario(
+                args.child,
+                args.endpoint,
+                args.scale,
+                args.repeat,
+                args.pcgw_latency / 1000,
+            )
+        except Exception:
+            traceback.print_exc(file=stderr)
+            sys.exit(1)
+        print(json.dumps(results), file=stdout)
+        return
+
+    drive = FakeDrive(args.latency / 1000)
+    server = serve(drive)
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+    results = {}
+    for scenario in args.scenarios.split(","):
+        requests = drive.requests
+        results[scenario] = run_child(
+            scenario, endpoint, args.scale, args.repeat, args.pcgw_latency
+        )
+        results[scenario]["requests"] = drive.requests - requests
+    server.shutdown()
+    summarize(results)
+    if args.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,11 +14,74 @@ def main():
         description="Upload and sync video game files with Google Drive",
     )
 
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print how long each phase took once the command finishes",
+    )
+    parser.add_argument(
+        "--profile-json",
+        metavar="PATH",
+        help="Write phase timings and counters as JSON",
+    )
+    parser.add_argument(
+        "--profile-prom",
+        metavar="PATH",
+        help="Write phase timings and counters for the node exporter textfile collector",
+    )
+
     commands = parser.add_subparsers(title="commands", dest="command")
 
     sync_parser = commands.add_parser("backup", help="Backup saves with Google Drive")
     sync_parser.add_argument("-p", "--persistent", action="store_true", dest="p")
     sync_parser.add_argument("-o", "--overwrite", action="store_true", dest="o")
+    sync_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        dest="j",
+        help="Number of games to back up at the same time",
+    )
+    selection = sync_parser.add_mutually_exclusive_group()
+    selection.add_argument(
+        "--all",
+        action="store_const",
+        const=["*"],
+        dest="games",
+        help="Back up every save without prompting",
+    )
+    selection.add_argument(
+        "--games",
+        type=lambda games: [game.strip() for game in games.split(",")],
+        help="Comma separated names or patterns of the saves to back up without prompting",
+    )
+    sync_parser.add_argument(
+        "--policy",
+        choices=POLICIES,
+        help="How conflicts with cloud copies are settled, newest-wins by default with --all or --games",
+    )
+
+    watch_parser = commands.add_parser(
+        "watch", help="Back up saves whenever they change"
+    )
+    watch_parser.add_argument(
+        "--policy",
+        choices=POLICIES,
+        default="newest-wins",
+        help="How conflicts with the cloud copy are settled",
+    )
+    watch_parser.add_argument(
+        "--quiet",
+        type=float,
+        help="Seconds a save has to stay untouched before it's backed up",
+    )
+    watch_parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        dest="j",
+        help="Number of games to back up at the same time",
+    )
 
     upload_parser = commands.add_parser("upload", help="Upload path to google drive")
     upload_parser.add_argument("path", type=str, help="Path to upload")
@@ -37,9 +100,29 @@ def main():
     custom_parser = commands.add_parser("add", help="Add a custom game location")
     custom_parser.add_argument("name", help="Name of the game")
     custom_parser.add_argument("path", help="Path to upload")
+    custom_parser.add_argument(
+        "--codec", help='Archive format of its backups, like "tar.zst" or "tar.xz:9"'
+    )
+
+    cache_parser = commands.add_parser(
+        "clearcache", help="Forget cached PCGamingWiki save locations"
+    )
+    cache_parser.add_argument(
+        "title", nargs="?", help="Game to forget, everything if not given"
+    )
 
     argcomplete.autocomplete(parser)
     args = parser.parse_args()
+    try:
+        run_command(parser, args)
+    finally:
+        if args.profile or args.profile_json or args.profile_prom:
+            from savehaven.metrics import report
+
+            report(args.profile, args.profile_json, args.profile_prom, args.command)
+
+
+def run_command(parser: argparse.ArgumentParser, args: argparse.Namespace):
     match args.command:
         case "upload":
             if args.path and os.path.exists(args.path):
@@ -52,15 +135,19 @@ def main():
                     file_name = args.name
                 upload_file(args.path, file_name, root, os.path.isdir(args.path))
         case "backup":
-            backup(args.p, args.o)
+            backup(args.p, args.o, args.j, args.games, args.policy)
+        case "watch":
+            watch(args.policy, args.quiet, args.j)
         case "updatecfg":
             update_launchers()
         case "list":
             list_cloud()
         case "add":
-            add_custom(args.name, args.path)
+            add_custom(args.name, args.path, args.codec)
         case "restore":
             restore()
+        case "clearcache":
+            clear_pcgw_cache(args.title)
         case _:
             parser.print_help()
 
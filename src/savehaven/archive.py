@@ -0,0 +1,503 @@
+# region Imports
+import os
+import io
+import lzma
+import stat
+import zlib
+import tarfile
+import zipfile
+
+# endregion
+
+
+# region Variables
+STREAM_CHUNK_SIZE = 1024 * 1024
+READ_SIZE = 64 * 1024
+# Fixed entry metadata so identical trees zip to identical bytes
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ZIP_CREATE_SYSTEM = 3
+FILE_MODE = 0o644
+EXECUTABLE_MODE = 0o755
+DIR_MODE = 0o755
+DEFLATE_LEVEL = 6
+# Archive formats by codec name, with their extension, mime type and default level
+CODECS = {
+    "zip": (".zip", "application/zip", DEFLATE_LEVEL),
+    "zip-store": (".zip", "application/zip", 0),
+    "tar.zst": (".tar.zst", "application/zstd", 3),
+    "tar.xz": (".tar.xz", "application/x-xz", 6),
+}
+ZIP_MAGIC = b"PK"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+XZ_MAGIC = b"\xfd7zXZ\x00"
+# Files that are already compressed, stored as is in zips
+INCOMPRESSIBLE_EXTENSIONS = {
+    ".mca",
+    ".mcr",
+    ".zip",
+    ".jar",
+    ".gz",
+    ".tgz",
+    ".xz",
+    ".zst",
+    ".bz2",
+    ".7z",
+    ".rar",
+    ".png",
+    ".jpg",
+    ".jpeg",
+    ".webp",
+    ".ogg",
+    ".mp3",
+    ".mp4",
+    ".webm",
+}
+# Bytes of a file test compressed to guess whether deflating it is worth it
+SAMPLE_SIZE = 64 * 1024
+INCOMPRESSIBLE_RATIO = 0.95
+# Members are checked before extracting, the filter only silences the
+# warning newer Pythons give without one
+EXTRACT_FILTER = {"filter": "data"} if hasattr(tarfile, "data_filter") else {}
+# endregion
+
+
+# region Classes
+
+
+class ChunkBuffer:
+    """
+    Write-only file object that holds the bytes written to it until they
+    are drained, used as the target of a ZipFile that is never on disk
+
+    Attributes
+    ----------
+    chunks: list
+        Bytes written since the last drain
+
+    size: int
+        Number of bytes waiting to be drained
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+
+class CompressingBuffer(ChunkBuffer):
+    """
+    ChunkBuffer that compresses everything written to it
+
+    Attributes
+    ----------
+    compressor: object
+        Object with the compress and flush methods of zlib compressors
+    """
+
+    def __init__(self, compressor):
+        super().__init__()
+        self.compressor = compressor
+
+    def write(self, data) -> int:
+        if compressed := self.compressor.compress(data):
+            super().write(compressed)
+        return len(data)
+
+    def close(self):
+        super().write(self.compressor.flush())
+
+
+# endregion
+
+
+# region Archive functions
+def zip_entry(
+    name: str,
+    mode: int,
+    size: int = 0,
+    directory: bool = False,
+    level: int = DEFLATE_LEVEL,
+):
+    """
+    Returns a zip entry whose metadata only depends on its name, mode and
+    size, never on when or where the archive was made
+
+    Parameters
+    ----------
+    name: str
+        Path of the entry in the archive
+
+    mode: int
+        Permission bits of the entry
+
+    size: int, optional
+        Size of the file, decides whether zip64 headers are used
+
+    directory: bool, optional
+        Whether the entry is a directory
+
+    level: int, optional
+        Deflate level of the entry, 0 stores it uncompressed
+
+    Returns
+    -------
+    zinfo: ZipInfo
+        Entry to pass to ZipFile.open or ZipFile.writestr
+    """
+    if directory and not name.endswith("/"):
+        name += "/"
+    zinfo = zipfile.ZipInfo(name, ZIP_DATE_TIME)
+    zinfo.create_system = ZIP_CREATE_SYSTEM
+    zinfo.file_size = size
+    if directory:
+        zinfo.external_attr = ((stat.S_IFDIR | mode) << 16) | 0x10
+    else:
+        zinfo.external_attr = (stat.S_IFREG | mode) << 16
+    if directory or not level:
+        zinfo.compress_type = zipfile.ZIP_STORED
+    else:
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+        # Renamed from _compresslevel in Python 3.13
+        if hasattr(zinfo, "compress_level"):
+            zinfo.compress_level = level
+        else:
+            zinfo._compresslevel = level
+    return zinfo
+
+
+def incompressible(path: str) -> bool:
+    """
+    Guesses whether a file is already compressed, from its extension or
+    from how well its first SAMPLE_SIZE bytes deflate
+
+    Parameters
+    ----------
+    path: str
+        Path of the file
+
+    Returns
+    -------
+    incompressible: bool
+        Whether compressing the file would only waste CPU
+    """
+    if os.path.splitext(path)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return True
+    with open(path, "rb") as file:
+        sample = file.read(SAMPLE_SIZE)
+    return len(sample) > 0 and len(zlib.compress(sample, 1)) >= (
+        len(sample) * INCOMPRESSIBLE_RATIO
+    )
+
+
+def walk_tree(path: str):
+    """
+    Yields the directories and files under path in a fixed order
+
+    Parameters
+    ----------
+    path: str
+        Directory to walk
+
+    Yields
+    ------
+    entry: tuple
+        Full path, path relative to the directory, and stat result of
+        every regular file, or None in place of the stat for directories
+    """
+    for dirpath, dirnames, filenames in os.walk(path):
+        # Sorting in place also makes os.walk visit directories in order
+        dirnames.sort()
+        for dirname in dirnames:
+            full_path = os.path.join(dirpath, dirname)
+            yield full_path, os.path.relpath(full_path, path), None
+        for filename in sorted(filenames):
+            full_path = os.path.join(dirpath, filename)
+            if os.path.isfile(full_path):
+                yield full_path, os.path.relpath(full_path, path), os.stat(full_path)
+
+
+def file_mode(st: os.stat_result) -> int:
+    """
+    Returns the normalized permissions stored for a file
+    """
+    return EXECUTABLE_MODE if st.st_mode & 0o111 else FILE_MODE
+
+
+def iter_file(path: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Yields the contents of a file in pieces
+
+    Parameters
+    ----------
+    path: str
+        Path of the file
+
+    chunk_size: int, optional
+        Size of the yielded pieces
+
+    Yields
+    ------
+    data: bytes
+        Next piece of the file
+    """
+    with open(path, "rb") as file:
+        while data := file.read(chunk_size):
+            yield data
+
+
+def iter_zip(
+    path: str,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+    level: int = DEFLATE_LEVEL,
+):
+    """
+    Builds a zip of a directory on the fly and yields it in pieces, so it
+    can be fed to an upload without writing the archive to disk
+
+    Entries are sorted and their timestamps and permissions normalized,
+    so the same tree always gives the same bytes. Files that look already
+    compressed are stored as is.
+
+    Parameters
+    ----------
+    path: str
+        Directory to archive, entries are stored relative to it
+
+    chunk_size: int, optional
+        Approximate size of the yielded pieces, memory use stays around this
+
+    level: int, optional
+        Deflate level, 0 stores every file uncompressed
+
+    Yields
+    ------
+    data: bytes
+        Next piece of the zip archive
+    """
+    buffer = ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for full_path, rel_path, st in walk_tree(path):
+            if st is None:
+                archive.writestr(zip_entry(rel_path, DIR_MODE, directory=True), b"")
+                continue
+            zinfo = zip_entry(
+                rel_path,
+                file_mode(st),
+                st.st_size,
+                level=0 if level and incompressible(full_path) else level,
+            )
+            with open(full_path, "rb") as src, archive.open(zinfo, "w") as dest:
+                while block := src.read(READ_SIZE):
+                    dest.write(block)
+                    if buffer.size >= chunk_size:
+                        yield buffer.drain()
+            if buffer.size >= chunk_size:
+                yield buffer.drain()
+    if buffer.size:
+        yield buffer.drain()
+
+
+def tar_entry(name: str, mode: int, size: int = 0, directory: bool = False) -> bytes:
+    """
+    Returns the header of a tar entry with normalized owner, timestamp and
+    permissions
+
+    Parameters
+    ----------
+    name: str
+        Path of the entry in the archive
+
+    mode: int
+        Permission bits of the entry
+
+    size: int, optional
+        Size of the file
+
+    directory: bool, optional
+        Whether the entry is a directory
+
+    Returns
+    -------
+    header: bytes
+        PAX header blocks of the entry
+    """
+    tarinfo = tarfile.TarInfo(name)
+    tarinfo.type = tarfile.DIRTYPE if directory else tarfile.REGTYPE
+    tarinfo.mode = mode
+    tarinfo.size = size
+    tarinfo.mtime = 0
+    return tarinfo.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+
+def iter_tar(path: str, compressor, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Builds a compressed tar of a directory on the fly and yields it in
+    pieces. Entries are sorted and normalized like in iter_zip.
+
+    Parameters
+    ----------
+    path: str
+        Directory to archive, entries are stored relative to it
+
+    compressor: object
+        Compressor the tar stream is written through
+
+    chunk_size: int, optional
+        Approximate size of the yielded pieces
+
+    Yields
+    ------
+    data: bytes
+        Next piece of the compressed archive
+    """
+    buffer = CompressingBuffer(compressor)
+    written = 0
+    for full_path, rel_path, st in walk_tree(path):
+        if st is None:
+            header = tar_entry(rel_path, DIR_MODE, directory=True)
+            buffer.write(header)
+            written += len(header)
+            continue
+        header = tar_entry(rel_path, file_mode(st), st.st_size)
+        buffer.write(header)
+        written += len(header)
+        remaining = st.st_size
+        with open(full_path, "rb") as src:
+            # Stick to the size in the header even if the file changes
+            while remaining and (block := src.read(min(READ_SIZE, remaining))):
+                buffer.write(block)
+                remaining -= len(block)
+                if buffer.size >= chunk_size:
+                    yield buffer.drain()
+        padding = remaining + (-st.st_size % tarfile.BLOCKSIZE)
+        buffer.write(bytes(padding))
+        written += st.st_size + (-st.st_size % tarfile.BLOCKSIZE)
+        if buffer.size >= chunk_size:
+            yield buffer.drain()
+    # Two empty blocks end the archive, padded to a whole record
+    written += 2 * tarfile.BLOCKSIZE
+    buffer.write(bytes(2 * tarfile.BLOCKSIZE + (-written % tarfile.RECORDSIZE)))
+    buffer.close()
+    yield buffer.drain()
+
+
+def zstandard():
+    """
+    Returns the zstandard module, which is only needed for tar.zst backups
+
+    Returns
+    -------
+    zstandard: module
+        The zstandard package
+
+    Raises
+    ------
+    RuntimeError
+        If zstandard isn't installed
+    """
+    try:
+        import zstandard
+    except ImportError as error:
+        raise RuntimeError(
+            "tar.zst backups need the zstandard package, install savehaven[zstd]"
+        ) from error
+    return zstandard
+
+
+def iter_archive(
+    path: str,
+    codec: str = "zip",
+    level: int = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+):
+    """
+    Archives a directory with one of the CODECS and yields it in pieces
+
+    Parameters
+    ----------
+    path: str
+        Directory to archive
+
+    codec: str, optional
+        Key of CODECS
+
+    level: int, optional
+        Compression level, the codec's default if not given
+
+    chunk_size: int, optional
+        Approximate size of the yielded pieces
+
+    Yields
+    ------
+    data: bytes
+        Next piece of the archive
+    """
+    if level is None:
+        level = CODECS[codec][2]
+    if codec == "zip-store":
+        return iter_zip(path, chunk_size, 0)
+    if codec == "zip":
+        return iter_zip(path, chunk_size, level)
+    if codec == "tar.xz":
+        return iter_tar(path, lzma.LZMACompressor(preset=level), chunk_size)
+    if codec == "tar.zst":
+        compressor = zstandard().ZstdCompressor(level=level).compressobj()
+        return iter_tar(path, compressor, chunk_size)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def extract_archive(archive, target: str):
+    """
+    Extracts an archive made by iter_archive, or a zip from older versions,
+    detecting the format from its first bytes
+
+    Parameters
+    ----------
+    archive: file object
+        Seekable binary file holding the archive
+
+    target: str
+        Directory to extract to
+    """
+    archive.seek(0)
+    magic = archive.read(len(XZ_MAGIC))
+    archive.seek(0)
+    if magic.startswith(ZIP_MAGIC):
+        with zipfile.ZipFile(archive) as zip_file:
+            zip_file.extractall(target)
+        return
+    if magic.startswith(XZ_MAGIC):
+        stream = lzma.LZMAFile(archive)
+    elif magic.startswith(ZSTD_MAGIC):
+        stream = io.BufferedReader(
+            zstandard().ZstdDecompressor().stream_reader(archive)
+        )
+    else:
+        raise ValueError("Unknown archive format")
+    with stream, tarfile.open(fileobj=stream, mode="r|") as tar:
+        for member in tar:
+            # Nothing but plain files and directories inside the target
+            path = os.path.realpath(os.path.join(target, member.name))
+            if not (member.isfile() or member.isdir()) or os.path.commonpath(
+                [path, os.path.realpath(target)]
+            ) != os.path.realpath(target):
+                raise ValueError(f"Refusing to extract {member.name}")
+            tar.extract(member, target, set_attrs=False, **EXTRACT_FILTER)
+            if member.isfile():
+                os.chmod(path, member.mode)
+
+
+# endregion
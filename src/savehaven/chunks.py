@@ -0,0 +1,297 @@
+# region Imports
+import os
+import zlib
+import hashlib
+
+from savehaven.state import open_state
+
+# endregion
+
+
+# region Variables
+# Content defined chunking parameters, the average chunk size is 2**20 bytes
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+CHUNK_MASK = (1 << 20) - 1
+# Only the low bits of the hash decide cuts, and they only depend on the
+# last CHUNK_WINDOW bytes since the hash shifts by one bit per byte
+CHUNK_WINDOW = CHUNK_MASK.bit_length()
+# Bytes hashed per vectorized step, cuts are usually found in the first
+CUT_BLOCK = 1024 * 1024
+# Fixed "random" values for the gear rolling hash, identical on every machine
+GEAR = [
+    int.from_bytes(hashlib.sha256(bytes([value])).digest()[:8], "little")
+    for value in range(256)
+]
+# Low bits of GEAR as a numpy array, built on first use
+gear_array = None
+SNAPSHOT_SUFFIX = ".snapshot.json"
+# endregion
+
+
+# region Chunk functions
+def find_cut(data: bytes) -> int:
+    """
+    Finds where the first chunk of data ends, using a gear rolling hash so
+    boundaries move with the content instead of with byte offsets
+
+    Parameters
+    ----------
+    data: bytes
+        Data starting at a chunk boundary, at most MAX_CHUNK_SIZE long
+
+    Returns
+    -------
+    cut: int
+        Length of the first chunk
+    """
+    if len(data) <= MIN_CHUNK_SIZE:
+        return len(data)
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is not None:
+        return find_cut_vectorized(numpy, data)
+    rolling = 0
+    gear = [value & CHUNK_MASK for value in GEAR]
+    for index, byte in enumerate(memoryview(data)[MIN_CHUNK_SIZE:], MIN_CHUNK_SIZE):
+        rolling = ((rolling << 1) + gear[byte]) & CHUNK_MASK
+        if not rolling:
+            return index + 1
+    return len(data)
+
+
+def find_cut_vectorized(numpy, data: bytes) -> int:
+    """
+    find_cut over numpy arrays, CUT_BLOCK bytes at a time. The low bits
+    of the hash at every byte are the sum of the gear values of the bytes
+    before it, each shifted by its distance, and the ones CHUNK_WINDOW or
+    more bytes back are shifted out. Windows of 1, 2, 4... bytes are
+    added up by doubling, so a block is hashed in a handful of array
+    operations that run without the GIL.
+    """
+    global gear_array
+    if gear_array is None:
+        gear_array = numpy.array(
+            [value & CHUNK_MASK for value in GEAR], dtype=numpy.uint32
+        )
+    values = numpy.frombuffer(data, dtype=numpy.uint8)
+    for start in range(MIN_CHUNK_SIZE, len(data), CUT_BLOCK):
+        # Bytes before MIN_CHUNK_SIZE never count towards the hash
+        low = max(MIN_CHUNK_SIZE, start - CHUNK_WINDOW + 1)
+        rolling = gear_array.take(values[low : start + CUT_BLOCK])
+        width = 1
+        while width < CHUNK_WINDOW:
+            # Overflowing uint32 leaves the low bits intact
+            shifted = rolling[:-width] << width
+            rolling[width:] += shifted
+            width *= 2
+        cuts = numpy.flatnonzero((rolling[start - low :] & CHUNK_MASK) == 0)
+        if cuts.size:
+            return start + int(cuts[0]) + 1
+    return len(data)
+
+
+def iter_chunks(path: str):
+    """
+    Splits a file into content defined chunks, reading at most
+    MAX_CHUNK_SIZE bytes at a time
+
+    Parameters
+    ----------
+    path: str
+        Path of the file
+
+    Yields
+    ------
+    chunk: bytes
+        Next chunk of the file
+    """
+    with open(path, "rb") as file:
+        pending = b""
+        while True:
+            pending += file.read(MAX_CHUNK_SIZE - len(pending))
+            if not pending:
+                break
+            cut = find_cut(pending)
+            yield pending[:cut]
+            pending = pending[cut:]
+
+
+def chunk_id(chunk: bytes) -> str:
+    """
+    Returns the content address of a chunk, used as its file name in the
+    chunk store
+
+    Parameters
+    ----------
+    chunk: bytes
+        Uncompressed chunk
+
+    Returns
+    -------
+    chunk_id: str
+        Hex SHA-256 of the chunk
+    """
+    return hashlib.sha256(chunk).hexdigest()
+
+
+def pack_chunk(chunk: bytes) -> bytes:
+    """
+    Compresses a chunk for the chunk store
+    """
+    return zlib.compress(chunk)
+
+
+def unpack_chunk(data: bytes) -> bytes:
+    """
+    Decompresses a chunk downloaded from the chunk store
+    """
+    return zlib.decompress(data)
+
+
+def load_chunk_index(save_path: str, store_key: str) -> dict:
+    """
+    Returns the chunk lists recorded by the last chunked backup of a save
+    to the same chunk store
+
+    Parameters
+    ----------
+    save_path: str
+        Path of the save directory
+
+    store_key: str
+        Key of the chunk store the backup goes to, see chunk_store
+
+    Returns
+    -------
+    index: dict
+        [size, mtime_ns, chunk ids] of every file keyed by relative path,
+        empty if the last backup went to another chunk store
+    """
+    stored = open_state().chunk_index(os.path.abspath(save_path))
+    # Chunks listed for another store may never have been uploaded to this one
+    if stored is None or stored[0] != store_key:
+        return {}
+    return stored[1]
+
+
+def save_chunk_index(save_path: str, store_key: str, index: dict):
+    """
+    Stores the chunk lists of a save directory in state.db
+
+    Parameters
+    ----------
+    save_path: str
+        Path of the save directory
+
+    store_key: str
+        Key of the chunk store the chunks were uploaded to
+
+    index: dict
+        Chunk index as returned by build_snapshot
+    """
+    open_state().put_chunk_index(os.path.abspath(save_path), store_key, index)
+
+
+def build_snapshot(
+    save_path: str, manifest: dict, new_chunk, store_key: str, has_chunk
+):
+    """
+    Splits every file of a save into chunks, only reading files whose size
+    or mtime changed since the last chunked backup to the same store and
+    whose chunks are all still in it
+
+    Parameters
+    ----------
+    save_path: str
+        Path of the save directory
+
+    manifest: dict
+        Manifest of the save as returned by scan_tree
+
+    new_chunk: callable
+        Called with the id and contents of every chunk read from disk,
+        decides whether it has to be uploaded
+
+    store_key: str
+        Key of the chunk store, see load_chunk_index
+
+    has_chunk: callable
+        Called with a chunk id, returns whether the store holds it
+
+    Returns
+    -------
+    snapshot: dict
+        Size and chunk ids of every file, keyed by relative path
+
+    index: dict
+        Updated chunk index to store with save_chunk_index
+    """
+    old_index = load_chunk_index(save_path, store_key)
+    index = {}
+    files = {}
+    for rel_path in sorted(manifest):
+        size, mtime_ns = manifest[rel_path][:2]
+        old = old_index.get(rel_path)
+        if old and old[:2] == [size, mtime_ns] and all(map(has_chunk, old[2])):
+            chunk_ids = old[2]
+        else:
+            chunk_ids = []
+            for chunk in iter_chunks(os.path.join(save_path, rel_path)):
+                chunk_ids.append(chunk_id(chunk))
+                new_chunk(chunk_ids[-1], chunk)
+        index[rel_path] = [size, mtime_ns, chunk_ids]
+        files[rel_path] = {"size": size, "chunks": chunk_ids}
+    # Directories with files in them are made when restoring those files
+    dirs = sorted(
+        os.path.relpath(directory, save_path)
+        for directory, subdirs, filenames in os.walk(save_path)
+        if not subdirs and not filenames and directory != save_path
+    )
+    return {"version": 1, "files": files, "dirs": dirs}, index
+
+
+def restore_snapshot(snapshot: dict, target: str, read_chunk):
+    """
+    Rebuilds the files and empty directories of a snapshot in a directory.
+    Snapshots made before empty directories were recorded only restore
+    files.
+
+    Parameters
+    ----------
+    snapshot: dict
+        Snapshot as returned by build_snapshot
+
+    target: str
+        Directory to write the files to
+
+    read_chunk: callable
+        Called with a chunk id, returns the uncompressed chunk
+
+    Raises
+    ------
+    ValueError
+        If a path in the snapshot points outside target, nothing is
+        written then
+    """
+    root = os.path.realpath(target)
+    paths = {}
+    for rel_path in (*snapshot["files"], *snapshot.get("dirs", [])):
+        # Nothing outside the target, like extract_archive
+        path = os.path.realpath(os.path.join(target, rel_path))
+        if path == root or os.path.commonpath([path, root]) != root:
+            raise ValueError(f"Refusing to restore {rel_path}")
+        paths[rel_path] = path
+    for rel_path in snapshot.get("dirs", []):
+        os.makedirs(paths[rel_path], exist_ok=True)
+    for rel_path, entry in snapshot["files"].items():
+        path = paths[rel_path]
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            for chunk in entry["chunks"]:
+                file.write(read_chunk(chunk))
+
+
+# endregion
@@ -0,0 +1,904 @@
+# region Imports
+import io
+import ssl
+import json
+import time
+import uuid
+import queue
+import random
+import itertools
+import threading
+import http.client
+
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from httplib2 import ServerNotFoundError
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import (
+    MediaIoBaseUpload,
+    MediaUpload,
+    build_http,
+)
+
+from savehaven.configs import get_creds
+from savehaven.metrics import count
+from savehaven.storage import Backend, StorageError, FOLDER_MIME_TYPE
+
+# endregion
+
+
+# region Variables
+# Most calls Drive accepts in one batch request
+BATCH_SIZE = 100
+# Folders listed by one query when walking a tree, keeps queries short
+TREE_QUERY_FOLDERS = 50
+TREE_FIELDS = (
+    "id, name, mimeType, modifiedTime, size, md5Checksum, appProperties, parents"
+)
+CHANGE_FIELDS = f"fileId, removed, file({TREE_FIELDS}, trashed)"
+# Resumable upload chunks must be multiples of this
+CHUNK_GRANULARITY = 256 * 1024
+# Bounds of adaptive chunk sizes, uploads keep one chunk in memory
+MIN_CHUNK_SIZE = CHUNK_GRANULARITY
+MAX_CHUNK_SIZE = 128 * 1024 * 1024
+# Adaptive chunks grow while requests take less than half this and shrink
+# when they take more than twice this
+TARGET_CHUNK_SECONDS = 4
+# Uploads up to this size are sent in a single request
+SINGLE_REQUEST_SIZE = 5 * 1024 * 1024
+# Idle authorized connections kept for reuse, more are opened while
+# more requests than this run at once
+HTTP_POOL_SIZE = 16
+# Statuses of requests that may succeed if sent again
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Reasons Drive gives for quota errors sent as 403 instead of 429
+RATE_LIMIT_REASONS = {"userRateLimitExceeded", "rateLimitExceeded"}
+# Dropped connections and timeouts, sent again as well
+RETRY_EXCEPTIONS = (
+    ConnectionError,
+    TimeoutError,
+    ssl.SSLError,
+    http.client.HTTPException,
+    ServerNotFoundError,
+)
+# appProperties key tagging files created in a single request, so a retry
+# can tell whether the failed try created the file anyway
+CREATE_PROPERTY = "savehavenCreate"
+# Tries of a request before its error is raised
+MAX_ATTEMPTS = 7
+# Backoff before the nth retry is random up to BACKOFF_BASE * 2**n seconds,
+# capped at BACKOFF_CAP
+BACKOFF_BASE = 1
+BACKOFF_CAP = 64
+# Longest Retry-After honored, in seconds
+MAX_RETRY_AFTER = 300
+# Rate limits within this many seconds of the last cut only cut the
+# number of requests in flight once, they're usually from the same burst
+THROTTLE_COOLDOWN = 2
+# endregion
+
+
+# region Functions
+@contextmanager
+def storage_errors():
+    """
+    Turns Drive API errors into StorageError
+    """
+    try:
+        yield
+    except HttpError as error:
+        raise StorageError(str(error), error.resp.status) from error
+    except RETRY_EXCEPTIONS as error:
+        raise StorageError(str(error)) from error
+
+
+def storage_error(error: Exception) -> StorageError:
+    """
+    Returns the StorageError for an error of a batched call
+    """
+    if error is None or isinstance(error, StorageError):
+        return error
+    if isinstance(error, HttpError):
+        return StorageError(str(error), error.resp.status)
+    return StorageError(str(error))
+
+
+def rate_limited(error: Exception) -> bool:
+    """
+    Returns whether Drive rejected a request for going over a quota
+    """
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 429:
+        return True
+    if error.resp.status != 403:
+        return False
+    try:
+        errors = json.loads(error.content)["error"].get("errors", [])
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return False
+    return any(item.get("reason") in RATE_LIMIT_REASONS for item in errors)
+
+
+def retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Returns how long to wait before sending a failed request again:
+    exponential backoff with full jitter, or longer if Drive asked for it
+    with Retry-After
+
+    Parameters
+    ----------
+    error: Exception
+        What the request raised
+
+    attempt: int
+        Number of retries already made
+
+    Returns
+    -------
+    delay: float
+        Seconds to wait, None if the request shouldn't be retried
+    """
+    if isinstance(error, HttpError):
+        if error.resp.status not in RETRY_STATUSES and not rate_limited(error):
+            return None
+        retry_after = error.resp.get("retry-after")
+    elif isinstance(error, RETRY_EXCEPTIONS):
+        retry_after = None
+    else:
+        return None
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+    if retry_after:
+        try:
+            wait = float(retry_after)
+        except ValueError:
+            try:
+                wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                wait = 0
+        delay = max(delay, min(wait, MAX_RETRY_AFTER))
+    return delay
+
+
+# endregion
+
+
+# region Classes
+
+
+class Throttle:
+    """
+    Adaptive limit on Drive requests in flight across threads. Halved
+    whenever Drive reports a rate limit and raised again by one request
+    for every limit requests that succeed, so parallel backups settle at
+    the highest rate the quota allows instead of failing.
+
+    Attributes
+    ----------
+    maximum: int
+        Most requests in flight, the limit starts there
+
+    limit: float
+        Current limit, at least 1
+    """
+
+    def __init__(self, maximum: int):
+        self.maximum = maximum
+        self.limit = float(maximum)
+        self.in_flight = 0
+        self.last_cut = 0.0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def slow_down(self):
+        """
+        Halves the limit after a rate limit
+        """
+        with self.condition:
+            now = time.monotonic()
+            if now - self.last_cut < THROTTLE_COOLDOWN:
+                return
+            self.last_cut = now
+            self.limit = max(1.0, self.limit / 2)
+        count("drive_throttles")
+        print(f"Drive rate limit reached, sending {int(self.limit)} requests at a time")
+
+    def speed_up(self):
+        """
+        Raises the limit a little after a request succeeded
+        """
+        with self.condition:
+            before = int(self.limit)
+            self.limit = min(float(self.maximum), self.limit + 1 / self.limit)
+            if int(self.limit) > before:
+                self.condition.notify_all()
+
+
+class HttpPool:
+    """
+    Thread-safe pool of HTTP objects, shared by every thread in place of
+    a single httplib2.Http. Each request borrows an idle HTTP object, so
+    concurrent requests never share a connection, and returns it once the
+    response is read, so its keep-alive connection is reused by the next
+    request from any thread instead of paying a new TLS handshake.
+
+    Attributes
+    ----------
+    factory: callable
+        Returns a new HTTP object, e.g. an AuthorizedHttp
+
+    size: int
+        Most idle HTTP objects kept
+    """
+
+    def __init__(self, factory, size: int = HTTP_POOL_SIZE):
+        self.factory = factory
+        self.size = size
+        # Most recently used first, its connection is the likeliest to be open
+        self.idle = queue.LifoQueue()
+
+    def checkout(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self.factory()
+
+    def checkin(self, http):
+        if self.idle.qsize() < self.size:
+            self.idle.put(http)
+        else:
+            http.close()
+
+    def request(self, *args, **kwargs):
+        http = self.checkout()
+        try:
+            response = http.request(*args, **kwargs)
+        except Exception:
+            # The connection may be left half used
+            http.close()
+            raise
+        self.checkin(http)
+        return response
+
+    @property
+    def credentials(self):
+        # Read by googleapiclient to refresh tokens after a 401 in a batch
+        http = self.checkout()
+        self.checkin(http)
+        return getattr(http, "credentials", None)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class ChunkTuner:
+    """
+    Picks how many bytes the next request of a transfer carries. The size
+    stays fixed unless adaptive, in which case it doubles while requests
+    finish quickly, and halves when they're slow or fail, so slow links
+    get short requests and fast ones keep the pipe full.
+
+    Attributes
+    ----------
+    size: int
+        Bytes to send or fetch in the next request
+
+    adaptive: bool
+        Whether the size follows the measured throughput
+    """
+
+    def __init__(self, size: int, adaptive: bool = False):
+        self.size = size
+        self.adaptive = adaptive
+
+    def _resize(self, size: int):
+        size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE, size))
+        self.size = size - size % CHUNK_GRANULARITY
+
+    def finished(self, seconds: float, transferred: int):
+        """
+        Records a successful request of transferred bytes
+        """
+        if not self.adaptive:
+            return
+        if seconds < TARGET_CHUNK_SECONDS / 2 and transferred >= self.size:
+            self._resize(self.size * 2)
+        elif seconds > TARGET_CHUNK_SECONDS * 2:
+            self._resize(self.size // 2)
+
+    def failed(self):
+        """
+        Records a failed request
+        """
+        if self.adaptive:
+            self._resize(self.size // 2)
+
+
+class StreamingUpload(MediaUpload):
+    """
+    Resumable upload fed from an iterator of bytes whose total size isn't
+    known up front. Only the bytes Drive hasn't acknowledged yet are kept
+    in memory.
+
+    Attributes
+    ----------
+    chunks: iterator
+        Iterator yielding the bytes to upload
+
+    mime_type: str
+        Mime type of the uploaded file
+
+    chunk_size: int
+        Bytes sent per request, must be a multiple of 256 KiB. Only
+        changed between requests with resize.
+    """
+
+    def __init__(self, chunks, mime_type: str, chunk_size: int):
+        self._chunks = iter(chunks)
+        self._mime_type = mime_type
+        self._chunk_size = chunk_size
+        self._buffer = bytearray()
+        # Stream offset of the first byte in the buffer
+        self._offset = 0
+        # Stream offset right after the last chunk handed out
+        self._sent = 0
+        self._done = False
+
+    def _fill(self, end: int):
+        while not self._done and self._offset + len(self._buffer) < end:
+            try:
+                self._buffer += next(self._chunks)
+            except StopIteration:
+                self._done = True
+
+    def resize(self, chunk_size: int):
+        self._chunk_size = chunk_size
+
+    def chunksize(self) -> int:
+        return self._chunk_size
+
+    def mimetype(self) -> str:
+        return self._mime_type
+
+    def resumable(self) -> bool:
+        return True
+
+    def size(self):
+        # Read one byte past the next chunk so the final chunk is sent with
+        # the real total, even when the stream ends on a chunk boundary
+        self._fill(self._sent + self._chunk_size + 1)
+        return self._offset + len(self._buffer) if self._done else None
+
+    def _skip(self, begin: int):
+        # Throw away bytes Drive already has, without buffering them, when
+        # a session is resumed far into the stream
+        if begin <= self._offset + len(self._buffer):
+            return
+        self._offset += len(self._buffer)
+        self._buffer = bytearray()
+        while not self._done and self._offset < begin:
+            try:
+                data = next(self._chunks)
+            except StopIteration:
+                self._done = True
+                break
+            if self._offset + len(data) > begin:
+                self._buffer += data[begin - self._offset :]
+                self._offset = begin
+            else:
+                self._offset += len(data)
+
+    def getbytes(self, begin: int, length: int) -> bytes:
+        self._skip(begin)
+        self._fill(begin + length)
+        del self._buffer[: begin - self._offset]
+        self._offset = begin
+        self._sent = begin + min(length, len(self._buffer))
+        return bytes(self._buffer[:length])
+
+
+class DriveBackend(Backend):
+    """
+    Stores backups in Google Drive
+
+    Attributes
+    ----------
+    upload_tuner: ChunkTuner
+        Size of the chunks sent by resumable uploads
+
+    download_tuner: ChunkTuner
+        Size of the chunks fetched by downloads
+    """
+
+    remote = True
+    location = "drive"
+
+    def __init__(
+        self,
+        upload_chunk_size: int,
+        download_chunk_size: int = None,
+        adaptive: bool = False,
+    ):
+        # Shared by every transfer, so what one learns about the link
+        # carries over to the next
+        self.upload_tuner = ChunkTuner(upload_chunk_size, adaptive)
+        self.download_tuner = ChunkTuner(
+            download_chunk_size or upload_chunk_size, adaptive
+        )
+        # httplib2 isn't thread safe, requests from every thread borrow
+        # a connection from the pool instead
+        self.http = HttpPool(self.new_http)
+        self.throttle = Throttle(HTTP_POOL_SIZE)
+        self.client = None
+        self.client_lock = threading.Lock()
+
+    def new_http(self):
+        """
+        Returns a new authorized HTTP object for the pool
+        """
+        from google_auth_httplib2 import AuthorizedHttp
+
+        return AuthorizedHttp(get_creds(), http=build_http())
+
+    def build_client(self):
+        """
+        Returns a Drive client sending its requests through the pool
+        """
+        return build("drive", "v3", http=self.http)
+
+    def service(self):
+        """
+        Returns the Drive client shared by every thread, building it on
+        first use
+        """
+        with self.client_lock:
+            if self.client is None:
+                self.client = self.build_client()
+        return self.client
+
+    def call(self, send):
+        """
+        Sends one Drive request by calling send, sending it again with
+        backoff while it fails with a rate limit, a server error or a
+        dropped connection. Waits for the throttle before every try.
+
+        Parameters
+        ----------
+        send: callable
+            Sends the request and returns the response
+
+        Returns
+        -------
+        response:
+            What send returned
+        """
+        for attempt in itertools.count():
+            self.throttle.acquire()
+            count("drive_requests")
+            try:
+                response = send()
+            except Exception as error:
+                self.throttle.release()
+                delay = retry_delay(error, attempt)
+                if delay is None or attempt + 1 >= MAX_ATTEMPTS:
+                    raise
+                if rate_limited(error):
+                    self.throttle.slow_down()
+                count("drive_retries")
+                time.sleep(delay)
+                continue
+            self.throttle.release()
+            self.throttle.speed_up()
+            return response
+
+    def execute(self, request) -> dict:
+        """
+        Executes a Drive API request, retrying it if needed
+        """
+        with storage_errors():
+            return self.call(request.execute)
+
+    def create(self, body: dict, media_body=None) -> str:
+        """
+        Creates a file or folder in a single request and returns its ID.
+        Creating isn't idempotent: a try that failed with a server error
+        or a dropped connection may still have created the file. Every
+        create is tagged with a random CREATE_PROPERTY, and retries look
+        for a file with the tag in the same parent before sending the
+        request again.
+        """
+        tag = uuid.uuid4().hex
+        properties = dict(body.get("appProperties") or {}, **{CREATE_PROPERTY: tag})
+        body = dict(body, appProperties=properties)
+        # pylint: disable=maybe-no-member
+        files = self.service().files()
+        request = files.create(body=body, media_body=media_body, fields="id")
+        query = (
+            f"appProperties has {{ key='{CREATE_PROPERTY}' and value='{tag}' }}"
+            " and trashed=false"
+        )
+        if body.get("parents"):
+            query += f" and '{body['parents'][0]}' in parents"
+        attempts = itertools.count()
+
+        def send() -> dict:
+            if next(attempts):
+                # Sent directly, the throttle slot of this call covers it
+                found = files.list(
+                    q=query, spaces="drive", fields="files(id)"
+                ).execute()
+                if found.get("files"):
+                    return found["files"][0]
+            return request.execute()
+
+        with storage_errors():
+            return self.call(send)["id"]
+
+    def batch(self, requests: list) -> list:
+        """
+        Executes requests through the batch endpoint, BATCH_SIZE at a time.
+        Calls in a batch can fail on their own, the ones that may succeed
+        later are sent again in a new batch after a backoff.
+
+        Returns a (response, error) pair for every request, in order
+        """
+        results = [None] * len(requests)
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        pending = list(range(len(requests)))
+        for attempt in itertools.count():
+            for start in range(0, len(pending), BATCH_SIZE):
+                group = pending[start : start + BATCH_SIZE]
+                batch = self.service().new_batch_http_request(callback=callback)
+                for index in group:
+                    batch.add(requests[index], request_id=str(index))
+                count("drive_batched_calls", len(group))
+                with storage_errors():
+                    self.call(batch.execute)
+            delays = {
+                index: retry_delay(results[index][1], attempt)
+                for index in pending
+                if results[index][1] is not None
+            }
+            pending = [index for index, delay in delays.items() if delay is not None]
+            if not pending or attempt + 1 >= MAX_ATTEMPTS:
+                break
+            if any(rate_limited(results[index][1]) for index in pending):
+                self.throttle.slow_down()
+            count("drive_retries", len(pending))
+            time.sleep(max(delays[index] for index in pending))
+        return [(response, storage_error(error)) for response, error in results]
+
+    def list_files(
+        self, query: str, fields: str = "id, name, mimeType, modifiedTime"
+    ) -> list:
+        """
+        Returns every file matching a Drive search query, following pages
+        """
+        files = []
+        page_token = None
+        while True:
+            # pylint: disable=maybe-no-member
+            response = self.execute(
+                self.service()
+                .files()
+                .list(
+                    q=query,
+                    spaces="drive",
+                    pageSize=1000,
+                    fields=f"nextPageToken, files({fields})",
+                    pageToken=page_token,
+                )
+            )
+            files.extend(response.get("files", []))
+            page_token = response.get("nextPageToken", None)
+            if page_token is None:
+                return files
+
+    def search(self, name: str, parent: str = None, folder: bool = False) -> list:
+        query = f"name='{name}' and trashed=false"
+        if folder:
+            query += f" and mimeType='{FOLDER_MIME_TYPE}'"
+        if parent:
+            query += f" and '{parent}' in parents"
+        return self.list_files(query)
+
+    def make_folder(self, name: str, parent: str = None) -> str:
+        file_metadata = {"name": name, "mimeType": FOLDER_MIME_TYPE}
+        if parent:
+            file_metadata["parents"] = [parent]
+        return self.create(file_metadata)
+
+    def list_folder(self, folder_id: str) -> list:
+        return self.list_files(f"'{folder_id}' in parents and trashed=false")
+
+    def list_tree(self, folder_id: str) -> list:
+        # One query per level of the tree instead of one per folder
+        files = []
+        folders = [folder_id]
+        while folders:
+            level = []
+            for start in range(0, len(folders), TREE_QUERY_FOLDERS):
+                group = folders[start : start + TREE_QUERY_FOLDERS]
+                parents = " or ".join(f"'{parent}' in parents" for parent in group)
+                for file in self.list_files(
+                    f"({parents}) and trashed=false", TREE_FIELDS
+                ):
+                    file["parent"] = next(
+                        parent for parent in file["parents"] if parent in group
+                    )
+                    level.append(file)
+            files.extend(level)
+            folders = [
+                file["id"] for file in level if file["mimeType"] == FOLDER_MIME_TYPE
+            ]
+        return files
+
+    def upload(
+        self,
+        chunks,
+        name: str,
+        parent: str = None,
+        file_id: str = None,
+        mime_type: str = "application/octet-stream",
+        resumable: bool = True,
+        properties: dict = None,
+        session=None,
+    ) -> str:
+        if resumable:
+            # Small files go in one request instead of opening a session
+            chunks = iter(chunks)
+            head = []
+            read = 0
+            for chunk in chunks:
+                head.append(chunk)
+                read += len(chunk)
+                if read > SINGLE_REQUEST_SIZE:
+                    chunks = itertools.chain(head, chunks)
+                    break
+            else:
+                chunks = head
+                resumable = False
+                if session:
+                    session.finish()
+        if resumable:
+            media = StreamingUpload(chunks, mime_type, self.upload_tuner.size)
+        else:
+            media = MediaIoBaseUpload(
+                io.BytesIO(b"".join(chunks)), mime_type, resumable=False
+            )
+        files = self.service().files()
+        body = {"appProperties": properties} if properties else {}
+        if file_id:
+            request = files.update(
+                fileId=file_id, body=body, media_body=media, fields="id"
+            )
+        else:
+            body["name"] = name
+            if parent:
+                body["parents"] = [parent]
+            if not resumable:
+                return self.create(body, media)
+            # Retried chunks go to the same session, they can't create a
+            # second file
+            request = files.create(body=body, media_body=media, fields="id")
+        if not resumable:
+            return self.execute(request)["id"]
+        if session and session.uri:
+            # Carries on from what Drive has of the session, which may be
+            # more than the journal recorded
+            offset, drive_file = self.session_progress(session.uri)
+            if drive_file:
+                session.finish()
+                return drive_file["id"]
+            request.resumable_uri = session.uri
+            request.resumable_progress = offset
+
+        def send_chunk():
+            # After a failure the next call asks Drive how much it has first
+            media.resize(self.upload_tuner.size)
+            started = time.monotonic()
+            try:
+                response = request.next_chunk()
+            except Exception:
+                self.upload_tuner.failed()
+                raise
+            return response, time.monotonic() - started
+
+        drive_file = None
+        with storage_errors():
+            while drive_file is None:
+                progress = request.resumable_progress
+                (status, drive_file), seconds = self.call(send_chunk)
+                if status:
+                    self.upload_tuner.finished(
+                        seconds, status.resumable_progress - progress
+                    )
+                    uploaded = status.resumable_progress // (1024 * 1024)
+                    print(f"{name}: uploaded {uploaded} MiB")
+                    if session:
+                        session.commit(request.resumable_uri, status.resumable_progress)
+        if session:
+            session.finish()
+        return drive_file["id"]
+
+    def session_progress(self, uri: str) -> tuple:
+        """
+        Asks Drive how much of a resumable upload session it has, with an
+        empty PUT carrying "Content-Range: bytes */*"
+
+        Parameters
+        ----------
+        uri: str
+            Session URI returned when the upload started
+
+        Returns
+        -------
+        progress: tuple
+            Bytes Drive has, and the uploaded file if the session already
+            completed, None otherwise. Expired sessions raise StorageError
+            with status 404 or 410
+        """
+
+        def send() -> tuple:
+            response, content = self.http.request(
+                uri,
+                "PUT",
+                headers={"Content-Range": "bytes */*", "Content-Length": "0"},
+            )
+            if response.status in (200, 201):
+                return 0, json.loads(content)
+            if response.status != 308:
+                raise HttpError(response, content, uri=uri)
+            # "bytes=0-<last byte>", missing when Drive has nothing yet
+            if "range" not in response:
+                return 0, None
+            return int(response["range"].rpartition("-")[2]) + 1, None
+
+        with storage_errors():
+            return self.call(send)
+
+    def download(self, file_id: str, fd, chunk_size: int = None):
+        # Ranged GETs are sent directly instead of through MediaIoBaseDownload,
+        # whose chunk size can't change once it started
+        # pylint: disable=maybe-no-member
+        uri = self.service().files().get_media(fileId=file_id).uri
+        tuner = ChunkTuner(chunk_size) if chunk_size else self.download_tuner
+        progress = 0
+        total = None
+
+        def receive_chunk():
+            started = time.monotonic()
+            try:
+                response, content = self.http.request(
+                    uri,
+                    "GET",
+                    headers={"Range": f"bytes={progress}-{progress + tuner.size - 1}"},
+                )
+                # 416 is what an empty file gets
+                if response.status not in (200, 206, 416):
+                    raise HttpError(response, content, uri=uri)
+            except Exception:
+                tuner.failed()
+                raise
+            return response, content, time.monotonic() - started
+
+        with storage_errors():
+            while total is None or progress < total:
+                response, content, seconds = self.call(receive_chunk)
+                if "content-range" in response:
+                    total = int(response["content-range"].rpartition("/")[2])
+                elif response.status == 200:
+                    total = progress + len(content)
+                if response.status == 416:
+                    if total != 0:
+                        raise HttpError(response, content, uri=uri)
+                    break
+                fd.write(content)
+                progress += len(content)
+                tuner.finished(seconds, len(content))
+                print(f"Download {int(progress / total * 100) if total else 100}.")
+
+    def delete(self, file_id: str):
+        self.execute(self.service().files().delete(fileId=file_id))
+
+    def modified_time(self, file_id: str) -> str:
+        return self.execute(
+            self.service().files().get(fileId=file_id, fields="modifiedTime")
+        )["modifiedTime"]
+
+    def get_revisions(self, file_id: str) -> list:
+        return self.execute(
+            self.service()
+            .revisions()
+            .list(fileId=file_id, fields="revisions(id, modifiedTime, keepForever)")
+        ).get("revisions", [])
+
+    def start_page_token(self) -> str:
+        return self.execute(self.service().changes().getStartPageToken())[
+            "startPageToken"
+        ]
+
+    def changes(self, token: str) -> tuple:
+        changes = []
+        while True:
+            response = self.execute(
+                self.service()
+                .changes()
+                .list(
+                    pageToken=token,
+                    spaces="drive",
+                    pageSize=1000,
+                    includeRemoved=True,
+                    fields="nextPageToken, newStartPageToken, "
+                    f"changes({CHANGE_FIELDS})",
+                )
+            )
+            changes.extend(response.get("changes", []))
+            if "newStartPageToken" in response:
+                return changes, response["newStartPageToken"]
+            token = response["nextPageToken"]
+
+    def keep_revision(self, file_id: str, revision_id: str):
+        self.execute(self.keep_revision_request(file_id, revision_id))
+
+    def keep_revision_request(self, file_id: str, revision_id: str):
+        return (
+            self.service()
+            .revisions()
+            .update(
+                fileId=file_id,
+                revisionId=revision_id,
+                body={"keepForever": True},
+            )
+        )
+
+    def batch_get_revisions(self, file_ids: list) -> list:
+        results = self.batch(
+            [
+                self.service()
+                .revisions()
+                .list(
+                    fileId=file_id,
+                    fields="revisions(id, modifiedTime, keepForever)",
+                )
+                for file_id in file_ids
+            ]
+        )
+        return [
+            (response.get("revisions", []) if response else None, error)
+            for response, error in results
+        ]
+
+    def batch_keep_revisions(self, revisions: list) -> list:
+        return self.batch(
+            [
+                self.keep_revision_request(file_id, revision_id)
+                for file_id, revision_id in revisions
+            ]
+        )
+
+    def batch_delete(self, file_ids: list) -> list:
+        return self.batch(
+            [self.service().files().delete(fileId=file_id) for file_id in file_ids]
+        )
+
+
+# endregion
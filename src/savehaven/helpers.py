@@ -2,28 +2,44 @@
 import os
 import io
 import json
+import getpass
 import sqlite3
-import requests
+import threading
+import time
 import configparser
-import inquirer
+import importlib.util
 
-from pyfzf.pyfzf import FzfPrompt
 from datetime import datetime, timezone
-from appdirs import user_config_dir, user_data_dir
-from bs4 import BeautifulSoup
-from shutil import make_archive, unpack_archive, move, copytree
-from inquirer.themes import GreenPassion
-from tqdm import tqdm
-
-import google.auth
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-
-from savehaven.configs import creds
+from fnmatch import fnmatch
+from appdirs import user_config_dir
+from shutil import move, rmtree
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+
+# Only the light modules are imported here so commands that don't touch
+# Drive or PCGamingWiki start quickly, the rest is imported where it's used
+from savehaven.storage import Backend, LocalBackend, StorageError, FOLDER_MIME_TYPE
+from savehaven.archive import CODECS, iter_archive, iter_file, extract_archive
+from savehaven.manifest import (
+    scan_tree,
+    latest_mtime,
+    manifest_changed,
+    load_manifest,
+    save_manifest,
+    tree_fingerprint,
+)
+from savehaven.journal import UploadJournal
+from savehaven.state import open_state
+from savehaven.metrics import count, span, timed, timed_chunks
+from savehaven.mirror import new_mirror, load_mirror, save_mirror, apply_changes
+from savehaven.chunks import (
+    SNAPSHOT_SUFFIX,
+    build_snapshot,
+    restore_snapshot,
+    save_chunk_index,
+    pack_chunk,
+    unpack_chunk,
+)
 
 
 # endregion
@@ -34,20 +50,53 @@ SCOPES = ["https://www.googleapis.com/auth/drive"]
 config_dir = user_config_dir("SaveHaven", "Aurelia")
 backups_dir = os.path.join(config_dir, "Backups")
 tmp_dir = os.path.join(config_dir, "tmp")
-if not os.path.exists(config_dir):
-    os.mkdir(config_dir)
-    os.mkdir(backups_dir)
-    os.mkdir(tmp_dir)
-list_file = os.path.join(config_dir, "game_list.json")
+for directory in (config_dir, backups_dir, tmp_dir):
+    os.makedirs(directory, exist_ok=True)
+pcgw_cache_file = os.path.join(config_dir, "pcgw_cache.db")
 home_path = os.path.expanduser("~")
 games_dir = os.path.join(home_path, "Games")
 heroic_dir = os.path.join(games_dir, "Heroic", "Prefixes")
 heroic_saves = []
 persistent = False
 overwrite = False
-# create drive api client
-service = build("drive", "v3", credentials=creds)
-fzf = FzfPrompt()
+# MiB sent per upload request, unless set in config.ini. Bounds the memory
+# used by streamed uploads
+default_upload_chunk_mib = 16
+# MiB requested per download request, unless set in config.ini
+default_download_chunk_mib = 16
+# Storage backend, picked from config.ini on first use
+backend = None
+backend_lock = threading.Lock()
+# Number of games backed up at the same time, unless set in config.ini
+default_workers = 4
+# Days before a cached PCGamingWiki lookup is fetched again, unless set in config.ini
+default_pcgw_cache_days = 30
+# PCGamingWiki pages fetched at the same time during Heroic discovery
+pcgw_workers = 8
+# Shared by every scraping request so connections are reused between threads
+http_session = None
+http_session_lock = threading.Lock()
+# Seconds a save has to stay untouched before watch backs it up, unless set in config.ini
+default_quiet_seconds = 30
+# Seconds between scans of saves watch couldn't put inotify watches on
+poll_seconds = 60
+# Ways conflicts are settled when backing up without prompts
+POLICIES = ("newest-wins", "local-wins", "cloud-wins", "revision")
+# appProperties key holding the fingerprint of the save a backup was made from
+FINGERPRINT_PROPERTY = "savehavenFingerprint"
+# appProperties key holding the format a backup was made in, see backup_spec
+FORMAT_PROPERTY = "savehavenFormat"
+# Codecs load_config already warned about, with the game setting them
+warned_codecs = set()
+# Resumable uploads left unfinished by earlier runs
+upload_journal = UploadJournal()
+# Contents of the SaveHaven folder, listed once per backup or restore
+inventory = None
+# Chunk store folder and the chunks in it, listed once per run
+stored_chunks = None
+chunk_store_lock = threading.Lock()
+# Notified whenever a claimed chunk is uploaded or given up on
+chunk_claims = threading.Condition(chunk_store_lock)
 # endregion
 
 
@@ -79,10 +128,193 @@ class SaveDir:
         return f"Name: {self.name}\n Path: {self.path}\n Last modified: {self.modified}"
 
 
+class BackupJob:
+    """
+    Backup of a single game, decided before any work starts so it can run
+    in a worker without prompting
+
+    Attributes
+    ----------
+    game: SaveDir
+        SaveDir object for game
+
+    folder_id: str
+        ID of the Google Drive folder to upload to
+
+    action: str
+        "upload" to upload the local save, "restore" to fetch the cloud one
+
+    local_overwrite: bool
+        Whether to upload as a new file instead of a revision of file_id
+
+    file_id: str
+        ID of the cloud file to update or restore
+
+    cloud_name: str
+        Name of the cloud file, tells which format it was stored in
+
+    delete_id: str
+        ID of a cloud file to delete once the upload succeeds
+
+    cloud_time: float
+        Modified time of the cloud file, recorded when restoring
+
+    entry: dict
+        Entry of the game in state.db, gets the new upload time
+
+    key: tuple
+        Key of the game in state.db, its upload time is stored as soon as
+        the job succeeds
+
+    manifest: dict
+        Manifest of the save directory, stored once the job succeeds
+
+    uploaded_id: str
+        ID of the uploaded file once the job succeeds
+
+    replaced_id: str
+        ID of a backup in another format, deleted once the upload succeeds
+    """
+
+    def __init__(self, game: SaveDir, folder_id: str):
+        self.game = game
+        self.folder_id = folder_id
+        self.action = "upload"
+        self.local_overwrite = True
+        self.file_id = None
+        self.cloud_name = None
+        self.delete_id = None
+        self.cloud_time = None
+        self.entry = None
+        self.key = None
+        self.manifest = None
+        self.uploaded_id = None
+        self.replaced_id = None
+
+
+class Inventory:
+    """
+    Every file under the SaveHaven folder, listed in a single pass when a
+    command starts so looking up a game's backup doesn't list its folder
+
+    Attributes
+    ----------
+    root: str
+        ID of the SaveHaven folder
+
+    folders: dict
+        Files of every folder by name, keyed by folder ID
+    """
+
+    def __init__(self, root: str, files: list):
+        self.root = root
+        self.folders = {root: {}}
+        self.lock = threading.Lock()
+        for file in files:
+            self.add(file["parent"], file)
+
+    def covers(self, folder_id: str) -> bool:
+        """
+        Returns whether the contents of a folder are known
+        """
+        return folder_id in self.folders
+
+    def get(self, parent: str, name: str) -> dict:
+        """
+        Returns the file called name in parent, None if there isn't one
+        """
+        return self.folders.get(parent, {}).get(name)
+
+    def files(self, folder_id: str) -> dict:
+        """
+        Returns the files in a folder keyed by name
+        """
+        return dict(self.folders.get(folder_id, {}))
+
+    def add(self, parent: str, file: dict):
+        """
+        Records a file created in parent
+        """
+        with self.lock:
+            self.folders.setdefault(parent, {})[file["name"]] = file
+            if file["mimeType"] == FOLDER_MIME_TYPE:
+                self.folders.setdefault(file["id"], {})
+
+
 # endregion
 
 
-# region Drive Functions
+# region Storage Functions
+def get_backend() -> Backend:
+    """
+    Returns the storage backend backups go to, set by backend in the
+    Storage section of config.ini. "drive" (the default) uses Google
+    Drive, "local" uses the directory set by path, e.g. a NAS mount.
+
+    Returns
+    -------
+    backend: Backend
+        Storage backend shared by every thread
+    """
+    global backend
+    with backend_lock:
+        if backend is None:
+            config = configparser.ConfigParser()
+            config.read(os.path.join(config_dir, "config.ini"))
+            if config.get("Storage", "backend", fallback="drive") == "local":
+                backend = LocalBackend(
+                    os.path.expanduser(config.get("Storage", "path"))
+                )
+            else:
+                from savehaven.drive import DriveBackend
+
+                backend = DriveBackend(
+                    upload_chunk_size(), download_chunk_size(), adaptive_transfers()
+                )
+    return backend
+
+
+def set_backend(new_backend: Backend):
+    """
+    Replaces the storage backend, used to run SaveHaven against a
+    backend that isn't configured in config.ini
+
+    Parameters
+    ----------
+    new_backend: Backend
+        Backend to use from now on
+    """
+    global backend, stored_chunks
+    with backend_lock:
+        backend = new_backend
+        stored_chunks = None
+
+
+def get_http_session():
+    """
+    Returns the requests session shared by all PCGamingWiki and Steam
+    scraping, creating it on first use. Connections are kept alive in the
+    session's pool, so lookups after the first skip the TLS handshake.
+
+    Returns
+    -------
+    session: requests.Session
+        Session with a connection pool sized for pcgw_workers threads
+    """
+    global http_session
+    with http_session_lock:
+        if http_session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            http_session = requests.Session()
+            # Plain http:// links get the same pooling
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pcgw_workers)
+            http_session.mount("https://", adapter)
+            http_session.mount("http://", adapter)
+    return http_session
+
+
 def mod_time(file_id: str) -> datetime:  # sourcery skip: do-not-use-bare-except
     """
     Returns when a given file was last modified
@@ -99,15 +331,14 @@ def mod_time(file_id: str) -> datetime:  # sourcery skip: do-not-use-bare-except
         Datetime object of last modified time
     """
     try:
-        file = service.files().get(fileId=file_id, fields="modifiedTime").execute()
-        modified_time = file["modifiedTime"]
+        modified_time = get_backend().modified_time(file_id)
         return datetime.strptime(modified_time, "%Y-%m-%dT%H:%M:%S.%fZ")
 
     except:
         print("Failed")
 
 
-def search_file(mime_type: str, filename: str) -> str:
+def search_file(mime_type: str, filename: str, parent: str = None) -> str:
     """
     Search for file in Google Drive
 
@@ -119,43 +350,46 @@ def search_file(mime_type: str, filename: str) -> str:
     filename: str
         Filename of Google Drive file
 
+    parent: str, optional
+        ID of the folder the file has to be in
+
     Returns
     -------
     file_id: str
         ID of the file matching filename
     """
     try:
-        files = []
-        page_token = None
-        while True:
-            # pylint: disable=maybe-no-member
-            response = (
-                service.files()
-                .list(
-                    q=f"mimeType='{mime_type}' and name='{filename}'",
-                    spaces="drive",
-                    fields="nextPageToken, " "files(id, name)",
-                    pageToken=page_token,
-                )
-                .execute()
-            )
-            files.extend(response.get("files", []))
-            page_token = response.get("nextPageToken", None)
-            if page_token is None:
-                break
+        files = get_backend().search(filename, parent, mime_type == FOLDER_MIME_TYPE)
 
-    except HttpError as error:
+    except StorageError as error:
         print(f"An error occurred: {error}")
         files = None
 
     return files
 
 
+def forget_folder(folder_id: str):
+    """
+    Drops a folder that no longer exists on Drive, and everything cached
+    inside it, from the folder ID cache
+
+    Parameters
+    ----------
+    folder_id: str
+        ID of the missing folder
+    """
+    open_state().forget_cloud_id(folder_id)
+
+
+@timed("create_folder")
 def create_folder(filename: str, parent: str = None) -> str:
     """
     If folder exists, returns folder id,
     else, creates and returns folder id
 
+    Drive folder IDs are cached per (name, parent) in state.db, a cached
+    ID is only dropped once Drive reports it missing, see forget_folder.
+
     Parameters
     ----------
 
@@ -170,38 +404,27 @@ def create_folder(filename: str, parent: str = None) -> str:
     folder_id: str
         ID of the created folder
     """
+    # Local lookups are as cheap as reading the cache
+    key = f"{parent or 'root'}/{filename}"
+    if get_backend().remote and (folder_id := open_state().cloud_id(key)):
+        return folder_id
 
-    try:
-        if folder_id := search_file("application/vnd.google-apps.folder", filename):
-            return folder_id[0]["id"]
-
-    except HttpError as error:
-        print(f"An error occurred: {error}")
-        files = None
-
-    try:
-        # create drive api client
-        if parent:
-            file_metadata = {
-                "name": filename,
-                "mimeType": "application/vnd.google-apps.folder",
-                "parents": [parent],
-            }
-        else:
-            file_metadata = {
-                "name": filename,
-                "mimeType": "application/vnd.google-apps.folder",
-            }
+    if folder_id := search_file(FOLDER_MIME_TYPE, filename, parent):
+        folder_id = folder_id[0]["id"]
+    else:
+        try:
+            folder_id = get_backend().make_folder(filename, parent)
 
-        # pylint: disable=maybe-no-member
-        file = service.files().create(body=file_metadata, fields="id").execute()
-        return file.get("id")
+        except StorageError as error:
+            print(f"An error occurred: {error}")
+            return None
 
-    except HttpError as error:
-        print(f"An error occurred: {error}")
-        return None
+    if get_backend().remote:
+        open_state().put_cloud_id(key, folder_id)
+    return folder_id
 
 
+@timed("list_folder")
 def list_folder(folder_id: str) -> list:
     """
     Lists contents of Google Drive Folder
@@ -214,35 +437,129 @@ def list_folder(folder_id: str) -> list:
     Returns
     -------
     files: list
-    List of files in the folder
+    List of files in the folder, None if listing failed
     """
     try:
-        files = []
-        page_token = None
-        while True:
-            # pylint: disable=maybe-no-member
-            response = (
-                service.files()
-                .list(
-                    q=f"'{folder_id}' in parents",
-                    spaces="drive",
-                    fields="nextPageToken, " "files(id, name, modifiedTime)",
-                    pageToken=page_token,
-                )
-                .execute()
-            )
-            files.extend(response.get("files", []))
-            page_token = response.get("nextPageToken", None)
-            if page_token is None:
-                break
-
-        return files
+        return get_backend().list_folder(folder_id)
 
-    except HttpError as error:
+    except StorageError as error:
         print(f"An error occurred: {error}")
-        files = None
+        if error.status == 404:
+            forget_folder(folder_id)
+        return None
+
+
+def open_folder(filename: str, parent: str = None) -> tuple:
+    """
+    Resolves a folder by name and lists it, resolving it again if the
+    cached ID turned out to be stale. Folders under the SaveHaven folder
+    are looked up in the inventory once it's loaded.
+
+    Parameters
+    ----------
+    filename: str
+        Name of the folder
+
+    parent: str, optional
+        ID of the parent folder
+
+    Returns
+    -------
+    folder: tuple
+        ID of the folder and the files in it keyed by name
+    """
+    if inventory is not None and inventory.covers(parent):
+        folder = inventory.get(parent, filename)
+        if folder is None:
+            # A cached ID is stale, the folder was deleted or trashed
+            if stale_id := open_state().cloud_id(f"{parent}/{filename}"):
+                forget_folder(stale_id)
+            folder_id = create_folder(filename, parent)
+            if folder_id is None:
+                return None, {}
+            folder = {"id": folder_id, "name": filename, "mimeType": FOLDER_MIME_TYPE}
+            inventory.add(parent, folder)
+        return folder["id"], inventory.files(folder["id"])
+
+    folder_id = create_folder(filename, parent)
+    if folder_id is None:
+        return None, {}
+    files = list_folder(folder_id)
+    if files is None:
+        folder_id = create_folder(filename, parent)
+        if folder_id is None:
+            return None, {}
+        files = list_folder(folder_id)
+    return folder_id, {file["name"]: file for file in files or []}
+
+
+@timed("list_tree")
+def sync_cloud_tree(root: str) -> list:
+    """
+    Returns everything under the SaveHaven folder from the local mirror,
+    applying only what the changes feed reports since the last run. The
+    whole tree is listed when there's no mirror or its token expired.
+
+    Parameters
+    ----------
+    root: str
+        ID of the SaveHaven folder
 
+    Returns
+    -------
+    files: list
+        Files and folders under root, as returned by list_tree
+    """
+    storage = get_backend()
+    mirror = load_mirror(storage.location, root)
+    if mirror is not None:
+        try:
+            changes, token = storage.changes(mirror["token"])
+        except StorageError as error:
+            print(f"Couldn't read the changes feed, listing everything: {error}")
+            mirror = None
+        else:
+            if not apply_changes(mirror, changes):
+                raise StorageError("SaveHaven folder was removed", 404)
+            mirror["token"] = token
+    if mirror is None:
+        # Take the token first so nothing changed during the listing is missed
+        token = storage.start_page_token()
+        mirror = new_mirror(storage.location, root, token, storage.list_tree(root))
+    save_mirror(mirror)
+    return list(mirror["files"].values())
+
+
+def load_inventory() -> Inventory:
+    """
+    Loads everything under the SaveHaven folder in one pass, creating the
+    folder if needed, so later lookups don't go to the backend
 
+    Returns
+    -------
+    inventory: Inventory
+        Index of the SaveHaven folder, None if listing failed
+    """
+    global inventory
+    inventory = None
+    for _ in range(2):
+        root = create_folder("SaveHaven")
+        if root is None:
+            return None
+        try:
+            inventory = Inventory(root, sync_cloud_tree(root))
+            return inventory
+
+        except StorageError as error:
+            print(f"An error occurred: {error}")
+            # Resolve the folder again if the cached ID is stale
+            if error.status != 404:
+                return None
+            forget_folder(root)
+    return None
+
+
+@timed("upload_file")
 def upload_file(
     path: str,
     name: str,
@@ -250,10 +567,17 @@ def upload_file(
     folder: bool = False,
     local_overwrite: bool = True,
     file_id: str = None,
+    properties: dict = None,
+    codec: str = "zip",
+    level: int = None,
 ) -> str:
     """
     Uploads file to Google Drive
 
+    Uploads are recorded in the upload journal, an upload interrupted by
+    a crash or Ctrl-C resumes from its last committed chunk the next time
+    the same contents are uploaded.
+
     Parameters
     ----------
     path: str
@@ -273,227 +597,684 @@ def upload_file(
 
     file_id: str, optional
         File ID if overwrite is false
+
+    properties: dict, optional
+        appProperties to store with the file
+
+    codec: str, optional
+        Archive format folders are uploaded in, a key of CODECS
+
+    level: int, optional
+        Compression level, the codec's default if not given
     """
-    if folder:
-        if path[-1] == "/":
-            path = path[:-1]
-        zip_location = path + name + ".zip"
-        if os.path.exists(zip_location):
-            os.remove(zip_location)
-        print("Zipping")
-        if os.path.isdir(path):
-            make_archive(path + name, "zip", path)
-            path = zip_location
-    try:
-        print("Uploading")
-
-        # Create the media upload request
-        media = MediaFileUpload(path, resumable=True)
-
-        # Perform the upload
-        if overwrite or local_overwrite:
-            drive_file = (
-                service.files()
-                .create(
-                    body={
-                        "name": name if ".zip" in name else f"{name}.zip",
-                        "parents": [parent],
-                    },
-                    media_body=media,
-                    fields="id",
-                )
-                .execute()
-            )
-        else:
-            drive_file = (
-                service.files()
-                .update(
-                    fileId=file_id,
-                    media_body=media,
-                    fields="id",
+    if folder and path[-1] == "/":
+        path = path[:-1]
+    archive = folder and os.path.isdir(path)
+    if archive:
+        extension, mime_type = CODECS[codec][:2]
+        if not name.endswith(extension):
+            name += extension
+        # Archives are reproducible, the same contents give the same bytes
+        fingerprint = (properties or {}).get(FINGERPRINT_PROPERTY)
+        identity = fingerprint and f"{fingerprint}:{codec}:{level}"
+    else:
+        mime_type = "application/octet-stream"
+        stat = os.stat(path)
+        identity = f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+    target = None if overwrite or local_overwrite else file_id
+    session = None
+    if identity:
+        session = upload_journal.session(
+            f"{get_backend().location}:{target or f'{parent}/{name}'}", identity
+        )
+    while True:
+        try:
+            print("Uploading")
+            if archive:
+                chunks = timed_chunks(
+                    "archive", iter_archive(path, codec, level), "upload_bytes"
                 )
-                .execute()
+            else:
+                chunks = timed_chunks("read_file", iter_file(path), "upload_bytes")
+            return get_backend().upload(
+                chunks,
+                name,
+                parent,
+                target,
+                mime_type,
+                properties=properties,
+                session=session,
             )
 
-        file_id = drive_file.get("id")
-        if persistent:
-            revision_id = (
-                service.revisions()
-                .list(fileId=file_id)
-                .execute()["revisions"][-1]["id"]
-            )
-            service.revisions().update(
-                fileId=file_id,
-                revisionId=revision_id,
-                body={"keepForever": True},
-            ).execute()
-        os.remove(path)
-
-    except HttpError as error:
-        print(f"An error occurred: {error}")
-        file_id = None
+        except StorageError as error:
+            print(f"An error occurred: {error}")
+            if session and session.uri and error.status in (404, 410):
+                print("Upload session expired, starting over")
+                session.finish()
+                continue
+            if error.status == 404 and parent:
+                forget_folder(parent)
+            return None
 
-    return file_id
 
+def upload_bytes(
+    data: bytes,
+    name: str,
+    parent: str = None,
+    file_id: str = None,
+    properties: dict = None,
+) -> str:
+    """
+    Uploads a small file from memory in a single request
+
+    Parameters
+    ----------
+    data: bytes
+        Contents of the file
+
+    name: str
+        Name of the file on Drive
+
+    parent: str, optional
+        ID of the parent Google Drive folder
 
-def download(file_id: str):
+    file_id: str, optional
+        ID of a file to upload as a new revision of instead
+
+    properties: dict, optional
+        appProperties to store with the file
+
+    Returns
+    -------
+    file_id: str
+        ID of the uploaded file, None if the upload failed
+    """
     try:
-        # create drive api client
-
-        # pylint: disable=maybe-no-member
-        request = service.files().get_media(fileId=file_id)
-        zip_file = io.BytesIO()
-        downloader = MediaIoBaseDownload(zip_file, request)
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
-            print(f"Download {int(status.progress() * 100)}.")
-
-    except HttpError as error:
-        print(f"An error occurred: {error}")
-        zip_file = None
+        return get_backend().upload(
+            [data], name, parent, file_id, resumable=False, properties=properties
+        )
 
-    return zip_file
+    except StorageError as error:
+        print(f"An error occurred: {error}")
+        return None
 
 
-def delete_file(file_id):
+@timed("pin_revisions")
+def pin_revisions(revisions: list) -> int:
     """
-    Permanently delete a file, skipping the trash.
+    Keeps revisions forever, batching the requests
 
     Parameters
     ----------
+    revisions: list
+        (file ID, revision ID) pairs to keep
 
-        file_id: str
-            ID of the file to delete.
     Returns
     -------
-    status : bool
-        Returns true if successful, false if not
-
+    pinned: int
+        Number of revisions pinned, failures are printed
     """
+    pinned = 0
     try:
-        service.files().delete(fileId=file_id).execute()
-        return True
-    except HttpError as error:
+        results = get_backend().batch_keep_revisions(revisions)
+    except StorageError as error:
         print(f"An error occurred: {error}")
-        return False
-
-
-def get_revisions(file_id):
-    revisions = service.revisions().list(fileId=file_id).execute()
-
-    # Print information about each revision
-    return revisions.get("revisions", [])
+        return 0
+    for (file_id, revision_id), (_, error) in zip(revisions, results):
+        if error:
+            print(f"Keeping revision {revision_id} of {file_id} failed: {error}")
+        else:
+            pinned += 1
+    return pinned
 
 
-# endregion
+def pin_latest_revisions(file_ids: list) -> int:
+    """
+    Keeps the latest revision of every file forever, listing the revisions
+    of all files in one batch and pinning them in another
 
+    Parameters
+    ----------
+    file_ids: list
+        IDs of the Google Drive files
 
-# region SaveSync functions·
+    Returns
+    -------
+    pinned: int
+        Number of revisions pinned, failures are printed
+    """
+    try:
+        with span("list_revisions"):
+            results = get_backend().batch_get_revisions(file_ids)
+    except StorageError as error:
+        print(f"An error occurred: {error}")
+        return 0
+    latest = []
+    for file_id, (revisions, error) in zip(file_ids, results):
+        if error or not revisions:
+            print(f"Listing revisions of {file_id} failed: {error}")
+        else:
+            latest.append((file_id, revisions[-1]["id"]))
+    return pin_revisions(latest)
 
 
-def load_config() -> dict:
+@timed("delete_files")
+def delete_files(file_ids: list) -> list:
     """
-    Returns the contents of the configuration file in json format
+    Permanently deletes files, batching the requests
+
+    Parameters
+    ----------
+    file_ids: list
+        IDs of the files to delete
 
     Returns
     -------
-    save_json: dict
-        Contents of the configuration file as a dict.
+    statuses: list
+        Whether each file was deleted, failures are printed
     """
-    save_json = {"games": {}}
-    if os.path.exists(list_file):
-        with open(list_file, "r") as sjson:
-            try:
-                save_json = json.load(sjson)
-            except json.decoder.JSONDecodeError:
-                return save_json
-    return save_json
+    try:
+        results = get_backend().batch_delete(file_ids)
+    except StorageError as error:
+        print(f"An error occurred: {error}")
+        return [False] * len(file_ids)
+    statuses = []
+    for file_id, (_, error) in zip(file_ids, results):
+        if error:
+            print(f"Deleting {file_id} failed: {error}")
+        statuses.append(error is None)
+    return statuses
 
 
-def save_config(save_json: dict):
+@timed("download")
+def download(file_id: str, fd=None):
     """
-    Saves a dictionary of configuration settings to the config file
+    Downloads a file from Google Drive
 
     Parameters
     ----------
-    save_json : dict
-        Configuration settings in dictionary format
+    file_id: str
+        ID of the file to download
+
+    fd: file object, optional
+        Binary file object to stream the contents into, they're kept in
+        memory if not given
+
+    Returns
+    -------
+    file: file object
+        fd, or a BytesIO holding the contents if fd wasn't given. None if
+        the download failed
     """
+    if fd is None:
+        fd = io.BytesIO()
+    start = fd.tell()
+    try:
+        get_backend().download(file_id, fd)
+
+    except StorageError as error:
+        print(f"An error occurred: {error}")
+        return None
 
-    with open(list_file, "w") as sjson:
-        json.dump(save_json, sjson, indent=4)
+    finally:
+        count("download_bytes", fd.tell() - start)
+    return fd
 
 
-def pcgw_search(search_term: str, steam_id: bool = False) -> list:
+def download_chunk_size() -> int:
     """
-    Parameters
-    ----------
-    search_term : str
-        PCGamingWiki search term
-    steam_id : bool
-        Whether the search term is a Steam ID. Deafaults to False
+    Returns how many bytes a download requests at a time, set in MiB by
+    download_chunk_size in the Transfer section of config.ini
 
     Returns
     -------
-    save_paths : list
-        List of save locations by platform (Steam, Windows, Epic Games, etc.)
+    chunk_size: int
+        Download chunk size in bytes
     """
-    # Retrieve Save Locations from PCGamingWiki
-
-    # Cases:
-    #    If Windows and Steam and Steam Play - Use steam directory
-    #    If Windows and Steam Play - Use prefix + windows dir
-    #    If Wind
-    if steam_id:
-        search_url = "https://pcgamingwiki.com/api/appid.php?appid="
-    else:
-        search_url = "https://www.pcgamingwiki.com/w/index.php?search="
-    search_term = search_term.replace(" ", "+")
-    result = requests.get(
-        search_url + search_term,
-    )
-    search_soup = BeautifulSoup(result.content, "html.parser")
-    if search_soup.find(class_="mw-search-result-heading"):
-        # print(
-        #    "https://www.pcgamingwiki.com"
-        #    + search_soup.find(class_="mw-search-result-heading").find("a")["href"]
-        # )
-        search_soup = BeautifulSoup(
-            requests.get(
-                "https://www.pcgamingwiki.com"
-                + search_soup.find(class_="mw-search-result-heading").find("a")["href"]
-            ).content,
-            "html.parser",
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    return (
+        config.getint(
+            "Transfer", "download_chunk_size", fallback=default_download_chunk_mib
         )
-    try:
-        return extract_save_locations(search_soup, search_term)
-    except IndexError:
-        print(search_url + search_term)
+        * 1024
+        * 1024
+    )
 
 
-# TODO Rename this here and in `pcgw_search`
-def extract_save_locations(search_soup: BeautifulSoup, search_term: str) -> list:
+def upload_chunk_size() -> int:
     """
-    Parameters
-    ----------
-    search_soup: BeatifulSoup
-        BeautifulSoup object from URL
-
-    search_term: str
-        Game search term
+    Returns how many bytes an upload sends per request, set in MiB by
+    upload_chunk_size in the Transfer section of config.ini. Rounded down
+    to the 256 KiB steps Drive accepts.
 
     Returns
     -------
-    save_paths: list
-        List of save paths
+    chunk_size: int
+        Upload chunk size in bytes
     """
-    gamedata_table = search_soup.find_all(id="table-gamedata")[1]
-    platform_list = [
-        "Windows",
-        "Steam",
-        "Steam Play",
-        "Epic Games Launcher",
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    chunk_size = int(
+        config.getfloat(
+            "Transfer", "upload_chunk_size", fallback=default_upload_chunk_mib
+        )
+        * 1024
+        * 1024
+    )
+    return max(256 * 1024, chunk_size - chunk_size % (256 * 1024))
+
+
+def adaptive_transfers() -> bool:
+    """
+    Returns whether chunk sizes follow the measured throughput, set by
+    adaptive in the Transfer section of config.ini. The configured sizes
+    are then only where tuning starts.
+
+    Returns
+    -------
+    adaptive: bool
+        Whether to tune chunk sizes while transferring
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    return config.getboolean("Transfer", "adaptive", fallback=False)
+
+
+def delete_file(file_id):
+    """
+    Permanently delete a file, skipping the trash.
+
+    Parameters
+    ----------
+
+        file_id: str
+            ID of the file to delete.
+    Returns
+    -------
+    status : bool
+        Returns true if successful, false if not
+
+    """
+    try:
+        get_backend().delete(file_id)
+        return True
+    except StorageError as error:
+        print(f"An error occurred: {error}")
+        return False
+
+
+def chunk_store() -> dict:
+    """
+    Returns the chunk store used by chunked backups, listing the Chunks
+    folder on Drive the first time it's needed
+
+    Returns
+    -------
+    store: dict
+        ID of the Chunks folder under "folder", the IDs of the chunks in
+        it by chunk id under "ids" and the backend location and folder ID
+        under "key", which chunk indexes are recorded for. None if the
+        folder couldn't be opened, it's tried again next time.
+    """
+    global stored_chunks
+    with chunk_store_lock:
+        if stored_chunks is None:
+            root = inventory.root if inventory else create_folder("SaveHaven")
+            if root is None:
+                return None
+            folder_id, files = open_folder("Chunks", parent=root)
+            if folder_id is None:
+                return None
+            stored_chunks = {
+                "folder": folder_id,
+                "ids": {name: file["id"] for name, file in files.items()},
+                "key": f"{get_backend().location}:{folder_id}",
+            }
+    return stored_chunks
+
+
+@timed("upload_snapshot")
+def upload_snapshot(
+    path: str,
+    name: str,
+    parent: str,
+    manifest: dict,
+    local_overwrite: bool = True,
+    file_id: str = None,
+    properties: dict = None,
+) -> str:
+    """
+    Backs up a directory as a snapshot of content addressed chunks. Only
+    chunks the chunk store doesn't have yet are uploaded, then a small
+    snapshot listing the chunks of every file is uploaded to parent.
+
+    Parameters
+    ----------
+    path: str
+        Path of the save directory
+
+    name: str
+        Name of the snapshot file on Drive
+
+    parent: str
+        ID of the parent Google Drive folder
+
+    manifest: dict
+        Manifest of the save directory as returned by scan_tree
+
+    local_overwrite: bool, optional
+        Whether to upload a new snapshot instead of a revision of file_id
+
+    file_id: str, optional
+        ID of the existing snapshot
+
+    properties: dict, optional
+        appProperties to store with the snapshot
+
+    Returns
+    -------
+    file_id: str
+        ID of the snapshot file, None if the backup failed
+    """
+    store = chunk_store()
+    if store is None:
+        print("Couldn't open the Chunks folder")
+        return None
+    failed = []
+
+    def new_chunk(chunk_name: str, chunk: bytes):
+        with chunk_claims:
+            # Another worker is uploading it, its upload may still fail
+            while chunk_name in store["ids"] and store["ids"][chunk_name] is None:
+                chunk_claims.wait()
+            if chunk_name in store["ids"]:
+                return
+            # Claim the chunk so other workers don't upload it too
+            store["ids"][chunk_name] = None
+        chunk_id = upload_bytes(pack_chunk(chunk), chunk_name, store["folder"])
+        with chunk_claims:
+            if chunk_id:
+                store["ids"][chunk_name] = chunk_id
+            else:
+                del store["ids"][chunk_name]
+                failed.append(chunk_name)
+            chunk_claims.notify_all()
+
+    print("Uploading changed chunks")
+    snapshot, index = build_snapshot(
+        path,
+        manifest,
+        new_chunk,
+        store["key"],
+        lambda chunk_name: bool(store["ids"].get(chunk_name)),
+    )
+    # Never write a snapshot pointing at chunks that aren't in the store
+    with chunk_claims:
+        missing = {
+            chunk_name
+            for entry in snapshot["files"].values()
+            for chunk_name in entry["chunks"]
+            if not store["ids"].get(chunk_name)
+        }
+    if failed or missing:
+        print(f"Failed to upload {len(set(failed) | missing)} chunks")
+        return None
+    file_id = upload_bytes(
+        json.dumps(snapshot).encode(),
+        name,
+        parent,
+        None if overwrite or local_overwrite else file_id,
+        properties,
+    )
+    if file_id:
+        save_chunk_index(path, store["key"], index)
+    return file_id
+
+
+def read_chunk(store: dict):
+    """
+    Returns a function downloading and unpacking a chunk by its id, for
+    restore_snapshot. It raises StorageError if the chunk isn't in the
+    store or can't be downloaded.
+
+    Parameters
+    ----------
+    store: dict
+        Chunk store as returned by chunk_store
+    """
+
+    def read(chunk_name: str) -> bytes:
+        if not store["ids"].get(chunk_name):
+            raise StorageError(f"Chunk {chunk_name} is missing from the chunk store")
+        data = download(store["ids"][chunk_name])
+        if data is None:
+            raise StorageError(f"Downloading chunk {chunk_name} failed")
+        return unpack_chunk(data.getvalue())
+
+    return read
+
+
+def get_revisions(file_id):
+    return get_backend().get_revisions(file_id)
+
+
+# endregion
+
+
+# region SaveSync functions·
+
+
+def load_config() -> dict:
+    """
+    Returns the saves kept in state.db, laid out like game_list.json used
+    to be
+
+    Returns
+    -------
+    save_json: dict
+        Entries of games under "games" and of Minecraft worlds under
+        "minecraft" and their launcher
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    warn_codec(config.get("Backup", "codec", fallback="zip"))
+    save_json = {"games": {}}
+    for key, entry in open_state().saves().items():
+        if entry.get("codec"):
+            warn_codec(entry["codec"].partition(":")[0], key[-1])
+        if key[0] == "minecraft":
+            save_json.setdefault("minecraft", {}).setdefault(key[1], {})[key[2]] = entry
+        else:
+            save_json["games"][key[1]] = entry
+    return save_json
+
+
+def warn_codec(codec: str, name: str = None):
+    """
+    Prints why a configured codec can't be used, once per codec and game
+    however often the config is loaded
+
+    Parameters
+    ----------
+    codec: str
+        Codec name, without the level
+
+    name: str, optional
+        Game whose entry sets the codec, None for config.ini
+    """
+    problem = codec_problem(codec)
+    if problem and (codec, name) not in warned_codecs:
+        warned_codecs.add((codec, name))
+        print(f"{name}: {problem}" if name else problem)
+
+
+def open_pcgw_cache() -> sqlite3.Connection:
+    """
+    Opens the PCGamingWiki cache, creating it if needed
+
+    Returns
+    -------
+    db: sqlite3.Connection
+        Connection to the cache database
+    """
+    db = sqlite3.connect(pcgw_cache_file)
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS save_locations "
+        "(title TEXT PRIMARY KEY, locations TEXT NOT NULL, fetched REAL NOT NULL)"
+    )
+    return db
+
+
+def cached_save_locations(title: str) -> dict:
+    """
+    Returns save locations cached by an earlier PCGamingWiki lookup, set
+    cache_days in the PCGamingWiki section of config.ini to change how
+    long they're kept
+
+    Parameters
+    ----------
+    title: str
+        Search term the locations were cached under
+
+    Returns
+    -------
+    save_paths: dict
+        Save locations by platform, None if not cached or expired
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    max_age = (
+        config.getfloat("PCGamingWiki", "cache_days", fallback=default_pcgw_cache_days)
+        * 86400
+    )
+    with closing(open_pcgw_cache()) as db:
+        row = db.execute(
+            "SELECT locations, fetched FROM save_locations WHERE title = ?", (title,)
+        ).fetchone()
+    if row and time.time() - row[1] < max_age:
+        return json.loads(row[0])
+    return None
+
+
+def cache_save_locations(title: str, save_paths: dict):
+    """
+    Stores the save locations found on PCGamingWiki
+
+    Parameters
+    ----------
+    title: str
+        Search term to cache the locations under
+
+    save_paths: dict
+        Save locations by platform
+    """
+    with closing(open_pcgw_cache()) as db, db:
+        db.execute(
+            "INSERT OR REPLACE INTO save_locations VALUES (?, ?, ?)",
+            (title, json.dumps(save_paths), time.time()),
+        )
+
+
+def clear_pcgw_cache(title: str = None):
+    """
+    Removes cached PCGamingWiki lookups
+
+    Parameters
+    ----------
+    title: str, optional
+        Only remove this game, everything is removed if not given
+    """
+    with closing(open_pcgw_cache()) as db, db:
+        if title:
+            db.execute("DELETE FROM save_locations WHERE title = ?", (title,))
+        else:
+            db.execute("DELETE FROM save_locations")
+
+
+@timed("pcgw_search")
+def pcgw_search(search_term: str, steam_id: bool = False) -> list:
+    """
+    Parameters
+    ----------
+    search_term : str
+        PCGamingWiki search term
+    steam_id : bool
+        Whether the search term is a Steam ID. Deafaults to False
+
+    Returns
+    -------
+    save_paths : list
+        List of save locations by platform (Steam, Windows, Epic Games, etc.),
+        served from the local cache when looked up recently
+    """
+    from bs4 import BeautifulSoup
+
+    # Retrieve Save Locations from PCGamingWiki
+
+    # Cases:
+    #    If Windows and Steam and Steam Play - Use steam directory
+    #    If Windows and Steam Play - Use prefix + windows dir
+    #    If Wind
+    cache_key = f"appid:{search_term}" if steam_id else search_term
+    if (save_paths := cached_save_locations(cache_key)) is not None:
+        count("pcgw_cache_hits")
+        return save_paths
+    count("pcgw_lookups")
+
+    if steam_id:
+        search_url = "https://pcgamingwiki.com/api/appid.php?appid="
+    else:
+        search_url = "https://www.pcgamingwiki.com/w/index.php?search="
+    search_term = search_term.replace(" ", "+")
+    result = get_http_session().get(
+        search_url + search_term,
+    )
+    search_soup = BeautifulSoup(result.content, "html.parser")
+    if search_soup.find(class_="mw-search-result-heading"):
+        # print(
+        #    "https://www.pcgamingwiki.com"
+        #    + search_soup.find(class_="mw-search-result-heading").find("a")["href"]
+        # )
+        search_soup = BeautifulSoup(
+            get_http_session().get(
+                "https://www.pcgamingwiki.com"
+                + search_soup.find(class_="mw-search-result-heading").find("a")["href"]
+            ).content,
+            "html.parser",
+        )
+    try:
+        save_paths = extract_save_locations(search_soup, search_term)
+    except IndexError:
+        # No save game table, remember that too so the page isn't fetched again
+        print(search_url + search_term)
+        save_paths = {}
+    cache_save_locations(cache_key, save_paths)
+    return save_paths
+
+
+# TODO Rename this here and in `pcgw_search`
+def extract_save_locations(search_soup: "BeautifulSoup", search_term: str) -> list:
+    """
+    Parameters
+    ----------
+    search_soup: BeatifulSoup
+        BeautifulSoup object from URL
+
+    search_term: str
+        Game search term
+
+    Returns
+    -------
+    save_paths: list
+        List of save paths
+    """
+    gamedata_table = search_soup.find_all(id="table-gamedata")[1]
+    platform_list = [
+        "Windows",
+        "Steam",
+        "Steam Play",
+        "Epic Games Launcher",
         "GOG.com",
         "Microsoft Store",
     ]
@@ -507,26 +1288,24 @@ def extract_save_locations(search_soup: BeautifulSoup, search_term: str) -> list
             elif plat in tr.text:
                 save_paths[plat] = tr
 
-    user_id = os.listdir(
-        os.path.join(
-            os.path.expanduser("~"),
-            ".steam",
-            "steam",
-            "userdata",
-        )
-    )[0]
+    userdata_dir = os.path.join(os.path.expanduser("~"), ".steam", "steam", "userdata")
+    # Machines without Steam still get the Windows locations
+    user_id = (
+        next(iter(os.listdir(userdata_dir)), "") if os.path.isdir(userdata_dir) else ""
+    )
     steam_dir = ".var/app/com.valvesoftware.Steam/.steam/steam"
     common_dir = ".var/app/com.valvesoftware.Steam/.steam/steam/steamapps/common"
-    user_profile = f"drive_c/users/{os.getlogin()}"
+    # os.getlogin needs a controlling terminal, which cron and systemd runs lack
+    user_profile = f"drive_c/users/{getpass.getuser()}"
     for plat, tr in save_paths.items():
         if not tr.find_all("span"):
             save_paths[plat] = ""
         else:
-            for span in tr.find_all("span"):
-                for data in span(["style", "script"]):
+            for tag in tr.find_all("span"):
+                for data in tag(["style", "script"]):
                     # Remove tags
                     data.decompose()
-                path = "".join(span.stripped_strings)
+                path = "".join(tag.stripped_strings)
                 path = (
                     path.replace("<Steam-folder>", steam_dir)
                     .replace("%LOCALAPPDATA%", f"{user_profile}/AppData/Local/")
@@ -537,7 +1316,7 @@ def extract_save_locations(search_soup: BeautifulSoup, search_term: str) -> list
                     if path
                     else ""
                 )
-                if path.endswith(f"{user_id}/"):
+                if user_id and path.endswith(f"{user_id}/"):
                     path = path.replace(f"{user_id}/", "")
 
                 path = os.path.join(*path.split("/"))
@@ -588,136 +1367,608 @@ def check_pcgw_location(game_title: str, platform: str, prefix_path: str) -> str
         return prefix_path
 
 
-def gen_soup(url: str) -> BeautifulSoup:
+def gen_soup(url: str) -> "BeautifulSoup":
+    """
+    Generates a BeautifulSoup for a given URL
+
+    Parameters
+    ----------
+    url : str
+        URL to generate a BeautifulSoup
+
+    Returns
+    -------
+    BeautifulSoup : BeautifulSoup
+        Soup for the given URL
+    """
+    from bs4 import BeautifulSoup
+
+    result = get_http_session().get(url)
+    return BeautifulSoup(result.content, "html.parser")
+
+
+@timed("plan_upload")
+def plan_upload(
+    folder_name: str,
+    game: SaveDir,
+    upload_time: datetime,
+    root: str,
+    policy: str = None,
+    entry: dict = None,
+) -> BackupJob:
+    """
+    Compares a game with its cloud copy and asks about conflicts, without
+    transferring anything. Given a policy, conflicts are settled by it
+    instead of asking, see resolve_conflict.
+
+    Parameters
+    ----------
+    folder_name : str
+        Name of the folder to upload to
+
+    game: SaveDir
+        SaveDir object for game
+
+    upload_time : datetime
+        datetime object of the upload
+
+    root: str
+    ID of Google Drive Folder
+
+    policy: str, optional
+        One of POLICIES, prompts are shown if not given
+
+    entry: dict, optional
+        Entry of the game in state.db, its codec overrides the configured
+        one
+
+    Returns
+    -------
+    job: BackupJob
+        What to do with the game, None if it should be skipped
+    """
+    import inquirer
+    from inquirer.themes import GreenPassion
+
+    # Find files already in Drive
+    drive_folder, files = open_folder(folder_name, parent=root)
+    if drive_folder is None:
+        # Uploading would put the backup at the top of the drive
+        print(f"Skipping {game.name}, couldn't open the {folder_name} folder")
+        return None
+    job = BackupJob(game, drive_folder)
+    job.entry = entry
+    # Prefer a backup in the configured format, then one in any format
+    chunked = backup_format() == "chunked"
+    name = backup_name(game.name, None if chunked else backup_codec(entry)[0])
+    cloud_file = files.get(name) or next(
+        (file for name, file in files.items() if strip_backup_name(name) == game.name),
+        None,
+    )
+    if cloud_file:
+        job.cloud_name = cloud_file["name"]
+    # Compare every file in the save instead of the top level directory mtime
+    local_changed = True
+    if os.path.isdir(game.path):
+        stored = load_manifest(game.path)
+        with span("scan_tree"):
+            job.manifest = scan_tree(game.path, stored, hash_saves())
+        game.modified = latest_mtime(job.manifest) or game.modified
+        local_changed = manifest_changed(stored, job.manifest)
+    upload_time = datetime.fromtimestamp(upload_time, tz=timezone.utc)
+    local_modified = datetime.fromtimestamp(game.modified, tz=timezone.utc)
+
+    print(f"Working on {game.name}")
+    # Identical contents never need a transfer, whatever the timestamps say,
+    # unless the cloud copy is in another format than backups are made in now
+    if cloud_file and same_as_cloud(job, cloud_file):
+        if same_format(job, cloud_file):
+            print(f"Skipping {game.name}, cloud copy has the same contents")
+            save_manifest(game.path, job.manifest)
+            return None
+        return replace_cloud_copy(job, cloud_file)
+    # Check if cloud file was modified before or after upload time
+    if cloud_file:
+        date_time_obj = datetime.fromisoformat(cloud_file["modifiedTime"])
+        if (
+            local_changed
+            and upload_time < local_modified
+            and upload_time != datetime.fromtimestamp(0, tz=timezone.utc)
+        ):
+            print("Cloud file found, Syncing")
+            if policy and date_time_obj > upload_time:
+                # The cloud copy changed since the last upload as well
+                if resolve_conflict(policy, local_modified, date_time_obj) == "cloud":
+                    job.action = "restore"
+                    job.file_id = cloud_file["id"]
+                    job.cloud_time = float(date_time_obj.strftime("%s"))
+                    return job
+            if not overwrite and not policy:
+                questions = [
+                    inquirer.List(
+                        "delete",
+                        message=f"Do you want to delete the cloud file or upload as revision? (Cloud version uploaded:{date_time_obj.strftime('%b %-d %Y, %H:%M:%S')})",
+                        choices=["Delete", "Update"],
+                    )
+                ]
+                answer = inquirer.prompt(questions, theme=GreenPassion())["delete"]
+            else:
+                answer = "Delete" if overwrite or policy == "local-wins" else "Update"
+            if answer == "Delete":
+                job.delete_id = cloud_file["id"]
+            else:
+                job.local_overwrite = False
+                job.file_id = cloud_file["id"]
+
+        elif date_time_obj < upload_time:
+            if not same_format(job, cloud_file):
+                return replace_cloud_copy(job, cloud_file)
+            print(f"Skipping {game.name}, Google Drive up to date")
+            return None
+        elif date_time_obj > upload_time or upload_time == datetime.fromtimestamp(
+            0, tz=timezone.utc
+        ):
+            choices = [
+                f"Replace with cloud version (Uploaded: {date_time_obj.strftime('%b %-d %Y, %H:%M:%S')})",
+                f"Upload current version (Modified: {local_modified.strftime('%b %-d %Y, %H:%M:%S')})",
+                "Skip",
+            ]
+            questions = [
+                inquirer.List(
+                    "cloud",
+                    message="Cloud file is more recent, what would you like to do?",
+                    choices=choices,
+                )
+            ]
+            if policy:
+                winner = resolve_conflict(policy, local_modified, date_time_obj)
+                answer = choices[0] if winner == "cloud" else choices[1]
+            else:
+                answer = inquirer.prompt(questions, theme=GreenPassion())["cloud"]
+            if answer == choices[0]:
+                job.action = "restore"
+                job.file_id = cloud_file["id"]
+                job.cloud_time = float(date_time_obj.strftime("%s"))
+            elif answer == choices[2]:
+                print("Sync cancelled")
+                return None
+            elif answer == choices[1] and (overwrite or policy == "local-wins"):
+                job.delete_id = cloud_file["id"]
+            elif answer == choices[1]:
+                job.local_overwrite = False
+                job.file_id = cloud_file["id"]
+    return job
+
+
+def replace_cloud_copy(job: BackupJob, cloud_file: dict) -> BackupJob:
+    """
+    Plans an upload replacing a cloud copy that's up to date but in
+    another format, as a revision if it keeps its name
+
+    Parameters
+    ----------
+    job: BackupJob
+        Job returned by plan_upload
+
+    cloud_file: dict
+        Cloud copy of the save from the inventory
+
+    Returns
+    -------
+    job: BackupJob
+        The job, set to upload
+    """
+    print(f"Converting the backup of {job.game.name} to {backup_spec(job.entry)}")
+    if overwrite:
+        job.delete_id = cloud_file["id"]
+    else:
+        job.local_overwrite = False
+        job.file_id = cloud_file["id"]
+    return job
+
+
+def resolve_conflict(
+    policy: str, local_modified: datetime, cloud_modified: datetime
+) -> str:
+    """
+    Settles a conflict between a save and its cloud copy without asking
+
+    Policies are "newest-wins", which keeps whichever was modified last,
+    "local-wins" and "cloud-wins", which always keep that side, and
+    "revision", which uploads the local save as a new revision so the
+    cloud version stays in its history. "local-wins" replaces the cloud
+    file instead of adding a revision.
+
+    Parameters
+    ----------
+    policy: str
+        One of POLICIES
+
+    local_modified: datetime
+        When the local save was last modified
+
+    cloud_modified: datetime
+        When the cloud copy was uploaded
+
+    Returns
+    -------
+    winner: str
+        "local" to upload the save, "cloud" to restore the cloud copy
+    """
+    if policy == "cloud-wins":
+        return "cloud"
+    if policy == "newest-wins" and cloud_modified > local_modified:
+        return "cloud"
+    return "local"
+
+
+def same_format(job: BackupJob, cloud_file: dict) -> bool:
+    """
+    Returns whether a cloud copy is in the format backups of the game are
+    made in now, backups from before the format was recorded are judged by
+    their name
+
+    Parameters
+    ----------
+    job: BackupJob
+        Job returned by plan_upload
+
+    cloud_file: dict
+        Cloud copy of the save from the inventory
+    """
+    spec = backup_spec(job.entry)
+    properties = cloud_file.get("appProperties") or {}
+    if FORMAT_PROPERTY in properties:
+        return properties[FORMAT_PROPERTY] == spec
+    return cloud_file["name"] == backup_name(
+        job.game.name, None if spec == "chunked" else spec.partition(":")[0]
+    )
+
+
+def same_as_cloud(job: BackupJob, cloud_file: dict) -> bool:
+    """
+    Compares the fingerprint of a save with the one stored on its cloud
+    copy, hashing only files whose hashes aren't known yet
+
+    Parameters
+    ----------
+    job: BackupJob
+        Job returned by plan_upload, its manifest gets the hashes
+
+    cloud_file: dict
+        Cloud copy of the save from the inventory
+
+    Returns
+    -------
+    same: bool
+        Whether the cloud copy was made from identical contents
+    """
+    fingerprint = (cloud_file.get("appProperties") or {}).get(FINGERPRINT_PROPERTY)
+    if not fingerprint or job.manifest is None:
+        return False
+    job.manifest = scan_tree(job.game.path, job.manifest, hash_files=True)
+    return tree_fingerprint(job.manifest) == fingerprint
+
+
+def run_job(job: BackupJob) -> list:
+    """
+    Carries out a planned backup
+
+    Parameters
+    ----------
+    job: BackupJob
+        Job returned by plan_upload
+
+    Returns
+    -------
+    status: list
+        List containing bool of upload success and if so, upload time.
+    """
+    game = job.game
+    if job.action == "restore":
+        print(f"Syncing {game.name}")
+        if not fetch_cloud_file(game, job.file_id):
+            return [False, None]
+        if os.path.isdir(game.path):
+            save_manifest(game.path, scan_tree(game.path, hash_files=hash_saves()))
+        print(f"Completed {game.name}!")
+        return [True, job.cloud_time]
+
+    chunked = backup_format() == "chunked" and job.manifest is not None
+    codec, level = backup_codec(job.entry)
+    name = backup_name(game.name, None if chunked else codec)
+    if job.file_id and job.cloud_name != name:
+        # The format changed, a revision would keep the old name and format
+        job.replaced_id = job.file_id
+        job.local_overwrite = True
+    properties = None
+    if job.manifest is not None:
+        # Fingerprint the backup so later runs can tell identical contents
+        job.manifest = scan_tree(game.path, job.manifest, hash_files=True)
+        properties = {
+            FINGERPRINT_PROPERTY: tree_fingerprint(job.manifest),
+            FORMAT_PROPERTY: backup_spec(job.entry),
+        }
+    if chunked:
+        file_id = upload_snapshot(
+            game.path,
+            name,
+            job.folder_id,
+            job.manifest,
+            job.local_overwrite,
+            job.file_id,
+            properties,
+        )
+    else:
+        file_id = upload_file(
+            game.path,
+            name,
+            job.folder_id,
+            True,
+            job.local_overwrite,
+            job.file_id,
+            properties,
+            codec,
+            level,
+        )
+    if file_id is None:
+        print(f"Failed {game.name}")
+        return [False, None]
+    # Old copies are deleted by backup_games once the pool drains
+    job.uploaded_id = file_id
+    if job.manifest is not None:
+        save_manifest(game.path, job.manifest)
+    print(f"Finished {game.name}")
+    return [True, float(datetime.now().strftime("%s"))]
+
+
+def upload_game(
+    folder_name: str,
+    game: SaveDir,
+    upload_time: datetime,
+    root: str,
+    policy: str = None,
+) -> list:
+    """
+    Parameters
+    ----------
+    folder_name : str
+        Name of the folder to upload to
+
+    game: SaveDir
+        SaveDir object for game
+
+    upload_time : datetime
+        datetime object of the upload
+
+    root: str
+    ID of Google Drive Folder
+
+    policy: str, optional
+        How conflicts are settled, see plan_upload
+
+    Returns
+    -------
+    status: list
+        List containing bool of upload success and if so, upload time.
+    """
+    job = plan_upload(folder_name, game, upload_time, root, policy)
+    return backup_games([job], 1)[0] if job else [False, None]
+
+
+def backup_format() -> str:
+    """
+    Returns how saves are stored on Drive, set by format in the Backup
+    section of config.ini. "zip" uploads an archive of the whole save every
+    time, in the format picked by backup_codec, "chunked" only uploads the
+    parts of files that changed.
+
+    Returns
+    -------
+    format: str
+        "zip" or "chunked"
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    return config.get("Backup", "format", fallback="zip")
+
+
+def backup_codec(entry: dict = None) -> tuple:
     """
-    Generates a BeautifulSoup for a given URL
+    Returns the archive format of zip backups, set by codec and level in
+    the Backup section of config.ini. A game's entry in state.db can
+    override both with "codec", like "tar.zst" or "tar.xz:9", set with
+    savehaven add --codec.
+
+    Codecs are "zip" (deflate), "zip-store" (no compression), "tar.zst"
+    (needs the zstandard package) and "tar.xz". Zips store files that are
+    already compressed as is whatever the level.
 
     Parameters
     ----------
-    url : str
-        URL to generate a BeautifulSoup
+    entry: dict, optional
+        Entry of the game in state.db
 
     Returns
     -------
-    BeautifulSoup : BeautifulSoup
-        Soup for the given URL
+    codec: tuple
+        Codec name and compression level, None for the codec's default
     """
-    result = requests.get(url)
-    return BeautifulSoup(result.content, "html.parser")
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    codec = config.get("Backup", "codec", fallback="zip")
+    level = config.getint("Backup", "level", fallback=None)
+    if entry and entry.get("codec"):
+        codec, _, entry_level = entry["codec"].partition(":")
+        level = int(entry_level) if entry_level else None
+    if codec_problem(codec):
+        # Warned about by load_config
+        return "zip", None
+    return codec, level
+
+
+def codec_problem(codec: str) -> str:
+    """
+    Returns why codec can't be used, None if it can
 
+    Parameters
+    ----------
+    codec: str
+        Codec name, without the level
 
-def upload_game(
-    folder_name: str, game: SaveDir, upload_time: datetime, root: str
-) -> list:
+    Returns
+    -------
+    problem: str
+        Message saying zip is used instead
     """
+    if codec not in CODECS:
+        return f"Unknown codec {codec}, using zip"
+    if codec == "tar.zst" and importlib.util.find_spec("zstandard") is None:
+        return "tar.zst needs the zstandard package, using zip"
+    return None
+
+
+def backup_spec(entry: dict = None) -> str:
+    """
+    Returns the format backups of a game are made in now, "chunked" or
+    the codec and level like "tar.zst:3". Stored with every backup so a
+    change of format isn't mistaken for an up to date copy.
+
     Parameters
     ----------
-    folder_name : str
-        Name of the folder to upload to
+    entry: dict, optional
+        Entry of the game in state.db
+    """
+    if backup_format() == "chunked":
+        return "chunked"
+    codec, level = backup_codec(entry)
+    return f"{codec}:{CODECS[codec][2] if level is None else level}"
 
-    game: SaveDir
-        SaveDir object for game
 
-    upload_time : datetime
-        datetime object of the upload
+def backup_name(game_name: str, codec: str = None) -> str:
+    """
+    Returns the name of a game's backup on Drive for the configured format,
+    or for codec if given
+    """
+    if codec is None:
+        if backup_format() == "chunked":
+            return f"{game_name}{SNAPSHOT_SUFFIX}"
+        codec = backup_codec()[0]
+    return f"{game_name}{CODECS[codec][0]}"
 
-    root: str
-    ID of Google Drive Folder
+
+def strip_backup_name(name: str) -> str:
+    """
+    Returns the game name a backup on Drive belongs to
+    """
+    extensions = sorted({codec[0] for codec in CODECS.values()}, key=len, reverse=True)
+    for suffix in (SNAPSHOT_SUFFIX, *extensions):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def hash_saves() -> bool:
+    """
+    Returns whether save manifests record file hashes, set by hash_files in
+    the Backup section of config.ini. With hashes, files that were only
+    touched don't count as changed.
 
     Returns
     -------
-    status: list
-        List containing bool of upload success and if so, upload time.
+    hash_files: bool
+        Whether to hash files when scanning saves
     """
-    # Find files already in Drive
-    drive_folder = create_folder(folder_name, parent=root)
-    files = list_folder(drive_folder)
-    local_overwrite = True
-    cloud_file = [
-        save_file for save_file in files if save_file["name"] == f"{game.name}.zip"
-    ]
-    upload_time = datetime.fromtimestamp(upload_time, tz=timezone.utc)
-    local_modified = datetime.fromtimestamp(game.modified, tz=timezone.utc)
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    return config.getboolean("Backup", "hash_files", fallback=False)
 
-    print(f"Working on {game.name}")
-    # Check if cloud file was modified before or after upload time
-    if cloud_file:
-        date_time_obj = datetime.fromisoformat(cloud_file[0]["modifiedTime"])
-        if upload_time < local_modified and upload_time != datetime.fromtimestamp(
-            0, tz=timezone.utc
-        ):
-            print("Cloud file found, Syncing")
-            if not overwrite:
-                questions = [
-                    inquirer.List(
-                        "delete",
-                        message=f"Do you want to delete the cloud file or upload as revision? (Cloud version uploaded:{date_time_obj.strftime('%b %-d %Y, %H:%M:%S')})",
-                        choices=["Delete", "Update"],
-                    )
-                ]
-                answer = inquirer.prompt(questions, theme=GreenPassion())
-            if overwrite or answer["delete"] == "Delete":
-                delete_status = delete_file(cloud_file[0]["id"])
-                if not delete_status:
-                    print("Deletion Failed")
-                    return [False, None]
-                local_overwrite = True
-            else:
-                local_overwrite = False
 
-        elif date_time_obj < upload_time:
-            print(f"Skipping {game.name}, Google Drive up to date")
+def backup_workers() -> int:
+    """
+    Returns the number of games to back up at the same time, set by
+    workers in the Backup section of config.ini
+
+    Returns
+    -------
+    workers: int
+        Number of worker threads
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    return max(1, config.getint("Backup", "workers", fallback=default_workers))
+
+
+def backup_games(jobs: list, workers: int) -> list:
+    """
+    Runs backup jobs on a pool of worker threads. Each worker zips and
+    uploads its own game with its own Drive client, zlib releases the GIL
+    so compression runs in parallel too. Once every job finished, the
+    cloud files replaced by the ones that succeeded are deleted and
+    revisions are pinned, both in batches. The upload time of every job
+    with a key is stored in state.db as soon as it succeeds.
+
+    Parameters
+    ----------
+    jobs: list
+        BackupJob objects to run
+
+    workers: int
+        Maximum number of jobs running at once
+
+    Returns
+    -------
+    statuses: list
+        Status of every job as returned by run_job, in the order of jobs
+    """
+
+    def safe_run(job: BackupJob) -> list:
+        try:
+            status = run_job(job)
+        except Exception as error:
+            print(f"Backing up {job.game.name} failed: {error}")
             return [False, None]
-        elif date_time_obj > upload_time or upload_time == datetime.fromtimestamp(
-            0, tz=timezone.utc
+        if status[0] == True and job.entry is not None:
+            job.entry["uploaded"] = status[1]
+            if job.key:
+                open_state().set_uploaded(job.key, status[1])
+        return status
+
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+        statuses = list(executor.map(safe_run, jobs))
+    # A backend keying files by name may have put an upload in place of
+    # the file it replaces
+    stale = [
+        (job, old_id)
+        for job in jobs
+        if job.uploaded_id
+        for old_id in (job.delete_id, job.replaced_id)
+        if old_id and old_id != job.uploaded_id
+    ]
+    if stale:
+        for (job, _), deleted in zip(
+            stale, delete_files([old_id for _, old_id in stale])
         ):
-            choices = [
-                f"Replace with cloud version (Uploaded: {date_time_obj.strftime('%b %-d %Y, %H:%M:%S')})",
-                f"Upload current version (Modified: {local_modified.strftime('%b %-d %Y, %H:%M:%S')})",
-                "Skip",
-            ]
-            questions = [
-                inquirer.List(
-                    "cloud",
-                    message="Cloud file is more recent, what would you like to do?",
-                    choices=choices,
-                )
-            ]
-            answer = inquirer.prompt(questions, theme=GreenPassion())
-            if answer["cloud"] == choices[0]:
-                print("Syncing")
-                fetch_cloud_file(game, cloud_file[0]["id"])
-                print("Completed!")
-                return [True, float(date_time_obj.strftime("%s"))]
-            elif answer["cloud"] == choices[2]:
-                print("Sync cancelled")
-                return [False, None]
-            elif answer["cloud"] == choices[1]:
-                local_overwrite = False
-                """consent = input("Cloud file is more recent, sync with cloud? (Y/n)")
-                if consent.lower() == "y":
-                    print("Syncing")
-                    fetch_cloud_file(game, cloud_file[0]["id"])
-                    print("Completed!")
-                else:
-                    print("Sync cancelled")"""
-    file_id = upload_file(
-        game.path,
-        f"{game.name}.zip",
-        drive_folder,
-        True,
-        local_overwrite,
-        None if local_overwrite else cloud_file[0]["id"],
-    )
-    print(f"Finished {game.name}")
-    return [True, float(datetime.now().strftime("%s"))]
+            if not deleted:
+                print(f"Couldn't remove the old backup of {job.game.name}")
+    if persistent:
+        pin_latest_revisions([job.uploaded_id for job in jobs if job.uploaded_id])
+    return statuses
 
 
-def add_custom(game_name, path):
-    config = load_config()
+def add_custom(game_name, path, codec=None):
     if os.path.exists(path):
-        config["games"][game_name] = {"path": os.path.abspath(path), "uploaded": 0}
-    save_config(config)
+        path = os.path.abspath(path)
+        # Changing only the codec keeps the save's backup time
+        current = open_state().saves().get(("games", game_name))
+        uploaded = current["uploaded"] if current and current["path"] == path else 0
+        entry = {"path": path, "uploaded": uploaded}
+        if codec:
+            warn_codec(codec.partition(":")[0], game_name)
+            entry["codec"] = codec
+        open_state().put_save(("games", game_name), entry)
 
 
 def steam_sync(root: str):
@@ -745,7 +1996,50 @@ def steam_sync(root: str):
         print(steam_game)
 
 
-def heroic_sync(root: str):  # sourcery skip: extract-method
+def resolve_prefixes(prefixes: list) -> list:
+    """
+    Finds the save directories of Heroic prefixes, looking several of them
+    up on PCGamingWiki at once
+
+    Parameters
+    ----------
+    prefixes: list
+        Names of the prefixes in the Heroic prefix directory
+
+    Returns
+    -------
+    saves: list
+        SaveDir objects in the same order as prefixes
+    """
+    from tqdm import tqdm
+
+    def resolve(prefix: str) -> SaveDir:
+        prefix_path = os.path.join(heroic_dir, prefix)
+        save_path = check_pcgw_location(prefix, "Epic", prefix_path)
+        return SaveDir(prefix, save_path, os.path.getmtime(save_path))
+
+    saves = [None] * len(prefixes)
+    with ThreadPoolExecutor(max_workers=pcgw_workers) as executor, tqdm(
+        total=len(prefixes),
+        bar_format="{desc}: {n_fmt}/{total_fmt}|{bar}|",
+        desc="Progress",
+        leave=False,
+        ncols=50,
+        unit="file",
+    ) as progress:
+        futures = {
+            executor.submit(resolve, prefix): index
+            for index, prefix in enumerate(prefixes)
+        }
+        for future in as_completed(futures):
+            saves[futures[future]] = future.result()
+            progress.update()
+    return saves
+
+
+def heroic_sync(
+    root: str, save_json: dict, games: list = None, policy: str = None
+) -> list:  # sourcery skip: extract-method
     """
     Sync Heroic files
 
@@ -754,11 +2048,24 @@ def heroic_sync(root: str):  # sourcery skip: extract-method
 
     root: str
         ID of SaveHaven folder in Google Drive
-    """
 
+    save_json: dict
+        Contents of the configuration file, new games are added to it
+
+    games: list, optional
+        Patterns of the games to back up, see select_saves. Prompts if
+        not given
+
+    policy: str, optional
+        How conflicts are settled, see plan_upload
+
+    Returns
+    -------
+    jobs: list
+        BackupJob objects for the selected games
+    """
     heroic_saves = []
-    if os.path.exists(list_file):
-        save_json = load_config()
+    if save_json["games"]:
         prefixes = os.listdir(heroic_dir)
         missing_games = [
             game for game in prefixes if game not in save_json["games"].keys()
@@ -778,61 +2085,30 @@ def heroic_sync(root: str):  # sourcery skip: extract-method
             heroic_saves.append(SaveDir(key, save_path, modified_time))
         if missing_games:
             print("Processing files and making API calls...")
-        for files in tqdm(
-            missing_games,
-            bar_format="{desc}: {n_fmt}/{total_fmt}|{bar}|",
-            desc="Progress",
-            leave=False,
-            ncols=50,
-            unit="file",
-        ):
-            prefix_path = os.path.join(heroic_dir, files)
-            # selected_game.path = check_pcgw_location(selected_game.name, "Epic", selected_game.path)
-            save_path = check_pcgw_location(files, "Epic", prefix_path)
-            heroic_saves.append(
-                SaveDir(
-                    files,
-                    save_path,
-                    os.path.getmtime(save_path),
-                )
-            )
+        heroic_saves.extend(resolve_prefixes(missing_games))
     else:
-        save_json = {"games": {}, "minecraft": {}}
         print("Processing files and making API calls...")
-        for files in tqdm(
-            os.listdir(heroic_dir),
-            bar_format="{desc}: {n_fmt}/{total_fmt}|{bar}|",
-            desc="Progress",
-            leave=False,
-            ncols=50,
-            unit="file",
-        ):
-            if os.path.isdir(os.path.join(heroic_dir, files)):
-                prefix_path = os.path.join(heroic_dir, files)
-                # selected_game.path = check_pcgw_location(selected_game.name, "Epic", selected_game.path)
-                save_path = check_pcgw_location(files, "Epic", prefix_path)
-                heroic_saves.append(
-                    SaveDir(
-                        files,
-                        save_path,
-                        os.path.getmtime(save_path),
-                    )
-                )
+        heroic_saves.extend(
+            resolve_prefixes(
+                [
+                    files
+                    for files in os.listdir(heroic_dir)
+                    if os.path.isdir(os.path.join(heroic_dir, files))
+                ]
+            )
+        )
     for save in heroic_saves:
         if len(save_json["games"]) > 0 and save.name in save_json["games"].keys():
             continue
         save_json["games"][save.name] = {"path": save.path, "uploaded": 0}
+        open_state().put_save(("games", save.name), save_json["games"][save.name])
 
-    questions = [
-        inquirer.Checkbox(
-            "selected_games",
-            message="Select games to backup",
-            choices=[i.name for i in heroic_saves],
-        )
-    ]
+    def prompt(choices: list) -> list:
+        from pyfzf.pyfzf import FzfPrompt
 
-    choices = [i.name for i in heroic_saves]
-    answers = fzf.prompt(choices, "--multi --cycle")
+        return FzfPrompt().prompt(choices, "--multi --cycle")
+
+    answers = select_saves([i.name for i in heroic_saves], games, prompt)
 
     print("Backing up these games: ")
 
@@ -841,17 +2117,26 @@ def heroic_sync(root: str):  # sourcery skip: extract-method
         print(f"    {i}")
         selected_games.extend(j for j in heroic_saves if j.name == i)
 
+    jobs = []
     for game in selected_games:
         if game.path != "N/A":
-            upload_status = upload_game(
-                "Heroic", game, save_json["games"][game.name]["uploaded"], root
+            job = plan_upload(
+                "Heroic",
+                game,
+                save_json["games"][game.name]["uploaded"],
+                root,
+                policy,
+                save_json["games"][game.name],
             )
-            if upload_status[0] == True:
-                save_json["games"][game.name]["uploaded"] = upload_status[1]
-    save_config(save_json)
+            if job:
+                job.key = ("games", game.name)
+                jobs.append(job)
+    return jobs
 
 
-def minecraft_sync(root: str):
+def minecraft_sync(
+    root: str, save_json: dict, games: list = None, policy: str = None
+) -> list:
     """
     Sync Minecraft files
 
@@ -860,17 +2145,36 @@ def minecraft_sync(root: str):
 
     root: str
         ID of SaveHaven folder in Google Drive
+
+    save_json: dict
+        Contents of the configuration file, new worlds are added to it
+
+    games: list, optional
+        Patterns of the worlds to back up, see select_saves. Prompts if
+        not given
+
+    policy: str, optional
+        How conflicts are settled, see plan_upload
+
+    Returns
+    -------
+    jobs: list
+        BackupJob objects for the selected worlds
     """
     print("Minceraft")
     config = configparser.ConfigParser()
     config.read(os.path.join(config_dir, "config.ini"))
-    save_json = load_config()
+    jobs = []
     if "minecraft" not in save_json.keys():
         save_json["minecraft"] = {}
     worlds = {
-        launcher: get_worlds(launcher)
+        launcher: get_worlds(launcher, games)
         for launcher in config["Minecraft"]["selected"].split(",")
     }
+    minecraft_folder = open_folder("Minecraft", parent=root)[0]
+    if minecraft_folder is None:
+        print("Couldn't open the Minecraft folder, skipping worlds")
+        return jobs
     for launcher, launcher_worlds in worlds.items():
         if launcher not in save_json["minecraft"].keys():
             save_json["minecraft"][launcher] = {}
@@ -881,32 +2185,52 @@ def minecraft_sync(root: str):
                     "path": world.path,
                     "uploaded": 0,
                 }
-            minecraft_folder = create_folder("Minecraft", parent=root)
-            upload_status = upload_game(
+                open_state().put_save(
+                    ("minecraft", launcher, world.name),
+                    save_json["minecraft"][launcher][world.name],
+                )
+            job = plan_upload(
                 launcher,
                 world,
                 save_json["minecraft"][launcher][world.name]["uploaded"],
                 minecraft_folder,
+                policy,
+                save_json["minecraft"][launcher][world.name],
             )
-            if upload_status[0] == True:
-                save_json["minecraft"][launcher][world.name]["uploaded"] = (
-                    upload_status[1]
-                )
-    save_config(save_json)
+            if job:
+                job.key = ("minecraft", launcher, world.name)
+                jobs.append(job)
+    return jobs
 
 
-def get_worlds(launcher: str):
+def get_worlds(launcher: str, games: list = None):
     """
     Parameters
     ----------
     launcher : str
         Minecraft Launcher (MultiMC, PrismLauncher, Official)
 
+    games: list, optional
+        Patterns of the worlds to back up, see select_saves. Worlds of
+        every instance are matched. Prompts if not given
+
     Returns
     -------
     worlds : list
         list of SaveDir objects of Minecraft worlds
     """
+    import inquirer
+    from inquirer.themes import GreenPassion
+
+    def checkbox(message: str):
+        def prompt(choices: list) -> list:
+            questions = [
+                inquirer.Checkbox("selected", message=message, choices=choices)
+            ]
+            return inquirer.prompt(questions, theme=GreenPassion())["selected"]
+
+        return prompt
+
     locations = {
         "Official": os.path.join(os.path.expanduser("~"), ".minecraft"),
         "Prism Launcher": os.path.join(
@@ -932,67 +2256,97 @@ def get_worlds(launcher: str):
             if x not in [".LAUNCHER_TEMP", "instgroups.json"]
             and os.path.isdir(locations[launcher])
         ]
-        questions = [
-            inquirer.Checkbox(
-                "selected_instances",
-                message=f"Select instances from {launcher}",
-                choices=instances,
+        if games is None:
+            selected_instances = checkbox(f"Select instances from {launcher}")(
+                instances
             )
-        ]
-        answers = inquirer.prompt(questions, theme=GreenPassion())
-        for instance in answers["selected_instances"]:
+        else:
+            selected_instances = instances
+        for instance in selected_instances:
             saves_dir = os.path.join(
                 locations[launcher],
                 instance,
                 ".minecraft" if launcher == "Prism Launcher" else "minecraft",
                 "saves",
             )
+            if not os.path.isdir(saves_dir):
+                continue
             instance_worlds = os.listdir(saves_dir)
-            questions = [
-                inquirer.Checkbox(
-                    "selected_worlds",
-                    message=f"Select worlds from {instance}",
-                    choices=instance_worlds,
-                )
-            ]
-            answers = inquirer.prompt(questions, theme=GreenPassion())
-            worlds = [
+            selected_worlds = select_saves(
+                instance_worlds, games, checkbox(f"Select worlds from {instance}")
+            )
+            worlds.extend(
                 SaveDir(
                     world,
                     os.path.join(saves_dir, world),
                     os.path.getmtime(os.path.join(saves_dir, world)),
                 )
-                for world in answers["selected_worlds"]
-            ]
+                for world in selected_worlds
+            )
     else:
         instance_worlds = os.listdir(os.path.join(locations[launcher], "saves"))
-        questions = [
-            inquirer.Checkbox(
-                "selected_worlds",
-                message="Select worlds",
-                choices=instance_worlds,
-            )
-        ]
-        answers = inquirer.prompt(questions, theme=GreenPassion())
+        selected_worlds = select_saves(
+            instance_worlds, games, checkbox("Select worlds")
+        )
         worlds = [
             SaveDir(
                 x,
                 os.path.join(os.path.join(locations[launcher], "saves", x)),
                 os.path.getmtime(os.path.join(locations[launcher], "saves", x)),
             )
-            for x in answers["selected_worlds"]
+            for x in selected_worlds
         ]
     return worlds
 
 
-def search_dir(root: str):
+def select_saves(names: list, games: list, prompt) -> list:
+    """
+    Picks the saves to back up, by pattern or by asking
+
+    Parameters
+    ----------
+    names: list
+        Names of the saves found
+
+    games: list
+        Shell-style patterns such as "Hades" or "Celeste*", a save is
+        picked if any of them matches its name. None to ask instead
+
+    prompt: callable
+        Asks which of the names given to it to pick
+
+    Returns
+    -------
+    selected: list
+        Names of the picked saves
+    """
+    if games is None:
+        return prompt(names)
+    return [
+        name
+        for name in names
+        if any(fnmatch(name.casefold(), pattern.casefold()) for pattern in games)
+    ]
+
+
+def search_dir(root: str, workers: int, games: list = None, policy: str = None):
     """
-    Scan directories for save files
+    Scan directories for save files, then back them up in parallel
 
     Parameters
     ----------
     root: str
         ID of the SaveHaven folder on Drive
+
+    workers: int
+        Number of games to back up at the same time
+
+    games: list, optional
+        Patterns of the saves to back up, see select_saves. Prompts if
+        not given
+
+    policy: str, optional
+        How conflicts are settled, see plan_upload
     """
     # TODO: Make this shit readable
     # Gets selected launchers
@@ -1000,32 +2354,46 @@ def search_dir(root: str):
     config.read(os.path.join(config_dir, "config.ini"))
     launchers = config["Launchers"]["selected"].split(",")
     home_path = os.path.expanduser("~")
+    save_json = load_config()
+    jobs = []
 
     # Heroic scanning
     if "Games" in os.listdir(home_path) and "Heroic" in launchers:
-        heroic_sync(root)
+        jobs.extend(heroic_sync(root, save_json, games, policy))
 
     if "Minecraft" in launchers:
-        minecraft_sync(root)
+        jobs.extend(minecraft_sync(root, save_json, games, policy))
     """
     if "Steam" in launchers:
         steam_sync(root)
     """
 
+    backup_games(jobs, workers)
 
-def backup(p: bool = False, o: bool = False):
+
+def backup(
+    p: bool = False,
+    o: bool = False,
+    j: int = None,
+    games: list = None,
+    policy: str = None,
+):
     """
     Performs a backup of save files to the SaveHaven cloud storage.
 
     Args:
         p (bool, optional): Flag indicating whether to enable persistent storage. Defaults to False.
         o (bool, optional): Flag indicating whether to enable overwrite mode. Defaults to False.
+        j (int, optional): Number of games to back up at the same time. Defaults to the config.ini setting.
+        games (list, optional): Patterns of the saves to back up, ["*"] for all of them. Runs without prompts when given. Defaults to asking.
+        policy (str, optional): How conflicts with cloud copies are settled, one of POLICIES. Defaults to "newest-wins" when games is given, asking otherwise.
 
     Returns:
         None
 
     Examples:
         backup(p=True, o=False)
+        backup(games=["*"], policy="revision")
     """
 
     # TODO: add support for persistent (store this version of the file permanently) and overwrite (delete previous file in Google Drive instead of prompting for deletion or updating)
@@ -1033,17 +2401,234 @@ def backup(p: bool = False, o: bool = False):
     persistent = p
     global overwrite
     overwrite = o
+    if games is not None and policy is None:
+        policy = "newest-wins"
     config = os.path.join(config_dir, "config.ini")
+    if not os.path.exists(config) and games is not None:
+        print("Config file not found, run savehaven updatecfg first")
+        return
     if not os.path.exists(config):
         print("Config file not found, running intialization")
         print("Select launchers (if not listed, add paths manually):")
         update_launchers()
 
-    # If SaveHaven folder doesn't exist, create it.
-    folder = create_folder(filename="SaveHaven")
+    # If SaveHaven folder doesn't exist, create it, and list everything in it
+    if load_inventory() is None:
+        return
 
     # Search for save file directories
-    search_dir(folder)
+    search_dir(inventory.root, j or backup_workers(), games, policy)
+
+
+def watch_quiet_seconds() -> float:
+    """
+    Returns how long a save has to stay untouched before watch backs it
+    up, set by quiet_seconds in the Watch section of config.ini
+
+    Returns
+    -------
+    quiet: float
+        Seconds without changes
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    return config.getfloat("Watch", "quiet_seconds", fallback=default_quiet_seconds)
+
+
+def watched_saves(save_json: dict) -> dict:
+    """
+    Returns the saves in a dict returned by load_config, games and
+    Minecraft worlds alike
+
+    Parameters
+    ----------
+    save_json: dict
+        Saves returned by load_config
+
+    Returns
+    -------
+    saves: dict
+        Entry of every save keyed by ("games", name) or ("minecraft",
+        launcher, world)
+    """
+    saves = {("games", name): entry for name, entry in save_json["games"].items()}
+    for launcher, worlds in save_json.get("minecraft", {}).items():
+        for world, entry in worlds.items():
+            saves[("minecraft", launcher, world)] = entry
+    return saves
+
+
+def configured_saves() -> dict:
+    """
+    Returns the saves backup --all would back up, without looking anything
+    up online: every save in state.db and every world of the selected
+    Minecraft launchers. Worlds that were never backed up are added to
+    state.db.
+
+    Returns
+    -------
+    saves: dict
+        Entry of every save keyed like watched_saves
+    """
+    config = configparser.ConfigParser()
+    config.read(os.path.join(config_dir, "config.ini"))
+    saves = watched_saves(load_config())
+    if "Minecraft" not in config.get("Launchers", "selected", fallback="").split(","):
+        return saves
+    for launcher in config.get("Minecraft", "selected", fallback="").split(","):
+        if not launcher:
+            continue
+        try:
+            worlds = get_worlds(launcher, ["*"])
+        except OSError as error:
+            print(f"Couldn't list the worlds of {launcher}: {error}")
+            continue
+        for world in worlds:
+            key = ("minecraft", launcher, world.name)
+            if key not in saves:
+                saves[key] = {"path": world.path, "uploaded": 0}
+                open_state().put_save(key, saves[key])
+    return saves
+
+
+def backup_saves(keys: list, policy: str, workers: int) -> list:
+    """
+    Backs up saves from state.db without prompting
+
+    Parameters
+    ----------
+    keys: list
+        Keys of the saves as returned by watched_saves
+
+    policy: str
+        How conflicts with the cloud copies are settled, one of POLICIES
+
+    workers: int
+        Number of saves backed up at the same time
+
+    Returns
+    -------
+    jobs: list
+        Jobs that ran
+    """
+    save_json = load_config()
+    saves = watched_saves(save_json)
+    if load_inventory() is None:
+        return []
+    jobs = []
+    for key in keys:
+        entry = saves.get(key)
+        if entry is None or not os.path.isdir(entry["path"]):
+            continue
+        if key[0] == "minecraft":
+            folder_name = key[1]
+            parent = open_folder("Minecraft", parent=inventory.root)[0]
+            if parent is None:
+                print(f"Skipping {key[-1]}, couldn't open the Minecraft folder")
+                continue
+        else:
+            folder_name, parent = "Heroic", inventory.root
+        game = SaveDir(key[-1], entry["path"], os.path.getmtime(entry["path"]))
+        job = plan_upload(folder_name, game, entry["uploaded"], parent, policy, entry)
+        if job:
+            job.key = key
+            jobs.append(job)
+    backup_games(jobs, workers)
+    return jobs
+
+
+def watch(policy: str = "newest-wins", quiet: float = None, j: int = None):
+    """
+    Watches every save backup --all would back up with inotify and backs a
+    save up once it has been left alone for a while, e.g. right after the
+    game is closed. Saves that can't be watched, e.g. once the inotify
+    watch limit is reached, are scanned every poll_seconds instead. Runs
+    until interrupted.
+
+    Args:
+        policy (str, optional): How conflicts with the cloud copy are settled, one of POLICIES. Defaults to "newest-wins".
+        quiet (float, optional): Seconds a save has to stay untouched. Defaults to the config.ini setting.
+        j (int, optional): Number of saves to back up at the same time. Defaults to the config.ini setting.
+
+    Returns:
+        None
+
+    Examples:
+        watch(policy="revision", quiet=60)
+    """
+    from savehaven.watch import Inotify
+
+    quiet = watch_quiet_seconds() if quiet is None else quiet
+    saves = configured_saves()
+    inotify = Inotify()
+    # Last scan of every polled save
+    polled = {}
+
+    def scan(key) -> dict:
+        try:
+            return scan_tree(saves[key]["path"])
+        except OSError:
+            return None
+
+    def poll(key):
+        error = inotify.failed[key]
+        print(
+            f"Couldn't watch {error.filename}: {error.strerror}, "
+            f"checking {key[-1]} every {poll_seconds} seconds instead"
+        )
+        inotify.unwatch(key)
+        polled[key] = scan(key)
+
+    def start(key):
+        if key in polled:
+            polled[key] = scan(key)
+        elif os.path.isdir(saves[key]["path"]):
+            if not inotify.watch_tree(saves[key]["path"], key):
+                poll(key)
+
+    for key in saves:
+        start(key)
+    print(f"Watching {len(inotify.watches)} directories of {len(saves)} saves")
+    # Monotonic time each changed save is due to be backed up at
+    pending = {}
+    next_poll = time.monotonic() + poll_seconds
+    try:
+        while True:
+            timeout = None
+            if pending:
+                timeout = max(0, min(pending.values()) - time.monotonic())
+            if polled:
+                timeout = min(
+                    timeout if timeout is not None else poll_seconds,
+                    max(0, next_poll - time.monotonic()),
+                )
+            changed = inotify.read(timeout)
+            # Directories created later may not get a watch either
+            for key in [key for key in inotify.failed if key not in polled]:
+                poll(key)
+            if polled and time.monotonic() >= next_poll:
+                for key, last in polled.items():
+                    if (current := scan(key)) != last:
+                        polled[key] = current
+                        changed.add(key)
+                next_poll = time.monotonic() + poll_seconds
+            for key in changed:
+                # Every change pushes the backup back until the save is quiet
+                pending[key] = time.monotonic() + quiet
+            due = [key for key, at in pending.items() if at <= time.monotonic()]
+            if not due:
+                continue
+            for key in due:
+                del pending[key]
+            backup_saves(due, policy, j or backup_workers())
+            # Restores swap the save directory, watch whatever is there now
+            for key in due:
+                inotify.unwatch(key)
+                start(key)
+    except KeyboardInterrupt:
+        print("Stopped watching")
+    finally:
+        inotify.close()
 
 
 def list_cloud():
@@ -1059,9 +2644,11 @@ def list_cloud():
     Examples:
         list_cloud()
     """
+    import inquirer
+    from inquirer.themes import GreenPassion
 
-    folder = create_folder(filename="SaveHaven")
-    savehaven_folder = list_folder(folder)
+    folder, savehaven_folder = open_folder("SaveHaven")
+    savehaven_folder = list(savehaven_folder.values())
     questions = [
         inquirer.List(
             "folders",
@@ -1095,16 +2682,19 @@ def list_cloud():
         )
     ]
     answers = inquirer.prompt(questions, theme=GreenPassion())
-    for revision in answers["revision"]:
-        service.revisions().update(
-            fileId=selected_file[0]["id"],
-            revisionId=[
-                x["id"]
-                for x in revisions
-                if revision[revision.rfind(" ") + 1 :] == x["modifiedTime"]
-            ][0],
-            body={"keepForever": True},
-        ).execute()
+    pin_revisions(
+        [
+            (
+                selected_file[0]["id"],
+                [
+                    x["id"]
+                    for x in revisions
+                    if revision[revision.rfind(" ") + 1 :] == x["modifiedTime"]
+                ][0],
+            )
+            for revision in answers["revision"]
+        ]
+    )
 
 
 def get_save_location(name: str) -> str:
@@ -1120,10 +2710,11 @@ def get_save_location(name: str) -> str:
     Examples:
         save_location = get_save_location(name)
     """
+    from bs4 import BeautifulSoup
 
     steam_search_url = "https://store.steampowered.com/search/?term="
     search_term = name.replace(" ", "+")
-    steam_search = requests.get(steam_search_url + search_term)
+    steam_search = get_http_session().get(steam_search_url + search_term)
     search_soup = BeautifulSoup(steam_search.content, "html.parser")
     result = search_soup.find("a", class_="search_result_row")
     game_id = result["href"].replace("https://store.steampowered.com/app/", "")
@@ -1140,6 +2731,9 @@ def update_launchers():
         List of launchers
 
     """
+    import inquirer
+    from inquirer.themes import GreenPassion
+
     questions = [
         inquirer.Checkbox(
             "launchers",
@@ -1176,41 +2770,75 @@ def update_launchers():
         config.write(list_file)
 
 
-def fetch_cloud_file(game: SaveDir, cloud_file: str):
+@timed("restore")
+def fetch_cloud_file(game: SaveDir, cloud_file: str) -> bool:
     """
     Fetches a file from the cloud and restores it to the specified game directory.
 
+    The download is streamed to a temporary file and extracted next to the
+    game directory, which is then swapped in with a rename. The current
+    save is only moved to the backups dir once the cloud version is ready.
+
     Args:
         game (SaveDir): The game directory to restore the file to.
         cloud_file (str): The ID of the file in the cloud.
 
     Returns:
-        None
+        bool: Whether the cloud version was restored
 
     Examples:
         fetch_cloud_file(game, cloud_file)
     """
 
+    game_path = os.path.abspath(game.path)
     game_backup = os.path.join(
         backups_dir, game.name, datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
     )
-    if not os.path.exists(os.path.join(backups_dir, game.name)):
-        os.mkdir(os.path.join(backups_dir, game.name))
-    move(game.path, game_backup)
-    zip_file = download(cloud_file)
-    with open(os.path.join(tmp_dir, f"{game.name}.zip"), "wb") as downloaded_file:
-        downloaded_file.write(zip_file.getbuffer())
-    unpack_archive(
-        os.path.join(tmp_dir, f"{game.name}.zip"),
-        os.path.join(tmp_dir, game.name),
+    # Extract on the same filesystem as the save so it can be renamed into place
+    staging = os.path.join(
+        os.path.dirname(game_path), f".{os.path.basename(game_path)}.restoring"
     )
-    os.remove(os.path.join(tmp_dir, f"{game.name}.zip"))
-    os.mkdir(game.path)
-    for file in os.listdir(os.path.join(tmp_dir, game.name)):
-        move(
-            os.path.join(tmp_dir, game.name, file),
-            game.path,
-        )
+    archive_path = os.path.join(tmp_dir, f"{game.name}.download")
+    rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    try:
+        with open(archive_path, "w+b") as archive:
+            if download(cloud_file, archive) is None:
+                print(f"Downloading {game.name} failed, local save left as is")
+                rmtree(staging)
+                return False
+            archive.seek(0)
+            if archive.read(1) == b"{":
+                # Chunked backup, rebuild the files from the chunk store
+                archive.seek(0)
+                store = chunk_store()
+                if store is None:
+                    print(f"Couldn't open the Chunks folder, {game.name} left as is")
+                    rmtree(staging)
+                    return False
+                try:
+                    restore_snapshot(
+                        json.loads(archive.read()), staging, read_chunk(store)
+                    )
+                except (StorageError, ValueError) as error:
+                    print(f"{error}, {game.name} left as is")
+                    rmtree(staging)
+                    return False
+            else:
+                with span("extract_archive"):
+                    extract_archive(archive, staging)
+    except Exception:
+        rmtree(staging, ignore_errors=True)
+        raise
+    finally:
+        if os.path.exists(archive_path):
+            os.remove(archive_path)
+
+    if os.path.exists(game_path):
+        os.makedirs(os.path.join(backups_dir, game.name), exist_ok=True)
+        move(game_path, game_backup)
+    os.replace(staging, game_path)
+    return True
 
 
 def restore():
@@ -1226,10 +2854,14 @@ def restore():
     Examples:
         restore()
     """
+    import inquirer
+    from inquirer.themes import GreenPassion
 
-    root_folder = create_folder(filename="SaveHaven")
     config = load_config()
-    folders = list_folder(root_folder)
+    if load_inventory() is None:
+        return
+    root_folder = inventory.root
+    folders = [x for x in inventory.files(root_folder).values() if x["name"] != "Chunks"]
     if len(folders) > 1:
         questions = [
             inquirer.Checkbox(
@@ -1241,7 +2873,7 @@ def restore():
         answers = inquirer.prompt(questions, theme=GreenPassion())
         folders = [x for x in folders if x["name"] in answers["folder"]]
     for folder in folders:
-        files = list_folder(create_folder(filename=folder["name"], parent=root_folder))
+        files = list(open_folder(folder["name"], parent=root_folder)[1].values())
         local_files = [
             (
                 SaveDir(key, value["path"], os.path.getmtime(value["path"]))
@@ -1255,7 +2887,7 @@ def restore():
         # for i in range(len(files)):
         i = 0
         while i < len(files):
-            cloud_files.append(f"{files[i]['name'][:-4]} (Uploaded:)")
+            cloud_files.append(f"{strip_backup_name(files[i]['name'])} (Uploaded:)")
             if cloud_files[i][:-12] not in filenames:
                 files.pop(i)
             else:
@@ -1265,7 +2897,7 @@ def restore():
     ]
     answers = inquirer.prompt(questions, theme=GreenPassion())
     for answer in answers["files"]:
-        name = answer["name"][:-4]
+        name = strip_backup_name(answer["name"])
         for save in local_files:
             if name == save.name:
                 fetch_cloud_file(save, answer["id"])
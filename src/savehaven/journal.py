@@ -0,0 +1,108 @@
+# region Imports
+import time
+
+from savehaven.state import open_state
+
+# endregion
+
+
+# region Variables
+# Drive forgets resumable sessions after a week
+SESSION_LIFETIME = 6 * 24 * 60 * 60
+# endregion
+
+
+# region Classes
+
+
+class UploadSession:
+    """
+    Resumable upload of one file, recorded in the journal as it goes so a
+    restarted backup carries on where the last one stopped
+
+    Attributes
+    ----------
+    uri: str
+        Where the backend resumes the upload, None for a new upload
+
+    offset: int
+        Bytes the backend had committed when the session was last recorded
+    """
+
+    def __init__(
+        self, journal, key: str, identity: str, uri: str = None, offset: int = 0
+    ):
+        self.journal = journal
+        self.key = key
+        self.identity = identity
+        self.uri = uri
+        self.offset = offset
+
+    def commit(self, uri: str, offset: int):
+        """
+        Records that the backend has everything before offset
+        """
+        self.uri = uri
+        self.offset = offset
+        self.journal.record(self)
+
+    def finish(self):
+        """
+        Forgets the session once the upload completed or can't be resumed
+        """
+        self.uri = None
+        self.offset = 0
+        self.journal.forget(self.key)
+
+
+class UploadJournal:
+    """
+    Resumable upload sessions by upload target, kept in state.db with
+    one row per session
+    """
+
+    def session(self, key: str, identity: str) -> UploadSession:
+        """
+        Returns the session recorded for key, or a new one if there isn't
+        one for the same archive or it has expired
+
+        Parameters
+        ----------
+        key: str
+            Upload target, the backend and the name or ID of the file
+
+        identity: str
+            Identifies the bytes being uploaded, a session is only resumed
+            for the exact same archive
+
+        Returns
+        -------
+        session: UploadSession
+            Session to pass to Backend.upload
+        """
+        entry = open_state().upload(key)
+        if (
+            entry
+            and entry["identity"] == identity
+            and time.time() - entry["updated"] < SESSION_LIFETIME
+        ):
+            print(f"Resuming upload from {entry['offset'] // (1024 * 1024)} MiB")
+            return UploadSession(self, key, identity, entry["uri"], entry["offset"])
+        return UploadSession(self, key, identity)
+
+    def record(self, session: UploadSession):
+        """
+        Stores the progress of a session
+        """
+        open_state().put_upload(
+            session.key, session.identity, session.uri, session.offset
+        )
+
+    def forget(self, key: str):
+        """
+        Drops the session recorded for key
+        """
+        open_state().forget_upload(key)
+
+
+# endregion
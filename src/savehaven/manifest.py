@@ -0,0 +1,185 @@
+# region Imports
+import os
+import hashlib
+
+from savehaven.state import open_state
+
+# endregion
+
+
+# region Variables
+HASH_READ_SIZE = 1024 * 1024
+# endregion
+
+
+# region Manifest functions
+def hash_file(path: str) -> str:
+    """
+    Returns the SHA-256 of a file
+
+    Parameters
+    ----------
+    path: str
+        Path of the file
+
+    Returns
+    -------
+    digest: str
+        Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while block := file.read(HASH_READ_SIZE):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def scan_tree(path: str, previous: dict = None, hash_files: bool = False) -> dict:
+    """
+    Builds a manifest of every file under a directory
+
+    Only os.scandir and stat calls are made, unless hash_files is set, in
+    which case files whose size or mtime differ from previous are hashed.
+    Files whose size and mtime match previous always keep its hash.
+
+    Parameters
+    ----------
+    path: str
+        Directory to scan
+
+    previous: dict, optional
+        Manifest of an earlier scan to reuse hashes from
+
+    hash_files: bool, optional
+        Whether to record a content hash for every file
+
+    Returns
+    -------
+    manifest: dict
+        [size, mtime_ns, hash] of every file keyed by its path relative to
+        the scanned directory, hash is None for files that weren't hashed
+    """
+    previous = previous or {}
+    manifest = {}
+    stack = [path]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    rel_path = os.path.relpath(entry.path, path)
+                    file_hash = None
+                    old = previous.get(rel_path)
+                    if old and old[:2] == [stat.st_size, stat.st_mtime_ns] and old[2]:
+                        file_hash = old[2]
+                    elif hash_files:
+                        file_hash = hash_file(entry.path)
+                    manifest[rel_path] = [stat.st_size, stat.st_mtime_ns, file_hash]
+    return manifest
+
+
+def latest_mtime(manifest: dict) -> float:
+    """
+    Returns the newest modification time in a manifest
+
+    Parameters
+    ----------
+    manifest: dict
+        Manifest returned by scan_tree
+
+    Returns
+    -------
+    modified: float
+        Newest mtime in seconds, 0 for an empty manifest
+    """
+    return max((entry[1] for entry in manifest.values()), default=0) / 1e9
+
+
+def manifest_changed(old: dict, new: dict) -> bool:
+    """
+    Compares two manifests, by size and hash when both were hashed, and by
+    size and mtime otherwise
+
+    Parameters
+    ----------
+    old: dict
+        Stored manifest, None if there isn't one
+
+    new: dict
+        Freshly scanned manifest
+
+    Returns
+    -------
+    changed: bool
+        Whether the directory contents differ
+    """
+    if old is None or old.keys() != new.keys():
+        return True
+    hashed = all(entry[2] for entry in old.values()) and all(
+        entry[2] for entry in new.values()
+    )
+    column = 2 if hashed else 1
+    return any(
+        old[key][0] != entry[0] or old[key][column] != entry[column]
+        for key, entry in new.items()
+    )
+
+
+def tree_fingerprint(manifest: dict) -> str:
+    """
+    Returns a digest of the paths, sizes and contents of every file in a
+    manifest, mtimes are left out so touching a file doesn't change it
+
+    Parameters
+    ----------
+    manifest: dict
+        Manifest returned by scan_tree with hash_files set
+
+    Returns
+    -------
+    fingerprint: str
+        Hex SHA-256 of the tree
+    """
+    digest = hashlib.sha256()
+    for rel_path in sorted(manifest):
+        size, _, file_hash = manifest[rel_path]
+        digest.update(f"{rel_path}\0{size}\0{file_hash}\n".encode())
+    return digest.hexdigest()
+
+
+def load_manifest(save_path: str) -> dict:
+    """
+    Returns the stored manifest of a save directory
+
+    Parameters
+    ----------
+    save_path: str
+        Path of the save directory
+
+    Returns
+    -------
+    manifest: dict
+        Manifest stored by save_manifest, None if there isn't one
+    """
+    return open_state().manifest(os.path.abspath(save_path))
+
+
+def save_manifest(save_path: str, manifest: dict):
+    """
+    Stores the manifest of a save directory in state.db
+
+    Parameters
+    ----------
+    save_path: str
+        Path of the save directory
+
+    manifest: dict
+        Manifest returned by scan_tree
+    """
+    open_state().put_manifest(os.path.abspath(save_path), manifest)
+
+
+# endregion
@@ -0,0 +1,298 @@
+# region Imports
+import os
+import json
+import time
+import threading
+import functools
+
+from contextlib import contextmanager
+
+# endregion
+
+
+# region Variables
+# Prefix of every exported Prometheus metric
+PROMETHEUS_PREFIX = "savehaven"
+# endregion
+
+
+# region Classes
+
+
+class Metrics:
+    """
+    Timing spans and counters of one run. Spans are summed over every
+    thread, so work done in parallel can add up to more than the wall
+    time of the run.
+
+    Attributes
+    ----------
+    spans: dict
+        [calls, total seconds, longest seconds, errors] by span name
+
+    counters: dict
+        Totals by counter name, e.g. bytes uploaded or API requests
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.spans = {}
+        self.counters = {}
+
+    def record(self, name: str, seconds: float, failed: bool = False):
+        """
+        Adds one call to a span
+        """
+        with self.lock:
+            span = self.spans.setdefault(name, [0, 0.0, 0.0, 0])
+            span[0] += 1
+            span[1] += seconds
+            span[2] = max(span[2], seconds)
+            span[3] += failed
+
+    def count(self, name: str, value: int = 1):
+        """
+        Adds value to a counter
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def to_dict(self) -> dict:
+        """
+        Returns the spans and counters in a JSON serializable dict
+        """
+        with self.lock:
+            return {
+                "started": self.started,
+                "wall_seconds": time.time() - self.started,
+                "spans": {
+                    name: {
+                        "calls": calls,
+                        "seconds": total,
+                        "max_seconds": longest,
+                        "errors": errors,
+                    }
+                    for name, (calls, total, longest, errors) in sorted(
+                        self.spans.items()
+                    )
+                },
+                "counters": dict(sorted(self.counters.items())),
+            }
+
+    def table(self) -> str:
+        """
+        Returns a summary of the spans and counters for the terminal
+        """
+        data = self.to_dict()
+        lines = [
+            f"{'span':<24} {'calls':>7} {'total s':>10} {'mean ms':>10} {'max ms':>10} {'errors':>7}"
+        ]
+        for name, span in sorted(
+            data["spans"].items(), key=lambda item: -item[1]["seconds"]
+        ):
+            lines.append(
+                f"{name:<24} {span['calls']:>7} {span['seconds']:>10.3f} "
+                f"{span['seconds'] / span['calls'] * 1000:>10.1f} "
+                f"{span['max_seconds'] * 1000:>10.1f} {span['errors']:>7}"
+            )
+        for name, value in data["counters"].items():
+            if name.endswith("_bytes"):
+                lines.append(f"{name:<24} {value / 1024 / 1024:>18.2f} MiB")
+            else:
+                lines.append(f"{name:<24} {value:>18}")
+        lines.append(f"{'wall time':<24} {data['wall_seconds']:>18.3f} s")
+        return "\n".join(lines)
+
+    def prometheus(self, command: str = None) -> str:
+        """
+        Returns the spans and counters in the Prometheus text format, for
+        the node exporter textfile collector
+        """
+        data = self.to_dict()
+        labels = f'command="{command}"' if command else ""
+        prefix = PROMETHEUS_PREFIX
+        lines = []
+
+        def metric(name: str, kind: str, help_text: str, samples: list):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for sample_labels, value in samples:
+                joined = ",".join(label for label in (labels, sample_labels) if label)
+                lines.append(f"{prefix}_{name}{{{joined}}} {value}")
+
+        spans = data["spans"].items()
+        metric(
+            "span_seconds",
+            "gauge",
+            "Seconds spent in each phase during the last run",
+            [(f'span="{name}"', span["seconds"]) for name, span in spans],
+        )
+        metric(
+            "span_max_seconds",
+            "gauge",
+            "Longest single call of each phase during the last run",
+            [(f'span="{name}"', span["max_seconds"]) for name, span in spans],
+        )
+        metric(
+            "span_calls",
+            "gauge",
+            "Calls of each phase during the last run",
+            [(f'span="{name}"', span["calls"]) for name, span in spans],
+        )
+        metric(
+            "span_errors",
+            "gauge",
+            "Calls of each phase that raised during the last run",
+            [(f'span="{name}"', span["errors"]) for name, span in spans],
+        )
+        metric(
+            "counter",
+            "gauge",
+            "Bytes and requests counted during the last run",
+            [(f'name="{name}"', value) for name, value in data["counters"].items()],
+        )
+        metric(
+            "wall_seconds",
+            "gauge",
+            "Duration of the last run",
+            [("", data["wall_seconds"])],
+        )
+        metric(
+            "last_run_timestamp_seconds",
+            "gauge",
+            "When the last run started",
+            [("", data["started"])],
+        )
+        return "\n".join(lines) + "\n"
+
+
+# Everything recorded during the run
+metrics = Metrics()
+# endregion
+
+
+# region Metrics functions
+@contextmanager
+def span(name: str):
+    """
+    Times the enclosed block as one call of span name
+    """
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        metrics.record(name, time.perf_counter() - started, failed)
+
+
+def timed(name: str):
+    """
+    Decorator timing every call of a function as span name
+    """
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def timed_chunks(name: str, chunks, counter: str = None):
+    """
+    Times the work of producing a stream of chunks as one call of span
+    name, the time the consumer spends with each chunk isn't counted.
+    Bytes go to counter if given.
+
+    Parameters
+    ----------
+    name: str
+        Span to record into
+
+    chunks: iterable
+        Stream of bytes objects
+
+    counter: str, optional
+        Counter to add the length of every chunk to
+    """
+    chunks = iter(chunks)
+    seconds = 0.0
+    failed = True
+    try:
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                failed = False
+                return
+            finally:
+                seconds += time.perf_counter() - started
+            if counter:
+                metrics.count(counter, len(chunk))
+            yield chunk
+    finally:
+        # Also recorded when the consumer stops early, e.g. on an upload error
+        metrics.record(name, seconds, failed)
+
+
+def count(name: str, value: int = 1):
+    """
+    Adds value to counter name
+    """
+    metrics.count(name, value)
+
+
+def write_report(path: str, text: str):
+    """
+    Writes a report atomically, so collectors never read half a file
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(f"{path}.tmp", "w") as report:
+        report.write(text)
+    os.replace(f"{path}.tmp", path)
+
+
+def report(
+    table: bool = False,
+    json_path: str = None,
+    prometheus_path: str = None,
+    command: str = None,
+):
+    """
+    Prints and exports what was recorded during the run
+
+    Parameters
+    ----------
+    table: bool, optional
+        Print a summary table
+
+    json_path: str, optional
+        File to write the spans and counters to as JSON
+
+    prometheus_path: str, optional
+        File to write them to in the Prometheus text format, should end in
+        .prom to be picked up by the node exporter textfile collector
+
+    command: str, optional
+        Command that ran, added as a label to Prometheus metrics
+    """
+    if table:
+        print(metrics.table())
+    if json_path:
+        write_report(
+            json_path, json.dumps(dict(metrics.to_dict(), command=command), indent=4)
+        )
+    if prometheus_path:
+        write_report(prometheus_path, metrics.prometheus(command))
+
+
+# endregion
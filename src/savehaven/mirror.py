@@ -0,0 +1,130 @@
+# region Imports
+from savehaven.state import open_state
+from savehaven.storage import FOLDER_MIME_TYPE
+
+# endregion
+
+
+# region Mirror functions
+def new_mirror(location: str, root: str, token: str, files: list) -> dict:
+    """
+    Builds a mirror of the SaveHaven folder from a full listing
+
+    Parameters
+    ----------
+    location: str
+        Location of the backend the listing came from
+
+    root: str
+        ID of the SaveHaven folder
+
+    token: str
+        Changes feed token taken before the listing started
+
+    files: list
+        Files returned by list_tree
+
+    Returns
+    -------
+    mirror: dict
+        Mirror to keep up to date with apply_changes
+    """
+    for file in files:
+        file.setdefault("parents", [file["parent"]])
+    return {
+        "location": location,
+        "root": root,
+        "token": token,
+        "files": {file["id"]: file for file in files},
+    }
+
+
+def load_mirror(location: str, root: str) -> dict:
+    """
+    Returns the stored mirror of the SaveHaven folder
+
+    Parameters
+    ----------
+    location: str
+        Location of the current backend
+
+    root: str
+        ID of the SaveHaven folder
+
+    Returns
+    -------
+    mirror: dict
+        Stored mirror, None if there isn't one for this backend and folder
+    """
+    mirror = open_state().mirror()
+    if mirror is None or mirror["location"] != location or mirror["root"] != root:
+        return None
+    return mirror
+
+
+def save_mirror(mirror: dict):
+    """
+    Stores the mirror of the SaveHaven folder in state.db, only the files
+    that changed are written
+
+    Parameters
+    ----------
+    mirror: dict
+        Mirror returned by new_mirror
+    """
+    open_state().put_mirror(mirror)
+
+
+def apply_changes(mirror: dict, changes: list) -> bool:
+    """
+    Applies entries of the changes feed to a mirror, in order. Changes to
+    files outside the SaveHaven folder are dropped, as are files whose
+    folder was removed.
+
+    Parameters
+    ----------
+    mirror: dict
+        Mirror returned by new_mirror, updated in place
+
+    changes: list
+        Changes returned by the backend
+
+    Returns
+    -------
+    applied: bool
+        False if the SaveHaven folder itself was removed
+    """
+    files = mirror["files"]
+    for change in changes:
+        file = change.get("file")
+        removed = change.get("removed") or not file or file.get("trashed")
+        if change["fileId"] == mirror["root"]:
+            if removed:
+                return False
+            continue
+        if removed:
+            files.pop(change["fileId"], None)
+        else:
+            files[file["id"]] = file
+
+    # Keep what's still reachable from the SaveHaven folder
+    children = {}
+    for file in files.values():
+        for parent in file.get("parents", []):
+            children.setdefault(parent, []).append(file)
+    reachable = {}
+    folders = [mirror["root"]]
+    while folders:
+        parent = folders.pop()
+        for file in children.get(parent, []):
+            if file["id"] in reachable:
+                continue
+            file["parent"] = parent
+            reachable[file["id"]] = file
+            if file["mimeType"] == FOLDER_MIME_TYPE:
+                folders.append(file["id"])
+    mirror["files"] = reachable
+    return True
+
+
+# endregion
@@ -0,0 +1,414 @@
+# region Imports
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from appdirs import user_config_dir
+
+# endregion
+
+
+# region Variables
+config_dir = user_config_dir("SaveHaven", "Aurelia")
+state_file = os.path.join(config_dir, "state.db")
+# Saves were kept here before state.db, imported on first use
+list_file = os.path.join(config_dir, "game_list.json")
+SCHEMA_VERSION = 1
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saves (
+    kind TEXT NOT NULL,
+    launcher TEXT NOT NULL,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    uploaded REAL NOT NULL DEFAULT 0,
+    options TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (kind, launcher, name)
+);
+CREATE TABLE IF NOT EXISTS manifests (
+    path TEXT PRIMARY KEY,
+    manifest TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cloud_ids (
+    key TEXT PRIMARY KEY,
+    id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS cloud_ids_id ON cloud_ids (id);
+CREATE TABLE IF NOT EXISTS chunk_indexes (
+    path TEXT PRIMARY KEY,
+    store TEXT NOT NULL,
+    files TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mirror (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    location TEXT NOT NULL,
+    root TEXT NOT NULL,
+    token TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS mirror_files (
+    id TEXT PRIMARY KEY,
+    file TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS uploads (
+    key TEXT PRIMARY KEY,
+    identity TEXT NOT NULL,
+    uri TEXT,
+    offset INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+# Seconds a writer waits for another process holding the database
+BUSY_TIMEOUT = 30
+store = None
+store_lock = threading.Lock()
+# endregion
+
+
+# region Classes
+
+
+class StateStore:
+    """
+    Saves, upload times, manifests, chunk indexes, cloud IDs, the mirror
+    of the SaveHaven folder and resumable uploads, kept in a SQLite
+    database in WAL mode so several processes, such as a running watch and
+    a manual backup, can read and update it at the same time. Every update
+    is its own transaction and only touches the rows it changes.
+
+    Saves are keyed by ("games", name) or ("minecraft", launcher, world)
+    and their entries look like the ones game_list.json used to hold:
+    {"path": ..., "uploaded": ...} plus any per-game options such as
+    "codec".
+
+    Attributes
+    ----------
+    path: str
+        Database file
+    """
+
+    def __init__(self, path: str = state_file):
+        self.path = path
+        # sqlite3 connections can't be shared between threads
+        self.local = threading.local()
+        db = self.connect()
+        if db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            with db:
+                db.executescript(SCHEMA)
+                self.migrate(db)
+                db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Returns the connection of the calling thread
+        """
+        db = getattr(self.local, "db", None)
+        if db is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+            db.execute("PRAGMA journal_mode = WAL")
+            db.execute("PRAGMA synchronous = NORMAL")
+            self.local.db = db
+        return db
+
+    def migrate(self, db: sqlite3.Connection):
+        """
+        Imports the saves from game_list.json, which is renamed afterwards
+        so it isn't imported twice
+        """
+        save_json = load_json(list_file)
+        saves = {
+            ("games", name): entry for name, entry in save_json.get("games", {}).items()
+        }
+        for launcher, worlds in save_json.get("minecraft", {}).items():
+            for world, entry in worlds.items():
+                saves[("minecraft", launcher, world)] = entry
+        db.executemany(
+            "INSERT OR REPLACE INTO saves VALUES (?, ?, ?, ?, ?, ?)",
+            [save_row(key, entry) for key, entry in saves.items()],
+        )
+        if os.path.exists(list_file):
+            os.replace(list_file, f"{list_file}.migrated")
+
+    # region Saves
+
+    def saves(self) -> dict:
+        """
+        Returns every save keyed like watched_saves
+        """
+        rows = self.connect().execute(
+            "SELECT kind, launcher, name, path, uploaded, options FROM saves"
+        )
+        return {save_key(row): save_entry(row) for row in rows}
+
+    def put_save(self, key: tuple, entry: dict):
+        """
+        Adds or updates one save
+        """
+        with self.connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO saves VALUES (?, ?, ?, ?, ?, ?)",
+                save_row(key, entry),
+            )
+
+    def set_uploaded(self, key: tuple, uploaded: float):
+        """
+        Records when a save was last uploaded or restored, leaving the rest
+        of its entry alone
+        """
+        with self.connect() as db:
+            db.execute(
+                "UPDATE saves SET uploaded = ? "
+                "WHERE kind = ? AND launcher = ? AND name = ?",
+                (uploaded, *save_row(key, {"path": ""})[:3]),
+            )
+
+    # endregion
+
+    # region Manifests
+
+    def manifest(self, path: str) -> dict:
+        """
+        Returns the manifest stored for a save directory, None if there
+        isn't one
+        """
+        row = (
+            self.connect()
+            .execute("SELECT manifest FROM manifests WHERE path = ?", (path,))
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def put_manifest(self, path: str, manifest: dict):
+        """
+        Stores the manifest of a save directory
+        """
+        with self.connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO manifests VALUES (?, ?, ?)",
+                (path, json.dumps(manifest), time.time()),
+            )
+
+    # endregion
+
+    # region Cloud IDs
+
+    def cloud_id(self, key: str) -> str:
+        """
+        Returns the ID cached under key, None if there isn't one
+        """
+        row = (
+            self.connect()
+            .execute("SELECT id FROM cloud_ids WHERE key = ?", (key,))
+            .fetchone()
+        )
+        return row[0] if row else None
+
+    def put_cloud_id(self, key: str, file_id: str):
+        """
+        Caches an ID under key
+        """
+        with self.connect() as db:
+            db.execute("INSERT OR REPLACE INTO cloud_ids VALUES (?, ?)", (key, file_id))
+
+    def forget_cloud_id(self, file_id: str) -> int:
+        """
+        Drops an ID and every key below it, keys look like
+        "<parent id>/<name>"
+
+        Returns
+        -------
+        count: int
+            Number of keys dropped
+        """
+        prefix = file_id.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self.connect() as db:
+            return db.execute(
+                "DELETE FROM cloud_ids WHERE id = ? OR key LIKE ? ESCAPE '\\'",
+                (file_id, f"{prefix}/%"),
+            ).rowcount
+
+    # endregion
+
+    # region Chunk indexes
+
+    def chunk_index(self, path: str) -> tuple:
+        """
+        Returns the chunk store key and chunk lists recorded for a save
+        directory, None if there aren't any
+        """
+        row = (
+            self.connect()
+            .execute("SELECT store, files FROM chunk_indexes WHERE path = ?", (path,))
+            .fetchone()
+        )
+        return (row[0], json.loads(row[1])) if row else None
+
+    def put_chunk_index(self, path: str, store: str, files: dict):
+        """
+        Stores the chunk lists of a save directory
+        """
+        with self.connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO chunk_indexes VALUES (?, ?, ?, ?)",
+                (path, store, json.dumps(files), time.time()),
+            )
+
+    # endregion
+
+    # region Mirror
+
+    def mirror(self) -> dict:
+        """
+        Returns the stored mirror of the SaveHaven folder, laid out like
+        mirror.new_mirror builds it, None if there isn't one
+        """
+        db = self.connect()
+        row = db.execute("SELECT location, root, token FROM mirror").fetchone()
+        if row is None:
+            return None
+        files = [
+            json.loads(file) for file, in db.execute("SELECT file FROM mirror_files")
+        ]
+        return {
+            "location": row[0],
+            "root": row[1],
+            "token": row[2],
+            "files": {file["id"]: file for file in files},
+        }
+
+    def put_mirror(self, mirror: dict):
+        """
+        Stores the mirror of the SaveHaven folder, only writing the files
+        that changed since it was last stored
+        """
+        with self.connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO mirror VALUES (0, ?, ?, ?)",
+                (mirror["location"], mirror["root"], mirror["token"]),
+            )
+            stored = dict(db.execute("SELECT id, file FROM mirror_files"))
+            files = {
+                file_id: json.dumps(file, sort_keys=True)
+                for file_id, file in mirror["files"].items()
+            }
+            db.executemany(
+                "DELETE FROM mirror_files WHERE id = ?",
+                [(file_id,) for file_id in stored.keys() - files.keys()],
+            )
+            db.executemany(
+                "INSERT OR REPLACE INTO mirror_files VALUES (?, ?)",
+                [
+                    (file_id, file)
+                    for file_id, file in files.items()
+                    if stored.get(file_id) != file
+                ],
+            )
+
+    # endregion
+
+    # region Uploads
+
+    def upload(self, key: str) -> dict:
+        """
+        Returns the resumable upload recorded for key, None if there isn't
+        one
+        """
+        row = (
+            self.connect()
+            .execute(
+                "SELECT identity, uri, offset, updated FROM uploads WHERE key = ?",
+                (key,),
+            )
+            .fetchone()
+        )
+        return dict(zip(("identity", "uri", "offset", "updated"), row)) if row else None
+
+    def put_upload(self, key: str, identity: str, uri: str, offset: int):
+        """
+        Records the progress of a resumable upload
+        """
+        with self.connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?)",
+                (key, identity, uri, offset, time.time()),
+            )
+
+    def forget_upload(self, key: str):
+        """
+        Drops the resumable upload recorded for key
+        """
+        with self.connect() as db:
+            db.execute("DELETE FROM uploads WHERE key = ?", (key,))
+
+    # endregion
+
+
+# endregion
+
+
+# region State functions
+def open_state() -> StateStore:
+    """
+    Returns the state store shared by the process, opening and migrating
+    it on first use
+    """
+    global store
+    with store_lock:
+        if store is None:
+            store = StateStore()
+    return store
+
+
+def load_json(path: str) -> dict:
+    """
+    Returns the contents of a legacy JSON file, empty if it's missing or
+    broken
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as legacy_json:
+        try:
+            return json.load(legacy_json)
+        except json.decoder.JSONDecodeError:
+            return {}
+
+
+def save_key(row: tuple) -> tuple:
+    """
+    Returns the key of a save from its row
+    """
+    kind, launcher, name = row[:3]
+    return (kind, launcher, name) if launcher else (kind, name)
+
+
+def save_entry(row: tuple) -> dict:
+    """
+    Returns the entry of a save from its row
+    """
+    return {"path": row[3], "uploaded": row[4], **json.loads(row[5])}
+
+
+def save_row(key: tuple, entry: dict) -> tuple:
+    """
+    Returns the row of a save from its key and entry
+    """
+    kind, *launcher, name = key
+    options = {
+        option: value
+        for option, value in entry.items()
+        if option not in ("path", "uploaded")
+    }
+    return (
+        kind,
+        launcher[0] if launcher else "",
+        name,
+        entry["path"],
+        entry.get("uploaded", 0),
+        json.dumps(options, sort_keys=True),
+    )
+
+
+# endregion
@@ -0,0 +1,465 @@
+# region Imports
+import os
+import json
+import shutil
+import hashlib
+import threading
+
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+# endregion
+
+
+# region Variables
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+COPY_SIZE = 1024 * 1024
+# Unpinned revisions kept per file, like Drive does
+MAX_REVISIONS = 100
+# Bytes written between upload journal entries
+COMMIT_SIZE = 16 * 1024 * 1024
+# endregion
+
+
+# region Classes
+
+
+class StorageError(Exception):
+    """
+    Error raised by a storage backend
+
+    Attributes
+    ----------
+    status: int
+        HTTP style status of the failure, 404 when a file or folder is missing
+    """
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+
+class Backend:
+    """
+    Where backups are stored. Files and folders are addressed by IDs the
+    backend hands out, and file listings use the same fields as Drive:
+    id, name, mimeType and modifiedTime.
+
+    Attributes
+    ----------
+    remote: bool
+        Whether lookups are slow enough to be worth caching locally
+
+    location: str
+        Identifies the storage, local state about it is thrown away when
+        it changes
+    """
+
+    remote = False
+    location = None
+
+    def search(self, name: str, parent: str = None, folder: bool = False) -> list:
+        """
+        Returns the files called name, in parent if given
+        """
+        raise NotImplementedError
+
+    def make_folder(self, name: str, parent: str = None) -> str:
+        """
+        Creates a folder and returns its ID
+        """
+        raise NotImplementedError
+
+    def list_folder(self, folder_id: str) -> list:
+        """
+        Returns the files in a folder
+        """
+        raise NotImplementedError
+
+    def list_tree(self, folder_id: str) -> list:
+        """
+        Returns every file and folder below a folder, each with the ID of
+        the folder it's in under "parent"
+        """
+        files = []
+        folders = [folder_id]
+        while folders:
+            parent = folders.pop()
+            for file in self.list_folder(parent):
+                file["parent"] = parent
+                files.append(file)
+                if file["mimeType"] == FOLDER_MIME_TYPE:
+                    folders.append(file["id"])
+        return files
+
+    def upload(
+        self,
+        chunks,
+        name: str,
+        parent: str = None,
+        file_id: str = None,
+        mime_type: str = "application/octet-stream",
+        resumable: bool = True,
+        properties: dict = None,
+        session=None,
+    ) -> str:
+        """
+        Uploads the bytes yielded by chunks as a new file in parent, or as a
+        new revision of file_id, and returns the ID of the file. Small
+        uploads pass resumable=False to be sent in a single request.
+        properties are stored with the file as its appProperties. A
+        resumable upload given an UploadSession continues from the last
+        offset it committed and commits its progress as it goes.
+        """
+        raise NotImplementedError
+
+    def download(self, file_id: str, fd, chunk_size: int = None):
+        """
+        Writes the contents of a file to the binary file object fd, reading
+        chunk_size bytes at a time
+        """
+        raise NotImplementedError
+
+    def delete(self, file_id: str):
+        """
+        Permanently deletes a file or folder
+        """
+        raise NotImplementedError
+
+    def modified_time(self, file_id: str) -> str:
+        """
+        Returns when a file was last modified, in RFC 3339
+        """
+        raise NotImplementedError
+
+    def get_revisions(self, file_id: str) -> list:
+        """
+        Returns the revisions of a file, oldest first, with their id,
+        modifiedTime and keepForever
+        """
+        raise NotImplementedError
+
+    def keep_revision(self, file_id: str, revision_id: str):
+        """
+        Marks a revision to be kept forever
+        """
+        raise NotImplementedError
+
+    def start_page_token(self) -> str:
+        """
+        Returns a token pointing at the end of the changes feed
+        """
+        raise NotImplementedError
+
+    def changes(self, token: str) -> tuple:
+        """
+        Returns the changes made since token was handed out and the token
+        to continue from. Changes use the same fields as Drive: fileId,
+        removed, and the file with its parents and trashed flag.
+        """
+        raise NotImplementedError
+
+    def each(self, function, items: list) -> list:
+        """
+        Calls function on every item, returning a (result, error) pair per
+        item so one failure doesn't stop the rest
+        """
+        results = []
+        for item in items:
+            try:
+                results.append((function(*item), None))
+            except StorageError as error:
+                results.append((None, error))
+        return results
+
+    def batch_get_revisions(self, file_ids: list) -> list:
+        """
+        Returns a (revisions, error) pair for every file
+        """
+        return self.each(self.get_revisions, [(file_id,) for file_id in file_ids])
+
+    def batch_keep_revisions(self, revisions: list) -> list:
+        """
+        Keeps every (file_id, revision_id) pair forever, returning a
+        (None, error) pair for each
+        """
+        return self.each(self.keep_revision, revisions)
+
+    def batch_delete(self, file_ids: list) -> list:
+        """
+        Deletes every file, returning a (None, error) pair for each
+        """
+        return self.each(self.delete, [(file_id,) for file_id in file_ids])
+
+
+class LocalBackend(Backend):
+    """
+    Stores backups in a local directory or mounted NAS share. IDs are paths
+    relative to the root, older revisions of a file are kept under
+    .revisions in the root. A file created with the name of an existing
+    one replaces it, the old versions are kept as its earlier revisions.
+    Every change is appended to .changes.jsonl, page tokens are byte
+    offsets into it.
+
+    Attributes
+    ----------
+    root: str
+        Directory backups are stored in
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.revisions_dir = os.path.join(self.root, ".revisions")
+        self.changes_path = os.path.join(self.root, ".changes.jsonl")
+        self.location = self.root
+        self.lock = threading.Lock()
+        os.makedirs(self.revisions_dir, exist_ok=True)
+
+    def _path(self, file_id: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, file_id or ""))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise StorageError(f"{file_id} is outside of {self.root}", 400)
+        return path
+
+    def _child(self, parent: str, name: str) -> str:
+        return f"{parent}/{name}" if parent else name
+
+    def _existing(self, file_id: str) -> str:
+        path = self._path(file_id)
+        if not file_id or not os.path.exists(path):
+            raise StorageError(f"File not found: {file_id}", 404)
+        return path
+
+    def _timestamp(self, seconds: float) -> str:
+        return (
+            datetime.fromtimestamp(seconds, tz=timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%S.%f"
+            )[:-3]
+            + "Z"
+        )
+
+    def _describe(self, file_id: str) -> dict:
+        path = self._path(file_id)
+        if os.path.isdir(path):
+            return {
+                "id": file_id,
+                "name": os.path.basename(path),
+                "mimeType": FOLDER_MIME_TYPE,
+                "modifiedTime": self._timestamp(os.path.getmtime(path)),
+            }
+        revisions = self._load_revisions(file_id)
+        return {
+            "id": file_id,
+            "name": os.path.basename(path),
+            "mimeType": "application/octet-stream",
+            "modifiedTime": self._timestamp(os.path.getmtime(path)),
+            "size": str(os.path.getsize(path)),
+            "md5Checksum": revisions[-1].get("md5Checksum") if revisions else None,
+            "appProperties": (
+                revisions[-1].get("appProperties", {}) if revisions else {}
+            ),
+        }
+
+    def _revision_dir(self, file_id: str) -> str:
+        return os.path.join(self.revisions_dir, quote(file_id, safe=""))
+
+    def _load_revisions(self, file_id: str) -> list:
+        index = os.path.join(self._revision_dir(file_id), "revisions.json")
+        if not os.path.exists(index):
+            return []
+        with open(index, "r") as index_json:
+            return json.load(index_json)
+
+    def _save_revisions(self, file_id: str, revisions: list):
+        os.makedirs(self._revision_dir(file_id), exist_ok=True)
+        index = os.path.join(self._revision_dir(file_id), "revisions.json")
+        with open(f"{index}.tmp", "w") as index_json:
+            json.dump(revisions, index_json, indent=4)
+        os.replace(f"{index}.tmp", index)
+
+    def _record_change(self, file_id: str, removed: bool = False):
+        change = {"fileId": file_id, "removed": removed}
+        if not removed:
+            parent = file_id.rpartition("/")[0]
+            change["file"] = dict(
+                self._describe(file_id),
+                parents=[parent] if parent else [],
+                trashed=False,
+            )
+        # One write per record so other machines sharing the folder never
+        # see half a line
+        with open(self.changes_path, "a") as changes:
+            changes.write(json.dumps(change) + "\n")
+
+    def search(self, name: str, parent: str = None, folder: bool = False) -> list:
+        file_id = self._child(parent, name)
+        path = self._path(file_id)
+        if not os.path.exists(path) or os.path.isdir(path) != folder:
+            return []
+        return [self._describe(file_id)]
+
+    def make_folder(self, name: str, parent: str = None) -> str:
+        if parent:
+            self._existing(parent)
+        file_id = self._child(parent, name)
+        os.makedirs(self._path(file_id), exist_ok=True)
+        with self.lock:
+            self._record_change(file_id)
+        return file_id
+
+    def list_folder(self, folder_id: str) -> list:
+        path = self._existing(folder_id)
+        return [
+            self._describe(self._child(folder_id, name))
+            for name in sorted(os.listdir(path))
+            if not name.startswith(".")
+        ]
+
+    def upload(
+        self,
+        chunks,
+        name: str,
+        parent: str = None,
+        file_id: str = None,
+        mime_type: str = "application/octet-stream",
+        resumable: bool = True,
+        properties: dict = None,
+        session=None,
+    ) -> str:
+        replaces = False
+        if file_id:
+            path = self._existing(file_id)
+        else:
+            if parent:
+                self._existing(parent)
+            file_id = self._child(parent, name)
+            path = self._path(file_id)
+            if os.path.isdir(path):
+                self.delete(file_id)
+            # A new file takes the place of one with the same name, but
+            # only once it's fully written. IDs are paths, so the old
+            # versions stay on as its earlier revisions
+            replaces = os.path.exists(path)
+        # Write next to the target and rename, so a failed upload never
+        # replaces the current version
+        partial = os.path.join(
+            os.path.dirname(path), f".{os.path.basename(path)}.partial"
+        )
+        digest = hashlib.md5()
+        offset = 0
+        if session and session.uri == partial and os.path.exists(partial):
+            # Keep what the last attempt committed and skip it in chunks
+            offset = min(session.offset, os.path.getsize(partial))
+        with open(partial, "r+b" if offset else "wb") as file:
+            file.truncate(offset)
+            # The MD5 covers the whole file, including what was kept
+            while file.tell() < offset:
+                digest.update(file.read(min(COPY_SIZE, offset - file.tell())))
+            committed = offset
+            position = 0
+            for chunk in chunks:
+                start = position
+                position += len(chunk)
+                if position <= offset:
+                    continue
+                chunk = chunk[max(0, offset - start) :]
+                file.write(chunk)
+                digest.update(chunk)
+                if session and position - committed >= COMMIT_SIZE:
+                    file.flush()
+                    committed = position
+                    session.commit(partial, committed)
+        with self.lock:
+            revisions = self._load_revisions(file_id)
+            if revisions and os.path.exists(path):
+                os.replace(
+                    path, os.path.join(self._revision_dir(file_id), revisions[-1]["id"])
+                )
+            os.replace(partial, path)
+            # Like Drive, properties stay set until they're overwritten, a
+            # new file starts without any
+            kept = {}
+            if revisions and not replaces:
+                kept = revisions[-1].get("appProperties", {})
+            properties = dict(kept, **(properties or {}))
+            revision_id = str(int(revisions[-1]["id"]) + 1 if revisions else 1)
+            revisions.append(
+                {
+                    "id": revision_id,
+                    "modifiedTime": self._timestamp(os.path.getmtime(path)),
+                    "keepForever": False,
+                    # Drive reports the MD5 of every file, keep it for listings
+                    "md5Checksum": digest.hexdigest(),
+                    "appProperties": properties,
+                }
+            )
+            # Drop the oldest unpinned revisions, the current one always stays
+            unpinned = [x for x in revisions[:-1] if not x["keepForever"]]
+            for revision in unpinned[: max(0, len(unpinned) - MAX_REVISIONS + 1)]:
+                revisions.remove(revision)
+                os.remove(os.path.join(self._revision_dir(file_id), revision["id"]))
+            self._save_revisions(file_id, revisions)
+            self._record_change(file_id)
+        if session:
+            session.finish()
+        return file_id
+
+    def download(self, file_id: str, fd, chunk_size: int = None):
+        with open(self._existing(file_id), "rb") as file:
+            shutil.copyfileobj(file, fd, chunk_size or COPY_SIZE)
+
+    def delete(self, file_id: str):
+        path = self._existing(file_id)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+            prefix = quote(f"{file_id}/", safe="")
+            for name in os.listdir(self.revisions_dir):
+                if name.startswith(prefix):
+                    shutil.rmtree(os.path.join(self.revisions_dir, name))
+        else:
+            os.remove(path)
+        shutil.rmtree(self._revision_dir(file_id), ignore_errors=True)
+        with self.lock:
+            self._record_change(file_id, removed=True)
+
+    def modified_time(self, file_id: str) -> str:
+        return self._timestamp(os.path.getmtime(self._existing(file_id)))
+
+    def get_revisions(self, file_id: str) -> list:
+        self._existing(file_id)
+        return self._load_revisions(file_id)
+
+    def start_page_token(self) -> str:
+        if not os.path.exists(self.changes_path):
+            return "0"
+        return str(os.path.getsize(self.changes_path))
+
+    def changes(self, token: str) -> tuple:
+        if not os.path.exists(self.changes_path):
+            if token != "0":
+                raise StorageError(f"Invalid page token: {token}", 404)
+            return [], token
+        with open(self.changes_path, "rb") as changes:
+            if not token.isdigit() or int(token) > os.fstat(changes.fileno()).st_size:
+                raise StorageError(f"Invalid page token: {token}", 404)
+            changes.seek(int(token))
+            records = []
+            # A line still being written by another machine is left for later
+            while (line := changes.readline()).endswith(b"\n"):
+                records.append(json.loads(line))
+                token = str(changes.tell())
+        return records, token
+
+    def keep_revision(self, file_id: str, revision_id: str):
+        with self.lock:
+            revisions = self.get_revisions(file_id)
+            for revision in revisions:
+                if revision["id"] == revision_id:
+                    revision["keepForever"] = True
+                    break
+            else:
+                raise StorageError(f"Revision not found: {revision_id}", 404)
+            self._save_revisions(file_id, revisions)
+
+
+# endregion
@@ -0,0 +1,170 @@
+# region Imports
+import os
+import errno
+import ctypes
+import ctypes.util
+import select
+import struct
+
+# endregion
+
+
+# region Variables
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+# Files finished writing, and files or directories appearing or going away
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+# wd, mask, cookie and name length of every event
+EVENT_HEADER = struct.Struct("iIII")
+READ_SIZE = 64 * 1024
+# endregion
+
+
+# region Classes
+
+
+class Inotify:
+    """
+    Recursive inotify watches over directory trees, each tree tagged with
+    a key. Waiting for events blocks in select, so nothing runs while the
+    watched saves are idle.
+
+    Attributes
+    ----------
+    fd: int
+        inotify file descriptor
+
+    watches: dict
+        Key and directory of every watch descriptor
+
+    failed: dict
+        First error of every tree that couldn't be watched completely, by
+        key. Changes to those trees may go unnoticed
+    """
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches = {}
+        self.failed = {}
+
+    def _add(self, path: str, key):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            # Gone before it could be watched
+            if error in (errno.ENOENT, errno.ENOTDIR):
+                return
+            # Out of watches (ENOSPC), no permission and the like
+            self.failed.setdefault(key, OSError(error, os.strerror(error), path))
+            return
+        self.watches[wd] = (key, path)
+
+    def watch_tree(self, path: str, key) -> bool:
+        """
+        Watches a directory and every directory below it, directories
+        created later are watched as they appear
+
+        Parameters
+        ----------
+        path: str
+            Root of the tree
+
+        key: hashable
+            Returned by read for changes anywhere in the tree
+
+        Returns
+        -------
+        watched: bool
+            Whether every directory is watched, the error is kept in failed
+            otherwise
+        """
+        for dirpath, _, _ in os.walk(path):
+            self._add(dirpath, key)
+        return key not in self.failed
+
+    def unwatch(self, key):
+        """
+        Removes every watch of a tree
+        """
+        for wd in [wd for wd, watch in self.watches.items() if watch[0] == key]:
+            self.libc.inotify_rm_watch(self.fd, wd)
+            del self.watches[wd]
+        self.failed.pop(key, None)
+
+    def read(self, timeout: float = None) -> set:
+        """
+        Waits for changes to the watched trees
+
+        Parameters
+        ----------
+        timeout: float, optional
+            Seconds to wait, forever if not given
+
+        Returns
+        -------
+        keys: set
+            Keys of the trees that changed, empty if the timeout passed
+        """
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[
+                offset + EVENT_HEADER.size : offset + EVENT_HEADER.size + length
+            ]
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                # Events were dropped, anything could have changed
+                changed.update(watch[0] for watch in self.watches.values())
+                continue
+            if wd not in self.watches:
+                continue
+            key, path = self.watches[wd]
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            if mask & IN_MOVE_SELF:
+                # The watch would follow the directory wherever it went
+                self.libc.inotify_rm_watch(self.fd, wd)
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self.watch_tree(
+                    os.path.join(path, os.fsdecode(name.rstrip(b"\0"))), key
+                )
+            changed.add(key)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+# endregion
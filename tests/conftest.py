@@ -0,0 +1,108 @@
+import os
+import sys
+import tempfile
+
+# savehaven works out its config dir on import, keep it off the real one
+os.environ["HOME"] = tempfile.mkdtemp(prefix="savehaven-tests-")
+os.environ.pop("XDG_CONFIG_HOME", None)
+
+import pytest
+
+from savehaven import helpers, state
+from savehaven.state import StateStore
+from savehaven.storage import LocalBackend
+
+# The fake Drive the benchmarks run against
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "benchmarks"))
+
+
+def write_file(path: str, data: bytes, mtime: float = None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def read_tree(path: str) -> dict:
+    """
+    Returns the contents of every file under path, keyed by relative path
+    """
+    tree = {}
+    for directory, _, names in os.walk(path):
+        for name in names:
+            full_path = os.path.join(directory, name)
+            with open(full_path, "rb") as file:
+                tree[os.path.relpath(full_path, path)] = file.read()
+    return tree
+
+
+@pytest.fixture(autouse=True)
+def config_dir(tmp_path, monkeypatch):
+    """
+    Gives every test its own config dir and state.db
+    """
+    config_dir = tmp_path / "config"
+    (config_dir / "tmp").mkdir(parents=True)
+    monkeypatch.setattr(helpers, "config_dir", str(config_dir))
+    monkeypatch.setattr(helpers, "tmp_dir", str(config_dir / "tmp"))
+    monkeypatch.setattr(helpers, "backups_dir", str(config_dir / "Backups"))
+    monkeypatch.setattr(helpers, "pcgw_cache_file", str(config_dir / "pcgw.db"))
+    monkeypatch.setattr(state, "list_file", str(config_dir / "game_list.json"))
+    monkeypatch.setattr(state, "store", StateStore(str(config_dir / "state.db")))
+    monkeypatch.setattr(helpers, "inventory", None)
+    monkeypatch.setattr(helpers, "warned_codecs", set())
+    monkeypatch.setattr(helpers, "overwrite", False)
+    set_config(str(config_dir), "")
+    return str(config_dir)
+
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    """
+    LocalBackend storing backups under tmp_path, in use for the test
+    """
+    backend = LocalBackend(str(tmp_path / "cloud"))
+    monkeypatch.setattr(helpers, "backend", backend)
+    monkeypatch.setattr(helpers, "stored_chunks", None)
+    return backend
+
+
+@pytest.fixture(params=["local", "drive"])
+def any_backend(request, monkeypatch):
+    """
+    Runs the test on a LocalBackend and on a DriveBackend talking to the
+    fake Drive, which hands out new IDs like Drive does
+    """
+    if request.param == "local":
+        return request.getfixturevalue("backend")
+    pytest.importorskip("googleapiclient")
+    from fake_drive import FakeDrive, serve, drive_backend
+
+    server = serve(FakeDrive())
+    request.addfinalizer(server.shutdown)
+    backend = drive_backend(f"http://127.0.0.1:{server.server_address[1]}", 256 * 1024)
+    monkeypatch.setattr(helpers, "backend", backend)
+    monkeypatch.setattr(helpers, "stored_chunks", None)
+    return backend
+
+
+@pytest.fixture
+def save_dir(tmp_path):
+    """
+    Save directory with a few files last modified a day ago
+    """
+    path = str(tmp_path / "save")
+    mtime = os.path.getmtime(tmp_path) - 24 * 60 * 60
+    write_file(os.path.join(path, "slot1.sav"), b"level 1 " * 1000, mtime)
+    write_file(os.path.join(path, "data", "player.dat"), os.urandom(4096), mtime)
+    os.makedirs(os.path.join(path, "screenshots"))
+    return path
+
+
+def set_config(config_dir: str, backup: str):
+    """
+    Writes config.ini with backup as its Backup section
+    """
+    with open(os.path.join(config_dir, "config.ini"), "w") as config_ini:
+        config_ini.write(f"[Launchers]\nselected =\n\n[Backup]\n{backup}")
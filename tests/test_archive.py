@@ -0,0 +1,52 @@
+import io
+import lzma
+import os
+import shutil
+import tarfile
+
+import pytest
+
+from conftest import read_tree
+from savehaven.archive import CODECS, extract_archive, iter_archive
+
+CODEC_NAMES = sorted(CODECS)
+
+
+def archive(path: str, codec: str) -> bytes:
+    if codec == "tar.zst":
+        pytest.importorskip("zstandard")
+    return b"".join(iter_archive(path, codec))
+
+
+@pytest.mark.parametrize("codec", CODEC_NAMES)
+def test_archive_is_deterministic(save_dir, tmp_path, codec):
+    first = archive(save_dir, codec)
+    assert archive(save_dir, codec) == first
+    # Neither timestamps nor where the save is change the bytes
+    copy = str(tmp_path / "elsewhere" / "copy")
+    shutil.copytree(save_dir, copy)
+    for directory, _, names in os.walk(copy):
+        for name in names:
+            os.utime(os.path.join(directory, name), (0, 1234567890))
+    assert archive(copy, codec) == first
+
+
+@pytest.mark.parametrize("codec", CODEC_NAMES)
+def test_archive_round_trip(save_dir, tmp_path, codec):
+    target = str(tmp_path / "restored")
+    extract_archive(io.BytesIO(archive(save_dir, codec)), target)
+    assert read_tree(target) == read_tree(save_dir)
+    assert os.path.isdir(os.path.join(target, "screenshots"))
+
+
+def test_tar_paths_outside_target_are_refused(tmp_path):
+    data = io.BytesIO()
+    with lzma.open(data, "wb") as stream, tarfile.open(
+        fileobj=stream, mode="w|"
+    ) as tar:
+        member = tarfile.TarInfo("../evil")
+        member.size = 4
+        tar.addfile(member, io.BytesIO(b"evil"))
+    with pytest.raises(ValueError):
+        extract_archive(io.BytesIO(data.getvalue()), str(tmp_path / "restored"))
+    assert not os.path.exists(str(tmp_path / "evil"))
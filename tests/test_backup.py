@@ -0,0 +1,75 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import read_tree, set_config, write_file
+from savehaven import helpers
+
+
+def backup(save_dir: str, policy: str = "local-wins"):
+    root = helpers.load_inventory().root
+    game = helpers.SaveDir("Game", save_dir, os.path.getmtime(save_dir))
+    job = helpers.plan_upload("Heroic", game, 0, root, policy)
+    return job, helpers.backup_games([job], 1)[0]
+
+
+def cloud_files(folder: str = "Heroic") -> dict:
+    helpers.load_inventory()
+    return helpers.open_folder(folder, helpers.inventory.root)[1]
+
+
+@pytest.mark.parametrize(
+    "backup_config",
+    [
+        "codec = zip\n",
+        "codec = zip-store\n",
+        "codec = tar.xz\nlevel = 0\n",
+        "format = chunked\n",
+    ],
+)
+def test_round_trip(save_dir, any_backend, config_dir, backup_config):
+    set_config(config_dir, backup_config)
+    # Spans several chunks
+    write_file(os.path.join(save_dir, "world.bin"), os.urandom(3 * 1024 * 1024))
+    expected = read_tree(save_dir)
+    job, status = backup(save_dir)
+    assert status[0] is True
+    shutil.rmtree(save_dir)
+    game = helpers.SaveDir("Game", save_dir, 0)
+    assert helpers.fetch_cloud_file(game, job.uploaded_id)
+    assert read_tree(save_dir) == expected
+    assert os.path.isdir(os.path.join(save_dir, "screenshots"))
+
+
+def test_chunked_backup_uploads_changed_chunks_only(save_dir, backend, config_dir):
+    set_config(config_dir, "format = chunked\n")
+    write_file(os.path.join(save_dir, "world.bin"), os.urandom(3 * 1024 * 1024))
+    backup(save_dir)
+    chunks = set(cloud_files("Chunks"))
+    write_file(os.path.join(save_dir, "slot1.sav"), b"level 2 " * 1000)
+    backup(save_dir)
+    assert len(set(cloud_files("Chunks")) - chunks) == 1
+
+
+def test_replaced_backup_is_deleted_after_upload(save_dir, backend):
+    backup(save_dir)
+    old_id = cloud_files()["Game.zip"]["id"]
+    write_file(os.path.join(save_dir, "slot1.sav"), b"level 2 " * 1000)
+    job, status = backup(save_dir)
+    assert status[0] is True
+    assert job.delete_id == old_id
+    files = cloud_files()
+    assert list(files) == ["Game.zip"]
+    assert files["Game.zip"]["id"] == job.uploaded_id
+
+
+def test_failed_upload_keeps_old_backup(save_dir, any_backend, monkeypatch):
+    backup(save_dir)
+    old_id = cloud_files()["Game.zip"]["id"]
+    write_file(os.path.join(save_dir, "slot1.sav"), b"level 2 " * 1000)
+    monkeypatch.setattr(helpers, "upload_file", lambda *args, **kwargs: None)
+    job, status = backup(save_dir)
+    assert status[0] is False
+    assert job.delete_id == old_id
+    assert cloud_files()["Game.zip"]["id"] == old_id
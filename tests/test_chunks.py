@@ -0,0 +1,89 @@
+import os
+import random
+import sys
+
+import pytest
+
+from conftest import read_tree, write_file
+from savehaven import chunks
+from savehaven.manifest import scan_tree
+
+
+def chunk_ids(path: str) -> list:
+    return [chunks.chunk_id(chunk) for chunk in chunks.iter_chunks(path)]
+
+
+def build(path: str) -> tuple:
+    store = {}
+    snapshot, _ = chunks.build_snapshot(
+        path, scan_tree(path), store.__setitem__, "store", store.__contains__
+    )
+    return snapshot, store
+
+
+@pytest.fixture
+def data() -> bytes:
+    return random.Random(0).randbytes(12 * 1024 * 1024)
+
+
+def test_chunk_sizes(tmp_path, data):
+    write_file(str(tmp_path / "file"), data)
+    sizes = [len(chunk) for chunk in chunks.iter_chunks(str(tmp_path / "file"))]
+    assert sum(sizes) == len(data)
+    assert len(sizes) > 2
+    assert all(
+        chunks.MIN_CHUNK_SIZE <= size <= chunks.MAX_CHUNK_SIZE for size in sizes[:-1]
+    )
+
+
+def test_cuts_follow_content(tmp_path, data):
+    write_file(str(tmp_path / "old"), data)
+    write_file(str(tmp_path / "new"), b"inserted" + data)
+    old = chunk_ids(str(tmp_path / "old"))
+    new = chunk_ids(str(tmp_path / "new"))
+    # Only the chunk with the insertion changes
+    assert old[1:] == new[1:]
+    assert old[0] != new[0]
+
+
+def test_vectorized_cut_matches_plain(monkeypatch, data):
+    pytest.importorskip("numpy")
+    block = data[: chunks.MAX_CHUNK_SIZE]
+    vectorized = chunks.find_cut(block)
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    assert chunks.find_cut(block) == vectorized
+
+
+def test_snapshot_round_trip(tmp_path, data):
+    source = str(tmp_path / "save")
+    write_file(os.path.join(source, "world.bin"), data[: 3 * 1024 * 1024])
+    write_file(os.path.join(source, "copy.bin"), data[: 3 * 1024 * 1024])
+    write_file(os.path.join(source, "empty.sav"), b"")
+    os.makedirs(os.path.join(source, "screenshots", "2024"))
+    snapshot, store = build(source)
+    assert snapshot["dirs"] == [os.path.join("screenshots", "2024")]
+    # Identical files share their chunks
+    assert len(store) == len(snapshot["files"]["world.bin"]["chunks"])
+    target = str(tmp_path / "restored")
+    chunks.restore_snapshot(snapshot, target, store.__getitem__)
+    assert read_tree(target) == read_tree(source)
+    assert os.path.isdir(os.path.join(target, "screenshots", "2024"))
+
+
+@pytest.mark.parametrize(
+    "files, dirs",
+    [
+        ({"../evil": {"size": 0, "chunks": []}}, []),
+        ({"/tmp/evil": {"size": 0, "chunks": []}}, []),
+        ({"a/../../evil": {"size": 0, "chunks": []}}, []),
+        ({"fine": {"size": 0, "chunks": []}}, ["../evil"]),
+        ({".": {"size": 0, "chunks": []}}, []),
+    ],
+)
+def test_snapshot_paths_outside_target_are_refused(tmp_path, files, dirs):
+    target = str(tmp_path / "restored")
+    with pytest.raises(ValueError):
+        chunks.restore_snapshot({"files": files, "dirs": dirs}, target, None)
+    # Nothing is written before the check
+    assert not os.path.exists(target)
+    assert not os.path.exists(str(tmp_path / "evil"))
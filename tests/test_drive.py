@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+
+import httplib2
+
+from googleapiclient.errors import HttpError
+from savehaven import drive
+from savehaven.drive import DriveBackend, retry_delay
+
+
+def http_error(status: int, reason: str = None, retry_after: str = None) -> HttpError:
+    headers = {"status": str(status)}
+    if retry_after:
+        headers["retry-after"] = retry_after
+    content = {
+        "error": {"code": status, "errors": [{"reason": reason}] if reason else []}
+    }
+    return HttpError(httplib2.Response(headers), json.dumps(content).encode())
+
+
+class Flaky:
+    """
+    Raises the errors it's given in turn, then returns "done"
+    """
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "done"
+
+
+@pytest.fixture
+def sleeps(monkeypatch) -> list:
+    sleeps = []
+    monkeypatch.setattr(drive.time, "sleep", sleeps.append)
+    return sleeps
+
+
+@pytest.fixture
+def backend() -> DriveBackend:
+    return DriveBackend(drive.CHUNK_GRANULARITY)
+
+
+def test_server_errors_are_retried(backend, sleeps):
+    send = Flaky(http_error(503), http_error(500), ConnectionResetError())
+    assert backend.call(send) == "done"
+    assert send.calls == 4
+    assert len(sleeps) == 3
+
+
+def test_client_errors_are_raised_at_once(backend, sleeps):
+    send = Flaky(http_error(404))
+    with pytest.raises(HttpError):
+        backend.call(send)
+    assert send.calls == 1
+    assert not sleeps
+
+
+def test_retries_give_up(backend, sleeps):
+    send = Flaky(*[http_error(503)] * drive.MAX_ATTEMPTS)
+    with pytest.raises(HttpError):
+        backend.call(send)
+    assert send.calls == drive.MAX_ATTEMPTS
+    assert len(sleeps) == drive.MAX_ATTEMPTS - 1
+
+
+def test_rate_limits_slow_down_requests(backend, sleeps):
+    send = Flaky(http_error(403, "userRateLimitExceeded"))
+    assert backend.call(send) == "done"
+    assert backend.throttle.limit < drive.HTTP_POOL_SIZE
+    # Other 403s are permission errors
+    with pytest.raises(HttpError):
+        backend.call(Flaky(http_error(403, "insufficientFilePermissions")))
+
+
+def test_backoff_grows_with_attempts():
+    for attempt in range(10):
+        delay = retry_delay(http_error(503), attempt)
+        assert 0 <= delay <= min(drive.BACKOFF_CAP, drive.BACKOFF_BASE * 2**attempt)
+
+
+def test_retry_after_is_honored():
+    assert retry_delay(http_error(429, retry_after="30"), 0) >= 30
+    assert retry_delay(http_error(429, retry_after="86400"), 0) <= drive.MAX_RETRY_AFTER
+    assert retry_delay(http_error(400), 0) is None
+    assert retry_delay(ValueError(), 0) is None
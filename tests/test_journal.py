@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from savehaven import journal, storage
+from savehaven.journal import UploadJournal
+
+MIB = 1024 * 1024
+
+
+class Interrupted(Exception):
+    pass
+
+
+def pieces(data: bytes, fail_at: int = None):
+    for start in range(0, len(data), MIB):
+        if start == fail_at:
+            raise Interrupted()
+        yield data[start : start + MIB]
+
+
+@pytest.fixture
+def data(monkeypatch) -> bytes:
+    monkeypatch.setattr(storage, "COMMIT_SIZE", MIB)
+    return os.urandom(6 * MIB)
+
+
+def upload(backend, session, chunks) -> str:
+    return backend.upload(chunks, "Game.zip", session=session)
+
+
+def test_interrupted_upload_resumes(backend, data):
+    uploads = UploadJournal()
+    with pytest.raises(Interrupted):
+        upload(backend, uploads.session("Game.zip", "v1"), pieces(data, 4 * MIB))
+    session = uploads.session("Game.zip", "v1")
+    assert session.offset == 4 * MIB
+    # What was committed is kept, not sent again
+    file_id = upload(backend, session, pieces(bytes(4 * MIB) + data[4 * MIB :]))
+    path = os.path.join(backend.root, file_id)
+    with open(path, "rb") as file:
+        assert file.read() == data
+    # Finished sessions are forgotten
+    assert uploads.session("Game.zip", "v1").offset == 0
+
+
+def test_other_archive_starts_over(backend, data):
+    uploads = UploadJournal()
+    with pytest.raises(Interrupted):
+        upload(backend, uploads.session("Game.zip", "v1"), pieces(data, 4 * MIB))
+    assert uploads.session("Game.zip", "v2").offset == 0
+
+
+def test_expired_session_starts_over(backend, data, monkeypatch):
+    uploads = UploadJournal()
+    with pytest.raises(Interrupted):
+        upload(backend, uploads.session("Game.zip", "v1"), pieces(data, 4 * MIB))
+    now = journal.time.time() + journal.SESSION_LIFETIME + 1
+    monkeypatch.setattr(journal.time, "time", lambda: now)
+    assert uploads.session("Game.zip", "v1").offset == 0
@@ -0,0 +1,77 @@
+from savehaven.mirror import apply_changes, new_mirror
+from savehaven.storage import FOLDER_MIME_TYPE
+
+
+def folder(file_id: str, parent: str) -> dict:
+    return {
+        "id": file_id,
+        "name": file_id,
+        "mimeType": FOLDER_MIME_TYPE,
+        "parent": parent,
+    }
+
+
+def file(file_id: str, parent: str) -> dict:
+    return {
+        "id": file_id,
+        "name": file_id,
+        "mimeType": "application/zip",
+        "parent": parent,
+    }
+
+
+def change(item: dict = None, file_id: str = None, **extra) -> dict:
+    if item is None:
+        return {"fileId": file_id, "removed": True}
+    item = dict(item, parents=[item.pop("parent")], **extra)
+    return {"fileId": item["id"], "removed": False, "file": item}
+
+
+def mirror() -> dict:
+    return new_mirror(
+        "local",
+        "root",
+        "0",
+        [
+            folder("heroic", "root"),
+            file("game", "heroic"),
+            folder("minecraft", "root"),
+            folder("world", "minecraft"),
+            file("region", "world"),
+        ],
+    )
+
+
+def test_removed_folder_takes_its_contents():
+    files = mirror()
+    assert apply_changes(files, [change(file_id="minecraft")])
+    assert sorted(files["files"]) == ["game", "heroic"]
+
+
+def test_trashed_file_is_removed():
+    files = mirror()
+    assert apply_changes(files, [change(file("game", "heroic"), trashed=True)])
+    assert "game" not in files["files"]
+
+
+def test_file_moved_out_is_removed():
+    files = mirror()
+    assert apply_changes(files, [change(file("game", "elsewhere"))])
+    assert "game" not in files["files"]
+
+
+def test_new_files_are_added_under_their_folder():
+    files = mirror()
+    changes = [change(folder("celeste", "root")), change(file("save", "celeste"))]
+    assert apply_changes(files, changes)
+    assert files["files"]["save"]["parent"] == "celeste"
+
+
+def test_unrelated_changes_are_dropped():
+    files = mirror()
+    assert apply_changes(files, [change(file("photo", "photos"))])
+    assert "photo" not in files["files"]
+
+
+def test_removed_root_needs_a_new_listing():
+    assert not apply_changes(mirror(), [change(file_id="root")])
@@ -0,0 +1,117 @@
+import os
+
+import pytest
+
+from conftest import set_config, write_file
+from savehaven import helpers
+
+
+@pytest.fixture
+def game(save_dir, backend):
+    helpers.add_custom("Game", save_dir)
+    return save_dir
+
+
+def plan(save_dir: str, policy: str = "newest-wins", uploaded: float = None):
+    entry = helpers.load_config()["games"]["Game"]
+    if uploaded is not None:
+        entry["uploaded"] = uploaded
+    root = helpers.load_inventory().root
+    game = helpers.SaveDir("Game", save_dir, os.path.getmtime(save_dir))
+    job = helpers.plan_upload("Heroic", game, entry["uploaded"], root, policy, entry)
+    if job:
+        job.key = ("games", "Game")
+    return job
+
+
+def backup(save_dir: str, policy: str = "newest-wins"):
+    job = plan(save_dir, policy)
+    assert job is not None
+    assert helpers.backup_games([job], 1)[0][0] is True
+    return job
+
+
+def cloud_files() -> dict:
+    helpers.load_inventory()
+    return helpers.open_folder("Heroic", helpers.inventory.root)[1]
+
+
+def test_new_game_is_uploaded(game):
+    job = plan(game)
+    assert job.action == "upload"
+    assert job.file_id is None and job.delete_id is None
+
+
+def test_unchanged_game_is_skipped(game):
+    backup(game)
+    assert plan(game) is None
+
+
+def test_changed_game_replaces_its_backup(game):
+    backup(game)
+    old_id = cloud_files()["Game.zip"]["id"]
+    write_file(os.path.join(game, "slot1.sav"), b"level 2 " * 1000)
+    job = plan(game, "local-wins")
+    assert job.action == "upload"
+    assert job.delete_id == old_id
+
+
+def test_newer_cloud_copy_is_restored(game, backend):
+    backup(game)
+    file_id = cloud_files()["Game.zip"]["id"]
+    # Another machine uploaded since
+    backend.upload(
+        iter([b"not a zip"]),
+        "Game.zip",
+        file_id=file_id,
+        properties={helpers.FINGERPRINT_PROPERTY: "elsewhere"},
+    )
+    uploaded = os.path.getmtime(game) - 60
+    job = plan(game, "newest-wins", uploaded)
+    assert job.action == "restore"
+    assert job.file_id == file_id
+    job = plan(game, "local-wins", uploaded)
+    assert job.action == "upload"
+
+
+@pytest.mark.parametrize(
+    "backup_config, name",
+    [
+        ("codec = tar.xz\n", "Game.tar.xz"),
+        ("codec = zip\nlevel = 9\n", "Game.zip"),
+        ("format = chunked\n", "Game" + helpers.SNAPSHOT_SUFFIX),
+    ],
+)
+def test_format_change_replaces_unchanged_backup(game, config_dir, backup_config, name):
+    backup(game)
+    old_id = cloud_files()["Game.zip"]["id"]
+    set_config(config_dir, backup_config)
+    job = plan(game)
+    assert job is not None, "a backup in another format isn't up to date"
+    helpers.backup_games([job], 1)
+    files = cloud_files()
+    assert list(files) == [name]
+    assert name == "Game.zip" or files[name]["id"] != old_id
+    assert plan(game) is None
+
+
+def test_game_codec_change_replaces_backup(game):
+    backup(game)
+    uploaded = helpers.load_config()["games"]["Game"]["uploaded"]
+    helpers.add_custom("Game", game, "tar.xz")
+    assert helpers.load_config()["games"]["Game"]["uploaded"] == uploaded
+    backup(game)
+    assert list(cloud_files()) == ["Game.tar.xz"]
+    assert plan(game) is None
+
+
+def test_deleted_folder_is_created_again(save_dir, any_backend):
+    helpers.add_custom("Game", save_dir)
+    backup(save_dir)
+    helpers.load_inventory()
+    folder_id, _ = helpers.open_folder("Heroic", helpers.inventory.root)
+    any_backend.delete(folder_id)
+    job = plan(save_dir)
+    assert job is not None
+    assert helpers.backup_games([job], 1)[0][0] is True
+    assert list(cloud_files()) == ["Game.zip"]
@@ -0,0 +1,68 @@
+import json
+import os
+import sqlite3
+
+from savehaven import state
+from savehaven.state import SCHEMA_VERSION, StateStore
+
+
+def test_game_list_is_imported_once(config_dir):
+    save_json = {
+        "games": {
+            "Hades": {"path": "/saves/hades", "uploaded": 12.0, "codec": "tar.xz"}
+        },
+        "minecraft": {"Prism": {"World": {"path": "/saves/world", "uploaded": 0}}},
+    }
+    with open(state.list_file, "w") as list_file:
+        json.dump(save_json, list_file)
+    path = os.path.join(config_dir, "migrated.db")
+    saves = StateStore(path).saves()
+    assert saves == {
+        ("games", "Hades"): {
+            "path": "/saves/hades",
+            "uploaded": 12.0,
+            "codec": "tar.xz",
+        },
+        ("minecraft", "Prism", "World"): {"path": "/saves/world", "uploaded": 0},
+    }
+    assert not os.path.exists(state.list_file)
+    assert os.path.exists(f"{state.list_file}.migrated")
+    with sqlite3.connect(path) as db:
+        assert db.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    # A list written afterwards isn't imported over the database
+    with open(state.list_file, "w") as list_file:
+        json.dump(
+            {"games": {"Celeste": {"path": "/saves/celeste", "uploaded": 0}}}, list_file
+        )
+    assert StateStore(path).saves() == saves
+
+
+def test_fresh_state_is_empty(config_dir):
+    store = StateStore(os.path.join(config_dir, "fresh.db"))
+    assert store.saves() == {}
+    assert store.mirror() is None
+
+
+def test_uploaded_time_keeps_options():
+    store = state.open_state()
+    store.put_save(
+        ("games", "Hades"), {"path": "/saves/hades", "uploaded": 0, "codec": "zip"}
+    )
+    store.set_uploaded(("games", "Hades"), 99.0)
+    assert store.saves()[("games", "Hades")] == {
+        "path": "/saves/hades",
+        "uploaded": 99.0,
+        "codec": "zip",
+    }
+
+
+def test_cloud_ids_below_a_folder_are_forgotten():
+    store = state.open_state()
+    store.put_cloud_id("root/SaveHaven", "a")
+    store.put_cloud_id("a/Heroic", "b")
+    store.put_cloud_id("b/Chunks", "c")
+    store.put_cloud_id("root/Other", "d")
+    assert store.forget_cloud_id("a") == 2
+    assert store.cloud_id("root/SaveHaven") is None
+    assert store.cloud_id("a/Heroic") is None
+    assert store.cloud_id("root/Other") == "d"